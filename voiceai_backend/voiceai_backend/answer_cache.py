@@ -0,0 +1,176 @@
+# Semantic answer cache - reuse LLM answers for recurring questions per knowledge base
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+class _Bucket:
+    """Cached answers of one (kb_id, language, kb_version)"""
+
+    def __init__(self):
+        self.entries: "OrderedDict[int, dict]" = OrderedDict()  # LRU order, id -> entry
+        self._matrix: Optional[np.ndarray] = None
+        self._ids = []
+        self._next_id = 0
+
+    def add(self, entry: dict):
+        self.entries[self._next_id] = entry
+        self._next_id += 1
+        self._matrix = None
+
+    def remove(self, entry_id: int):
+        self.entries.pop(entry_id, None)
+        self._matrix = None
+
+    def matrix(self) -> Tuple[list, Optional[np.ndarray]]:
+        """Row ids and the stacked (unit-normalized) question embeddings"""
+        if self._matrix is None and self.entries:
+            self._ids = list(self.entries.keys())
+            self._matrix = np.vstack([self.entries[i]["embedding"] for i in self._ids])
+        return self._ids, self._matrix
+
+
+class SemanticAnswerCache:
+    """Answers keyed by question embedding, per knowledge base and language
+
+    A new utterance whose embedding has cosine similarity >= threshold with a
+    cached question gets the stored answer without an LLM call. Entries expire
+    after ttl seconds and each bucket keeps at most max_entries (least recently
+    used evicted first). Buckets are per KB version: after a re-upload, calls
+    still on the old version and calls on the new one each keep their own
+    answers, and drop_version() removes the old bucket once no call uses it.
+    Lookups run in worker threads next to the embedding, hence the lock.
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl: float = 3600.0, max_entries: int = 500):
+        """
+        Args:
+            threshold: Minimum cosine similarity to reuse an answer
+            ttl: Seconds an answer is served after it was generated
+            max_entries: Cached questions per (kb_id, language, kb_version)
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._buckets: Dict[Tuple[str, str, str], _Bucket] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.kb_hits: Dict[str, int] = {}
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype="float32").reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _bucket(self, kb_id: str, language: str, kb_version: str, create: bool) -> Optional[_Bucket]:
+        key = (kb_id, language, kb_version)
+        bucket = self._buckets.get(key)
+        if bucket is None and create:
+            bucket = self._buckets[key] = _Bucket()
+        return bucket
+
+    def lookup(self, kb_id: str, language: str, kb_version: str, embedding) -> Optional[dict]:
+        """Best cached answer above the threshold, or None"""
+        query = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            bucket = self._bucket(kb_id, language, kb_version, create=False)
+            ids, matrix = bucket.matrix() if bucket else ([], None)
+            if matrix is None:
+                self.misses += 1
+                return None
+
+            scores = matrix @ query
+            for row in np.argsort(-scores):
+                if scores[row] < self.threshold:
+                    break
+                entry_id = ids[row]
+                entry = bucket.entries[entry_id]
+                if now - entry["created_at"] > self.ttl:
+                    bucket.remove(entry_id)
+                    self.expirations += 1
+                    continue
+                bucket.entries.move_to_end(entry_id)
+                entry["hits"] += 1
+                self.hits += 1
+                self.kb_hits[kb_id] = self.kb_hits.get(kb_id, 0) + 1
+                return {
+                    "question": entry["question"],
+                    "answer": entry["answer"],
+                    "similarity": float(scores[row])
+                }
+
+            self.misses += 1
+            return None
+
+    def store(self, kb_id: str, language: str, kb_version: str, question: str, embedding, answer: str):
+        """Cache an LLM answer for a question"""
+        if not answer:
+            return
+        with self._lock:
+            bucket = self._bucket(kb_id, language, kb_version, create=True)
+            bucket.add({
+                "question": question,
+                "answer": answer,
+                "embedding": self._normalize(embedding),
+                "created_at": time.time(),
+                "hits": 0
+            })
+            self.stores += 1
+            while len(bucket.entries) > self.max_entries:
+                bucket.remove(next(iter(bucket.entries)))
+                self.evictions += 1
+
+    def invalidate(self, kb_id: Optional[str] = None) -> int:
+        """Drop every cached answer of a KB (all KBs if kb_id is None), returns entries removed"""
+        with self._lock:
+            keys = [key for key in self._buckets if kb_id is None or key[0] == kb_id]
+            removed = 0
+            for key in keys:
+                removed += len(self._buckets.pop(key).entries)
+            if keys:
+                self.invalidations += 1
+            return removed
+
+    def drop_version(self, kb_id: str, kb_version: str) -> int:
+        """Drop the answers of a KB version no call uses anymore, returns entries removed"""
+        with self._lock:
+            keys = [key for key in self._buckets if key[0] == kb_id and key[2] == kb_version]
+            removed = 0
+            for key in keys:
+                removed += len(self._buckets.pop(key).entries)
+            if keys:
+                self.invalidations += 1
+            return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl,
+                "max_entries_per_kb": self.max_entries,
+                "buckets": {
+                    f"{kb_id}:{language}:{kb_version}": len(bucket.entries)
+                    for (kb_id, language, kb_version), bucket in self._buckets.items()
+                },
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "hits_by_kb": dict(self.kb_hits),
+                "stores": self.stores,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,126 @@
+"""Embedding backend benchmark: PyTorch vs int8 ONNX Runtime for all-MiniLM-L6-v2
+
+Each backend is measured in a fresh Python process (so import cost and
+memory are its own):
+
+  - startup s: import + model load, what the server pays before serving
+  - RSS MB: resident memory after loading and encoding
+  - 1-query p50 / p95 ms: one string, like a RAG lookup
+  - batch/s: sentences per second encoding batches of --batch (KB ingestion)
+
+Then both models embed the same KB lines and their cosine agreement is
+reported (min / p1 / mean); the server's EMBEDDING_VERIFY check applies
+EMBEDDING_MIN_COSINE to the same number.
+
+Usage:
+    python benchmarks/embedding_backend.py
+    python benchmarks/embedding_backend.py --onnx-file onnx/model_qint8_avx512_vnni.onnx --threads 1
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODEL = "all-MiniLM-L6-v2"
+QUERIES = [
+    "what is the price of the starter plan",
+    "can you call my customers in hindi",
+    "do you integrate with whatsapp",
+    "how long does setup take",
+    "kitne minute milte hain is plan mein",
+]
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def kb_lines(limit):
+    from kb_store import read_kb_texts
+    texts = []
+    for path in sorted(glob.glob("knowledge_bases/*.txt")):
+        texts.extend(read_kb_texts(path))
+    return texts[:limit]
+
+
+def child(args):
+    """Runs in its own process, prints one JSON line of measurements"""
+    start = time.perf_counter()
+    from embedding_backend import load_embedding_model
+    model = load_embedding_model(MODEL, args.child, onnx_file=args.onnx_file, threads=args.threads)
+    startup = time.perf_counter() - start
+
+    for query in QUERIES:
+        model.encode(query, convert_to_numpy=True)
+    latencies = []
+    for i in range(args.queries):
+        start = time.perf_counter()
+        model.encode(f"{QUERIES[i % len(QUERIES)]} {i}", convert_to_numpy=True)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    texts = kb_lines(args.batch * 8) or QUERIES * args.batch
+    start = time.perf_counter()
+    model.encode(texts, batch_size=args.batch, convert_to_numpy=True)
+    throughput = len(texts) / (time.perf_counter() - start)
+
+    print(json.dumps({
+        "startup": startup,
+        "rss_mb": rss_mb(),
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "batch_per_s": throughput
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--onnx-file", default=os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx"))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("EMBEDDING_THREADS", "0")),
+                        help="ONNX Runtime threads, 0 for its default")
+    parser.add_argument("--queries", type=int, default=200, help="single-query encodes timed")
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--agreement-lines", type=int, default=500)
+    parser.add_argument("--child", choices=["torch", "onnx"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    print(f"{'backend':<8} {'startup s':>9} {'RSS MB':>8} {'p50 ms':>8} {'p95 ms':>8} {'batch/s':>9}")
+    for backend in ("torch", "onnx"):
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", backend, "--onnx-file", args.onnx_file,
+             "--threads", str(args.threads), "--queries", str(args.queries), "--batch", str(args.batch)],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(f"{backend:<8} ✗ failed: {result.stderr.strip().splitlines()[-1] if result.stderr else 'no output'}")
+            continue
+        m = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{backend:<8} {m['startup']:>9.2f} {m['rss_mb']:>8.0f} {m['p50']:>8.2f} {m['p95']:>8.2f} "
+              f"{m['batch_per_s']:>9.0f}")
+
+    from embedding_backend import cosine_agreement, load_embedding_model
+    texts = kb_lines(args.agreement_lines) + QUERIES
+    agreement = cosine_agreement(
+        load_embedding_model(MODEL, "onnx", onnx_file=args.onnx_file, threads=args.threads),
+        load_embedding_model(MODEL, "torch"),
+        texts
+    )
+    print(f"\nCosine agreement onnx vs torch over {agreement['texts']} texts: "
+          f"min {agreement['min']}, p1 {agreement['p1']}, mean {agreement['mean']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""RAG embedding benchmark: per-query encode threads vs the cross-call batcher
+
+Simulates N concurrent calls, each asking --turns questions with a short
+pause in between, and runs the RAG step of a turn two ways:
+
+  - per-query: asyncio.to_thread(encode one string + search), as before
+  - batched:   EmbeddingBatcher.embed() then the search in a thread (main.py today)
+
+Every question is unique so no cache hides the encode cost. Reports
+throughput (RAG lookups/s) and p50/p95 RAG latency per concurrency level,
+plus the batcher's average batch size and queue wait.
+
+Usage:
+    python benchmarks/embedding_batch.py
+    python benchmarks/embedding_batch.py --calls 1 25 100 200 --window-ms 3 --max-batch 32
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_service import EmbeddingBatcher  # noqa: E402
+from kb_store import KBIndexStore, file_content_hash, hybrid_search_kb, read_kb_texts  # noqa: E402
+from tracing import percentile  # noqa: E402
+
+WORDS = ("price plan hindi calls minutes whatsapp setup campaign crm agent voice language support "
+         "trial refund invoice number demo integration api latency script transfer").split()
+
+
+def questions(count, seed):
+    rng = random.Random(seed)
+    return [f"{' '.join(rng.choices(WORDS, k=rng.randint(4, 10)))} {i}" for i in range(count)]
+
+
+async def run_level(calls, args, model, kb, batched):
+    batcher = EmbeddingBatcher(
+        lambda texts: model.encode(texts, batch_size=len(texts), convert_to_numpy=True),
+        max_batch=args.max_batch, window_ms=args.window_ms, cache_size=0
+    )
+    latencies = []
+
+    def per_query(question):
+        embedding = model.encode(question, convert_to_numpy=True)
+        return hybrid_search_kb(kb, question, np.array([embedding], dtype="float32"), 3)
+
+    async def call(index):
+        rng = random.Random(index)
+        await asyncio.sleep(rng.random() * args.pause)  # calls do not start in lockstep
+        for question in questions(args.turns, seed=index):
+            start = time.perf_counter()
+            if batched:
+                embedding = await batcher.embed(question)
+                await asyncio.to_thread(hybrid_search_kb, kb, question, np.array([embedding], dtype="float32"), 3)
+            else:
+                await asyncio.to_thread(per_query, question)
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * args.pause)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call(i) for i in range(calls)))
+    elapsed = time.perf_counter() - start
+    await batcher.close()
+    latencies.sort()
+    return len(latencies) / elapsed, percentile(latencies, 50), percentile(latencies, 95), batcher.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--turns", type=int, default=5, help="questions per call")
+    parser.add_argument("--pause", type=float, default=0.2, help="mean seconds between a call's questions")
+    parser.add_argument("--kb", default="knowledge_bases/Akashvanni.txt")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--max-batch", type=int, default=int(os.getenv("EMBED_MAX_BATCH", "32")))
+    parser.add_argument("--window-ms", type=float, default=float(os.getenv("EMBED_BATCH_WINDOW_MS", "3")))
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(args.model)
+    texts = read_kb_texts(args.kb)
+    store = KBIndexStore(tempfile.mkdtemp(prefix="embed_bench_"), args.model, model.get_sentence_embedding_dimension())
+    kb = store.save("bench", file_content_hash(args.kb), texts, model.encode(texts, convert_to_numpy=True))
+    model.encode(["warm up"], convert_to_numpy=True)
+
+    print(f"{'calls':>6} {'mode':<10} {'lookups/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'avg batch':>10} {'wait p95':>9}")
+    for calls in args.calls:
+        for batched in (False, True):
+            throughput, p50, p95, stats = asyncio.run(run_level(calls, args, model, kb, batched))
+            batch = f"{stats['avg_batch_size']:>10}" if batched else f"{'-':>10}"
+            wait = f"{stats['queue_wait_ms']['p95']:>9}" if batched else f"{'-':>9}"
+            print(f"{calls:>6} {'batched' if batched else 'per-query':<10} {throughput:>10.1f} "
+                  f"{p50:>8.1f} {p95:>8.1f} {batch} {wait}")
+
+
+if __name__ == "__main__":
+    main()
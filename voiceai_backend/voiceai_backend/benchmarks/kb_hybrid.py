@@ -0,0 +1,118 @@
+"""KB retrieval quality: vector vs BM25 vs hybrid (rank fusion) on a sample KB
+
+Embeds a KB with the server's model through KBIndexStore and answers a set
+of queries three ways, reporting per mode:
+
+  - hit@k: the expected entry is among the top_k get_kb_context_fast returns
+  - MRR: mean reciprocal rank of the expected entry (within --candidates)
+  - p50 / p95 ms: retrieval latency after the (lru-cached) query embedding
+
+Queries come from a TSV file (query<TAB>text of the expected entry), or are
+generated from the KB: each entry with rare terms (names, plans, numbers)
+gets a short question built from them, which is the case embeddings miss.
+
+Usage:
+    python benchmarks/kb_hybrid.py
+    python benchmarks/kb_hybrid.py --kb knowledge_bases/Akashvanni.txt --queries queries.tsv --top-k 2
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kb_lexical import tokenize  # noqa: E402
+from kb_store import KBIndexStore, file_content_hash, hybrid_search_kb, read_kb_texts, search_kb  # noqa: E402
+
+TEMPLATES = ["tell me about {}", "what about {}?", "do you have {}", "{} kya hai", "how does {} work"]
+
+
+def generated_queries(texts, count, seed=0):
+    """(query, expected entry) pairs from each entry's two rarest terms"""
+    df = {}
+    for text in texts:
+        for token in set(tokenize(text)):
+            df[token] = df.get(token, 0) + 1
+    rng = random.Random(seed)
+    pairs = []
+    for entry, text in enumerate(texts):
+        rare = sorted({t for t in tokenize(text) if df[t] == 1 and len(t) > 2}, key=lambda t: (-len(t), t))
+        if len(rare) >= 2:
+            pairs.append((rng.choice(TEMPLATES).format(" ".join(rare[:2])), entry))
+    rng.shuffle(pairs)
+    return pairs[:count]
+
+
+def file_queries(path, texts):
+    pairs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if "\t" not in line:
+                continue
+            query, expected = line.rstrip("\n").split("\t", 1)
+            entry = next((i for i, text in enumerate(texts) if expected.strip() in text), None)
+            if entry is None:
+                print(f"⚠️ No KB entry contains: {expected[:60]}")
+                continue
+            pairs.append((query, entry))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kb", default="knowledge_bases/Akashvanni.txt")
+    parser.add_argument("--queries", help="TSV of query<TAB>expected entry text (default: generated)")
+    parser.add_argument("--count", type=int, default=100, help="generated queries")
+    parser.add_argument("--top-k", type=int, default=2, help="get_kb_context_fast default")
+    parser.add_argument("--candidates", type=int, default=int(os.getenv("KB_HYBRID_CANDIDATES", "10")))
+    parser.add_argument("--rrf-k", type=int, default=int(os.getenv("KB_RRF_K", "60")))
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(args.model)
+    texts = read_kb_texts(args.kb)
+    pairs = file_queries(args.queries, texts) if args.queries else generated_queries(texts, args.count)
+    if not pairs:
+        raise SystemExit("No queries")
+
+    store = KBIndexStore(tempfile.mkdtemp(prefix="kb_hybrid_"), args.model, model.get_sentence_embedding_dimension())
+    start = time.time()
+    kb = store.save("bench", file_content_hash(args.kb), texts, model.encode(texts, convert_to_numpy=True))
+    print(f"{args.kb}: {len(texts)} entries, {len(pairs)} queries, "
+          f"built in {time.time() - start:.1f}s, BM25 {kb['lexical'].stats()}")
+
+    depth = max(args.top_k, args.candidates)
+    modes = {
+        "vector": lambda query, emb, k: search_kb(kb, emb, k),
+        "lexical": lambda query, emb, k: kb["lexical"].search(query, k),
+        "hybrid": lambda query, emb, k: hybrid_search_kb(kb, query, emb, k, args.candidates, args.rrf_k)
+    }
+    embeddings = model.encode([query.lower().strip() for query, _ in pairs], convert_to_numpy=True).astype("float32")
+
+    print(f"\n{'mode':<8} {f'hit@{args.top_k}':>7} {'MRR':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode, search in modes.items():
+        hits, reciprocal, latencies = 0, 0.0, []
+        for (query, expected), emb in zip(pairs, embeddings):
+            emb = emb.reshape(1, -1)
+            start = time.perf_counter()
+            top = search(query, emb, args.top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += expected in top
+            ranked = search(query, emb, depth)
+            if expected in ranked:
+                reciprocal += 1 / (ranked.index(expected) + 1)
+        latencies.sort()
+        print(f"{mode:<8} {hits / len(pairs):>7.3f} {reciprocal / len(pairs):>6.3f} "
+              f"{latencies[len(latencies) // 2]:>8.3f} {latencies[int(len(latencies) * 0.95)]:>8.3f}")
+
+    start = time.perf_counter()
+    model.encode(["what is the price of the starter plan"], convert_to_numpy=True)
+    print(f"\nQuery embedding (uncached): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
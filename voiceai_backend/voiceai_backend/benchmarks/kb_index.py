@@ -0,0 +1,164 @@
+"""KB retrieval benchmark: get_kb_context_fast latency, recall@k and memory per index type and codec
+
+Builds synthetic knowledge bases (clustered unit vectors, like sentence
+embeddings) through KBIndexStore, loads them back memory-mapped exactly as
+the server does, and times the retrieval step of get_kb_context_fast
+(search_kb + text lookup; the query embedding is lru-cached there and not
+included). Recall@k is measured against exact search over the same vectors.
+
+  - auto: the index KBIndexStore picks for the size with the given thresholds
+  - flat / hnsw / ivfpq: force one type to compare them at the same size
+  - --codecs: vector storage of flat and HNSW (fp32, fp16, int8 scalar quantization)
+
+Memory columns: index MB is the FAISS index file, KB MB the resident
+estimate kb_cache budgets with (index + packed texts). Per size, the packed
+text buffer is also compared with the list of str it replaces.
+
+Search-time knobs are swept without rebuilding (--ef-search for HNSW,
+--nprobe for IVF-PQ), so the table shows the latency/recall trade-off.
+Building HNSW over 1M entries takes a while on a small machine.
+
+Usage:
+    python benchmarks/kb_index.py
+    python benchmarks/kb_index.py --sizes 1000 100000 --kinds flat hnsw
+    python benchmarks/kb_index.py --sizes 1000000 --kinds ivfpq --nprobe 8 16 32 --rerank 4
+    python benchmarks/kb_index.py --sizes 100000 --kinds flat --codecs fp32 fp16 int8
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kb_cache import estimate_kb_bytes  # noqa: E402
+from kb_store import KBIndexStore, PackedTexts, search_kb  # noqa: E402
+
+NEVER = 1 << 62
+
+
+def synthetic_kb(size, dimension, seed=0):
+    """Unit vectors around sqrt(size) topics, plus short texts"""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((max(1, int(np.sqrt(size))), dimension)).astype("float32")
+    embeddings = np.empty((size, dimension), dtype="float32")
+    for start in range(0, size, 65536):
+        end = min(size, start + 65536)
+        chunk = topics[rng.integers(0, len(topics), end - start)]
+        chunk += 0.6 * rng.standard_normal(chunk.shape).astype("float32")
+        embeddings[start:end] = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+    texts = [f"Entry {i}: answer text for synthetic topic {i % len(topics)}, padded to a typical KB line length."
+             for i in range(size)]
+    return texts, embeddings
+
+
+def make_queries(embeddings, count, seed=1):
+    """Paraphrase-like queries: stored entries with noise"""
+    rng = np.random.default_rng(seed)
+    queries = embeddings[rng.integers(0, len(embeddings), count)].copy()
+    queries += 0.3 * rng.standard_normal(queries.shape).astype("float32") / np.sqrt(queries.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def kb_context(kb, query_emb, top_k):
+    """Retrieval half of main.get_kb_context_fast"""
+    kb_texts = kb["texts"]
+    return "\n".join(kb_texts[i][:300] for i in search_kb(kb, query_emb, top_k))
+
+
+def store_for(kind, codec, args, root, dimension, **search):
+    hnsw_min, ivfpq_min = {
+        "auto": (args.hnsw_min, args.ivfpq_min),
+        "flat": (NEVER, NEVER),
+        "hnsw": (0, NEVER),
+        "ivfpq": (0, 0)
+    }[kind]
+    return KBIndexStore(
+        root, "synthetic", dimension,
+        hnsw_min=hnsw_min, ivfpq_min=ivfpq_min,
+        hnsw_m=args.hnsw_m, ef_construction=args.ef_construction,
+        ef_search=search.get("ef_search", args.ef_search[0]),
+        nprobe=search.get("nprobe", args.nprobe[0]),
+        rerank=args.rerank,
+        lexical=False,
+        codec=codec
+    )
+
+
+def measure(kb, queries, truth, top_k):
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        query_emb = query.reshape(1, -1)
+        start = time.perf_counter()
+        kb_context(kb, query_emb, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(search_kb(kb, query_emb, top_k)) & set(expected.tolist()))
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)], hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--kinds", nargs="+", default=["auto"], choices=["auto", "flat", "hnsw", "ivfpq"])
+    parser.add_argument("--codecs", nargs="+", default=["fp32", "fp16", "int8"], choices=["fp32", "fp16", "int8"])
+    parser.add_argument("--dimension", type=int, default=384, help="all-MiniLM-L6-v2 is 384")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=2, help="get_kb_context_fast default")
+    parser.add_argument("--hnsw-min", type=int, default=int(os.getenv("KB_HNSW_MIN_ENTRIES", "50000")))
+    parser.add_argument("--ivfpq-min", type=int, default=int(os.getenv("KB_IVFPQ_MIN_ENTRIES", "1000000")))
+    parser.add_argument("--hnsw-m", type=int, default=int(os.getenv("KB_HNSW_M", "32")))
+    parser.add_argument("--ef-construction", type=int, default=int(os.getenv("KB_HNSW_EF_CONSTRUCTION", "80")))
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[int(os.getenv("KB_HNSW_EF_SEARCH", "64"))])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[int(os.getenv("KB_IVF_NPROBE", "16"))])
+    parser.add_argument("--rerank", type=int, default=int(os.getenv("KB_IVF_RERANK", "4")))
+    parser.add_argument("--threads", type=int, default=1, help="FAISS threads (a call searches on one)")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    header = (f"{'entries':>9} {'index':<6} {'codec':<5} {'param':<12} {'build s':>8} {'index MB':>9} {'KB MB':>7} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {f'recall@{args.top_k}':>9}")
+
+    for size in args.sizes:
+        texts, embeddings = synthetic_kb(size, args.dimension)
+        queries = make_queries(embeddings, args.queries)
+        _, truth = faiss.knn(queries, embeddings, args.top_k)
+        str_bytes = sum(sys.getsizeof(text) for text in texts) + sys.getsizeof(texts)
+        print(f"\n{size} entries: texts as list of str {str_bytes / 1e6:.1f} MB, "
+              f"packed {PackedTexts.from_texts(texts).nbytes / 1e6:.1f} MB")
+        print(header)
+
+        for kind, codec in [(kind, codec) for kind in args.kinds for codec in args.codecs]:
+            root = tempfile.mkdtemp(prefix="kb_index_")
+            try:
+                store = store_for(kind, codec, args, root, args.dimension)
+                if store.index_spec(size)["kind"] == "ivfpq" and codec != args.codecs[0]:
+                    continue  # PQ has its own compression, the codec does not apply
+                start = time.time()
+                kb = store.save("bench", f"{size:016x}", texts, embeddings)
+                build_seconds = time.time() - start
+                index_mb = os.path.getsize(os.path.join(kb["path"], "index.faiss")) / 1e6
+                kb_mb = estimate_kb_bytes(kb) / 1e6
+
+                sweep = {"hnsw": [("ef_search", v) for v in args.ef_search],
+                         "ivfpq": [("nprobe", v) for v in args.nprobe]}.get(kb["index_kind"], [(None, None)])
+                for name, value in sweep:
+                    if name:
+                        kb = store_for(kind, codec, args, root, args.dimension, **{name: value}).load(
+                            "bench", f"{size:016x}")
+                    p50, p95, recall = measure(kb, queries, truth, args.top_k)
+                    param = f"{name}={value}" if name else "exact"
+                    print(f"{size:>9} {kb['index_kind']:<6} {kb['codec']:<5} {param:<12} {build_seconds:>8.1f} "
+                          f"{index_mb:>9.1f} {kb_mb:>7.1f} {p50:>8.3f} {p95:>8.3f} {recall:>9.3f}")
+                del kb
+            finally:
+                shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,808 @@
+"""Load test: simulated Twilio media streams against a local main.py instance
+
+Starts the server with every provider pointed at local stand-ins, then ramps
+up concurrent simulated calls on /ws/media-stream. Each call sends Twilio
+connected/start/media/mark/stop events, paced at one 20ms μ-law frame per
+tick, speaking the turns of a recording (or a synthetic speech/silence
+pattern) and waiting for the bot's answer before the next turn.
+
+Stand-ins (one subprocess, each with --*-latency and a shared --jitter):
+
+  - Deepgram   ws  /v1/listen              energy VAD on the audio, interim and
+                                           speech_final Results, SpeechStarted
+  - Cartesia   ws  /tts/websocket          chunk/done per context_id, cancel
+  - Sarvam     ws  /text-to-speech/ws      audio + final event per flush
+  - Groq       http /openai/v1/chat/completions   SSE token stream, JSON mode
+  - Twilio     http /2010-04-01/Accounts/...      call create/update
+
+Reported per concurrency level:
+
+  - turn latency p50/p95/p99: caller stops speaking -> first bot media frame
+  - turns answered, turns that timed out, barge-in clears received
+  - server event-loop lag p95/max (sampled inside the server process)
+  - server CPU %, peak RSS (MB) and peak thread count (from /proc, Linux only)
+
+Runs fully offline, but needs what the server needs at startup: a local
+MongoDB (MONGODB_URL, default mongodb://127.0.0.1:27017, database
+voiceai_loadtest) and the all-MiniLM-L6-v2 model already in the Hugging Face
+cache (HF_HUB_OFFLINE is set for the server). The answer cache and TTS audio
+cache are disabled so every turn exercises RAG, LLM and TTS; override with
+--app-env.
+
+Usage:
+    python benchmarks/load_test.py                          # 1/5/10/25/50 calls, 30s each
+    python benchmarks/load_test.py --calls 10 50 100 --duration 60
+    python benchmarks/load_test.py --audio caller.ulaw --tts-engine sarvam --language hi
+    python benchmarks/load_test.py --llm-ttft 0.4 --jitter 0.5 --app-env SPECULATIVE_ENABLED=true
+"""
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+import websockets
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FRAME_BYTES = 160         # 20ms of 8kHz μ-law, what Twilio sends per media event
+FRAME_SECONDS = 0.02
+SILENCE = b"\xff" * FRAME_BYTES
+VOICE_RMS = 500           # frames louder than this count as speech
+TURN_GAP_SECONDS = 0.7    # silence that separates two caller turns in a recording
+
+UTTERANCES = [
+    "what are your office hours",
+    "how much does the premium plan cost",
+    "can I book a demo for next week",
+    "do you support calls in hindi",
+    "how do I change the number on my account",
+]
+
+ANSWER = ("Sure, I can help with that. Our team is available from nine in the morning to six in the "
+          "evening, Monday to Saturday. Would you like me to arrange a call back?")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def jittered(seconds, jitter):
+    """seconds +- jitter (a fraction of seconds), never negative"""
+    return max(0.0, seconds * (1 + random.uniform(-jitter, jitter)))
+
+
+# ---------------------------------------------------------------------------
+# μ-law audio
+# ---------------------------------------------------------------------------
+
+def ulaw_encode(sample):
+    sign = 0x80 if sample < 0 else 0
+    sample = min(abs(int(sample)), 32635) + 0x84
+    exponent = 7
+    mask = 0x4000
+    while exponent > 0 and not sample & mask:
+        exponent -= 1
+        mask >>= 1
+    mantissa = (sample >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+
+def _ulaw_decode(byte):
+    byte = ~byte & 0xFF
+    sample = (((byte & 0x0F) << 3) + 0x84) << ((byte >> 4) & 0x07)
+    sample -= 0x84
+    return -sample if byte & 0x80 else sample
+
+
+ULAW_TO_LINEAR = [_ulaw_decode(b) for b in range(256)]
+
+
+def frame_rms(frame):
+    return math.sqrt(sum(ULAW_TO_LINEAR[b] ** 2 for b in frame) / max(1, len(frame)))
+
+
+def synthetic_speech(seconds, offset=0):
+    """Voiced-sounding μ-law: two tones modulated at a syllable rate"""
+    samples = int(seconds * 8000)
+    return bytes(
+        ulaw_encode(
+            6000 * (0.6 + 0.4 * math.sin(2 * math.pi * 4 * (i + offset) / 8000))
+            * (math.sin(2 * math.pi * 180 * i / 8000) + 0.5 * math.sin(2 * math.pi * 720 * i / 8000))
+        )
+        for i in range(samples)
+    )
+
+
+def load_turns(path, turns):
+    """Caller turns as lists of 20ms frames, split on silence >= TURN_GAP_SECONDS"""
+    if not path:
+        return [
+            [synthetic_speech(1.2 + 0.3 * i, i * 997)[j:j + FRAME_BYTES]
+             for j in range(0, int((1.2 + 0.3 * i) * 8000), FRAME_BYTES)]
+            for i in range(turns)
+        ]
+
+    with open(path, "rb") as f:
+        audio = f.read()
+    frames = [audio[i:i + FRAME_BYTES].ljust(FRAME_BYTES, b"\xff") for i in range(0, len(audio), FRAME_BYTES)]
+    gap = int(TURN_GAP_SECONDS / FRAME_SECONDS)
+    segments, current, quiet = [], [], 0
+    for frame in frames:
+        if frame_rms(frame) >= VOICE_RMS:
+            current.append(frame)
+            quiet = 0
+        elif current:
+            current.append(frame)
+            quiet += 1
+            if quiet >= gap:
+                segments.append(current[:-quiet])
+                current, quiet = [], 0
+    if current:
+        segments.append(current[:len(current) - quiet])
+    if not segments:
+        raise SystemExit(f"No speech found in {path} (expects raw 8kHz μ-law)")
+    return segments
+
+
+# ---------------------------------------------------------------------------
+# Provider stand-ins
+# ---------------------------------------------------------------------------
+
+class StandIns:
+    """Deepgram, Cartesia and Sarvam websockets plus a Groq/Twilio HTTP server"""
+
+    def __init__(self, config):
+        self.config = config
+        self.utterances = itertools.cycle(UTTERANCES)
+
+    def delay(self, name):
+        return jittered(self.config[name], self.config["jitter"])
+
+    # -- Deepgram ----------------------------------------------------------
+
+    @staticmethod
+    def _results(words, start, end, is_final, speech_final):
+        step = (end - start) / max(1, len(words))
+        return {
+            "type": "Results",
+            "channel_index": [0, 1],
+            "duration": round(end - start, 3),
+            "start": round(start, 3),
+            "is_final": is_final,
+            "speech_final": speech_final,
+            "channel": {"alternatives": [{
+                "transcript": " ".join(words),
+                "confidence": 0.98,
+                "words": [
+                    {"word": w, "start": round(start + i * step, 3), "end": round(start + (i + 1) * step, 3),
+                     "confidence": 0.98, "punctuated_word": w}
+                    for i, w in enumerate(words)
+                ]
+            }]},
+            "metadata": {
+                "request_id": str(uuid.uuid4()),
+                "model_info": {"name": "stand-in", "version": "0", "arch": "stand-in"},
+                "model_uuid": str(uuid.uuid4())
+            },
+            "from_finalize": False
+        }
+
+    async def deepgram(self, ws):
+        outbox = asyncio.Queue()
+
+        async def sender():
+            # Messages leave in order, each no earlier than its own delivery time
+            while True:
+                deliver_at, message = await outbox.get()
+                await asyncio.sleep(max(0.0, deliver_at - time.perf_counter()))
+                await ws.send(json.dumps(message))
+
+        def emit(message):
+            outbox.put_nowait((time.perf_counter() + self.delay("stt_latency"), message))
+
+        sender_task = asyncio.create_task(sender())
+        audio_time = 0.0
+        speech_start = last_voice = None
+        words, sent_words = [], 0
+        endpointing = self.config["endpointing"]
+        try:
+            async for message in ws:
+                if isinstance(message, str):
+                    if json.loads(message).get("type") == "CloseStream":
+                        break
+                    continue  # KeepAlive / Finalize
+                for i in range(0, len(message), FRAME_BYTES):
+                    frame = message[i:i + FRAME_BYTES]
+                    audio_time += len(frame) / 8000
+                    if frame_rms(frame) >= VOICE_RMS:
+                        if speech_start is None:
+                            speech_start = audio_time
+                            words, sent_words = next(self.utterances).split(), 0
+                            emit({"type": "SpeechStarted", "channel": [0, 1], "timestamp": round(audio_time, 3)})
+                        last_voice = audio_time
+                        # Interim results grow by one word every interim interval
+                        heard = min(len(words) - 1, int((audio_time - speech_start) / self.config["interim_interval"]))
+                        if heard > sent_words:
+                            sent_words = heard
+                            emit(self._results(words[:heard], speech_start, audio_time, False, False))
+                    elif speech_start is not None and audio_time - last_voice >= endpointing:
+                        emit(self._results(words, speech_start, last_voice, True, True))
+                        speech_start = None
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            sender_task.cancel()
+
+    # -- Cartesia ----------------------------------------------------------
+
+    def _audio_chunks(self, text):
+        """Base64 μ-law chunks of 100ms, roughly 65ms of speech per character"""
+        chunk_bytes = 800
+        audio = synthetic_speech(0.1)[:chunk_bytes]
+        count = max(1, int(len(text) * 0.065 / 0.1))
+        return [base64.b64encode(audio).decode()] * count
+
+    async def cartesia(self, ws):
+        contexts = {}
+
+        async def generate(context_id, queue):
+            # Audio is produced faster than real time, as the real service does
+            interval = 0.1 / self.config["tts_speed"]
+            while True:
+                request = await queue.get()
+                transcript = request.get("transcript", "")
+                if transcript.strip():
+                    await asyncio.sleep(self.delay("tts_latency"))
+                    for chunk in self._audio_chunks(transcript):
+                        await ws.send(json.dumps({
+                            "type": "chunk", "context_id": context_id, "data": chunk,
+                            "done": False, "status_code": 200, "step_time": interval * 1000
+                        }))
+                        await asyncio.sleep(interval)
+                if not request.get("continue", False):
+                    await ws.send(json.dumps({"type": "done", "context_id": context_id, "done": True, "status_code": 200}))
+                    contexts.pop(context_id, None)
+                    return
+
+        try:
+            async for message in ws:
+                request = json.loads(message)
+                context_id = request.get("context_id")
+                if request.get("cancel"):
+                    entry = contexts.pop(context_id, None)
+                    if entry:
+                        entry[1].cancel()
+                    continue
+                if context_id not in contexts:
+                    queue = asyncio.Queue()
+                    contexts[context_id] = (queue, asyncio.create_task(generate(context_id, queue)))
+                contexts[context_id][0].put_nowait(request)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for _, task in contexts.values():
+                task.cancel()
+
+    # -- Sarvam ------------------------------------------------------------
+
+    async def sarvam(self, ws):
+        text = []
+        completion_event = "send_completion_event=true" in (ws.request.path if ws.request else "")
+        try:
+            async for message in ws:
+                request = json.loads(message)
+                if request.get("type") == "text":
+                    text.append(request.get("data", {}).get("text", ""))
+                elif request.get("type") == "flush" and text:
+                    await asyncio.sleep(self.delay("tts_latency"))
+                    request_id = str(uuid.uuid4())
+                    for chunk in self._audio_chunks(" ".join(text)):
+                        await ws.send(json.dumps({"type": "audio", "data": {
+                            "content_type": "audio/mulaw", "audio": chunk, "request_id": request_id}}))
+                        await asyncio.sleep(0.1 / self.config["tts_speed"])
+                    text = []
+                    if completion_event:
+                        await ws.send(json.dumps({"type": "event", "data": {"event_type": "final"}}))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def websocket_handler(self, ws):
+        path = ws.request.path if ws.request else ""
+        if path.startswith("/v1/listen"):
+            await self.deepgram(ws)
+        elif path.startswith("/tts/websocket"):
+            await self.cartesia(ws)
+        elif path.startswith("/text-to-speech/ws"):
+            await self.sarvam(ws)
+        else:
+            await ws.close(code=4404, reason=f"no stand-in for {path}")
+
+    # -- Groq and Twilio REST ----------------------------------------------
+
+    async def http_handler(self, reader, writer):
+        """Minimal HTTP/1.1 server with keep-alive, enough for httpx and requests"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+
+                if path.endswith("/chat/completions"):
+                    await self.groq(writer, json.loads(body or b"{}"))
+                elif path.startswith("/2010-04-01/"):
+                    await self.twilio(writer, method, path, body)
+                else:
+                    self._respond(writer, 404, {"error": f"no stand-in for {method} {path}"})
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _respond(writer, status, payload):
+        data = json.dumps(payload).encode()
+        reason = {200: "OK", 201: "Created", 404: "Not Found"}.get(status, "OK")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode() + data
+        )
+
+    async def groq(self, writer, request):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = request.get("model", "stand-in")
+        await asyncio.sleep(self.delay("llm_ttft"))
+
+        if not request.get("stream"):
+            if (request.get("response_format") or {}).get("type") == "json_object":
+                content = json.dumps({"summary": "Caller asked about the service and plans.", "lead_status": "cold"})
+            else:
+                content = ANSWER
+            self._respond(writer, 200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop", "logprobs": None}],
+                "usage": {"prompt_tokens": 500, "completion_tokens": 40, "total_tokens": 540}
+            })
+            return
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: keep-alive\r\n\r\n")
+
+        def event(payload):
+            data = f"data: {payload}\n\n".encode()
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+        for i, word in enumerate(ANSWER.split(" ")):
+            if i:
+                await asyncio.sleep(self.delay("llm_token_interval"))
+            event(json.dumps({
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": word if i == 0 else " " + word},
+                             "finish_reason": None, "logprobs": None}]
+            }))
+            await writer.drain()
+        event(json.dumps({
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop", "logprobs": None}]
+        }))
+        event("[DONE]")
+        writer.write(b"0\r\n\r\n")
+
+    async def twilio(self, writer, method, path, body):
+        await asyncio.sleep(self.delay("twilio_latency"))
+        account_sid = path.split("/")[3] if path.count("/") >= 3 else ""
+        call_sid = path.rsplit("/", 1)[-1].split(".")[0] if "/Calls/" in path else f"CA{uuid.uuid4().hex}"
+        self._respond(writer, 201 if path.endswith("/Calls.json") else 200, {
+            "sid": call_sid,
+            "account_sid": account_sid,
+            "status": "queued",
+            "direction": "outbound-api",
+            "uri": f"/2010-04-01/Accounts/{account_sid}/Calls/{call_sid}.json"
+        })
+
+    async def serve(self, ws_port, http_port):
+        http_server = await asyncio.start_server(self.http_handler, "127.0.0.1", http_port)
+        async with websockets.serve(self.websocket_handler, "127.0.0.1", ws_port, max_size=None):
+            async with http_server:
+                print("ready", flush=True)
+                await asyncio.Future()
+
+
+# ---------------------------------------------------------------------------
+# Server under test
+# ---------------------------------------------------------------------------
+
+async def serve_app(port, lag_file):
+    """Run main.app under uvicorn with an event-loop lag sampler in the same loop"""
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    import uvicorn
+    import main as server_main
+
+    async def sample_lag():
+        interval = 0.05
+        with open(lag_file, "a", buffering=1) as f:
+            while True:
+                expected = time.perf_counter() + interval
+                await asyncio.sleep(interval)
+                f.write(f"{time.time():.3f} {max(0.0, time.perf_counter() - expected) * 1000:.2f}\n")
+
+    server = uvicorn.Server(uvicorn.Config(server_main.app, host="127.0.0.1", port=port, log_level="warning"))
+    sampler = asyncio.create_task(sample_lag())
+    try:
+        await server.serve()
+    finally:
+        sampler.cancel()
+
+
+def app_environment(args, ports, lag_file):
+    env = dict(os.environ)
+    env.update({
+        "GROQ_API_KEY": "loadtest",
+        "DEEPGRAM_API_KEY": "loadtest",
+        "CARTESIA_API_KEY": "loadtest",
+        "SARVAM_API_KEY": "loadtest",
+        "TWILIO_ACCOUNT_SID": "AC" + "0" * 32,
+        "TWILIO_AUTH_TOKEN": "loadtest",
+        "TWILIO_PHONE_NUMBER": "+15005550006",
+        "DEEPGRAM_WS_URL": f"ws://127.0.0.1:{ports['ws']}",
+        "CARTESIA_WS_BASE": f"ws://127.0.0.1:{ports['ws']}",
+        "SARVAM_WS_URL": f"ws://127.0.0.1:{ports['ws']}",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{ports['http']}",
+        "TWILIO_API_BASE_URL": f"http://127.0.0.1:{ports['http']}",
+        "SERVER_URL": f"http://127.0.0.1:{ports['app']}",
+        "MONGODB_URL": os.environ.get("MONGODB_URL", "mongodb://127.0.0.1:27017"),
+        "MONGODB_DATABASE": os.environ.get("LOADTEST_MONGODB_DATABASE", "voiceai_loadtest"),
+        "HF_HUB_OFFLINE": "1",
+        "TRANSFORMERS_OFFLINE": "1",
+        "ANSWER_CACHE_ENABLED": "false",
+        "TTS_CACHE_MAX_MB": "0",
+        "TTS_CACHE_DIR": "",
+        "TTS_CACHE_WARM_AFTER": "1000000000",
+        "PRERENDER_WELCOME": "false",
+        "LOADTEST_LAG_FILE": lag_file,
+    })
+    for item in args.app_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+def wait_until_ready(port, process, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited during startup (code {process.returncode}), see the server log")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise SystemExit(f"Server not ready after {timeout:.0f}s")
+
+
+class ProcessSampler:
+    """CPU, RSS and thread count of a process from /proc/<pid>/stat"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.cpu = []
+        self.peak_rss_mb = 0.0
+        self.peak_threads = 0
+        self._last = None
+
+    def _read(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # Fields after "(comm)": utime=11, stime=12, num_threads=17, rss=21 (0-based)
+        return int(fields[11]) + int(fields[12]), int(fields[17]), int(fields[21]) * self.page_size
+
+    def sample(self):
+        try:
+            cpu_ticks, threads, rss = self._read()
+        except (OSError, IndexError):
+            return
+        now = time.perf_counter()
+        if self._last:
+            last_ticks, last_time = self._last
+            self.cpu.append((cpu_ticks - last_ticks) / self.ticks / (now - last_time) * 100)
+        self._last = (cpu_ticks, now)
+        self.peak_rss_mb = max(self.peak_rss_mb, rss / 1024 / 1024)
+        self.peak_threads = max(self.peak_threads, threads)
+
+
+def read_lag(lag_file, since, until):
+    lags = []
+    try:
+        with open(lag_file) as f:
+            for line in f:
+                stamp, _, lag = line.partition(" ")
+                if since <= float(stamp) <= until:
+                    lags.append(float(lag))
+    except (OSError, ValueError):
+        pass
+    return lags
+
+
+# ---------------------------------------------------------------------------
+# Simulated Twilio calls
+# ---------------------------------------------------------------------------
+
+async def simulated_call(args, turns, index, stop_at, results):
+    """One Twilio media stream: speak each turn, wait for the answer to finish playing"""
+    call_sid = f"CA{uuid.uuid4().hex}"
+    stream_sid = f"MZ{uuid.uuid4().hex}"
+    state = {"speech_end": None, "first_media": None, "playback_end": 0.0, "chunk": 0}
+    answered = asyncio.Event()
+
+    async with websockets.connect(f"ws://127.0.0.1:{args.app_port}/ws/media-stream", max_size=None) as ws:
+        async def send(event):
+            await ws.send(json.dumps(event))
+
+        async def echo_mark(name, delay):
+            # Twilio reports a mark once the audio queued before it has played
+            await asyncio.sleep(delay)
+            try:
+                await send({"event": "mark", "streamSid": stream_sid, "sequenceNumber": "0", "mark": {"name": name}})
+            except websockets.ConnectionClosed:
+                return
+            if name.startswith("response_end"):
+                answered.set()
+
+        async def receive():
+            async for raw in ws:
+                message = json.loads(raw)
+                event = message.get("event")
+                now = time.perf_counter()
+                if event == "media":
+                    if state["speech_end"] is not None and state["first_media"] is None:
+                        state["first_media"] = now
+                        results["latencies"].append(now - state["speech_end"])
+                    audio_seconds = len(message["media"]["payload"]) * 3 / 4 / 8000
+                    state["playback_end"] = max(state["playback_end"], now) + audio_seconds
+                elif event == "mark":
+                    asyncio.create_task(echo_mark(message["mark"]["name"], max(0.0, state["playback_end"] - now)))
+                elif event == "clear":
+                    state["playback_end"] = now
+                    results["clears"] += 1
+
+        next_tick = time.perf_counter()
+
+        async def send_frame(frame):
+            nonlocal next_tick
+            now = time.perf_counter()
+            if now < next_tick:
+                await asyncio.sleep(next_tick - now)
+            else:
+                results["driver_lag"].append(now - next_tick)
+            state["chunk"] += 1
+            await send({
+                "event": "media", "streamSid": stream_sid, "sequenceNumber": str(state["chunk"] + 2),
+                "media": {"track": "inbound", "chunk": str(state["chunk"]),
+                          "timestamp": str(state["chunk"] * 20),
+                          "payload": base64.b64encode(frame).decode()}
+            })
+            next_tick += FRAME_SECONDS
+
+        await send({"event": "connected", "protocol": "Call", "version": "1.0.0"})
+        await send({
+            "event": "start", "sequenceNumber": "1", "streamSid": stream_sid,
+            "start": {
+                "accountSid": "AC" + "0" * 32, "streamSid": stream_sid, "callSid": call_sid,
+                "tracks": ["inbound"],
+                "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": 8000, "channels": 1},
+                "customParameters": {"kb_id": args.kb_id, "language": args.language, "tts_engine": args.tts_engine}
+            }
+        })
+        receiver = asyncio.create_task(receive())
+
+        try:
+            # A short lead-in of silence, then turns until the scenario ends
+            for _ in range(25):
+                await send_frame(SILENCE)
+            for turn_index in itertools.count():
+                if time.perf_counter() >= stop_at or receiver.done():
+                    break
+                frames = turns[(index + turn_index) % len(turns)]
+                answered.clear()
+                state["speech_end"] = state["first_media"] = None
+                for frame in frames:
+                    await send_frame(frame)
+                state["speech_end"] = time.perf_counter()
+                results["turns"] += 1
+
+                deadline = state["speech_end"] + args.turn_timeout
+                while not answered.is_set() and time.perf_counter() < deadline:
+                    await send_frame(SILENCE)
+                if answered.is_set():
+                    results["answered"] += 1
+                else:
+                    results["timeouts"] += 1
+                for _ in range(int(args.think_time / FRAME_SECONDS)):
+                    await send_frame(SILENCE)
+
+            await send({"event": "stop", "sequenceNumber": str(state["chunk"] + 3), "streamSid": stream_sid,
+                        "stop": {"accountSid": "AC" + "0" * 32, "callSid": call_sid}})
+        except websockets.ConnectionClosed:
+            results["dropped"] += 1
+        finally:
+            receiver.cancel()
+
+
+async def run_level(args, turns, calls, sampler):
+    results = {"latencies": [], "driver_lag": [], "turns": 0, "answered": 0,
+               "timeouts": 0, "clears": 0, "dropped": 0, "errors": 0}
+    started = time.time()
+    stop_at = time.perf_counter() + args.duration
+
+    async def call_after(index, delay):
+        await asyncio.sleep(delay)
+        try:
+            await simulated_call(args, turns, index, stop_at, results)
+        except Exception as e:
+            results["errors"] += 1
+            print(f"  call {index} failed: {e}", file=sys.stderr)
+
+    async def sample():
+        while True:
+            sampler.sample()
+            await asyncio.sleep(0.5)
+
+    sampler_task = asyncio.create_task(sample())
+    stagger = args.ramp_seconds / max(1, calls)
+    await asyncio.gather(*(call_after(i, i * stagger) for i in range(calls)))
+    sampler_task.cancel()
+    results["window"] = (started, time.time())
+    return results
+
+
+# ---------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, nargs="*", default=[1, 5, 10, 25, 50], help="concurrency levels, in ramp order")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per level")
+    parser.add_argument("--ramp-seconds", type=float, default=2.0, help="spread call starts over this long")
+    parser.add_argument("--audio", help="raw 8kHz μ-law recording of caller speech (default: synthetic)")
+    parser.add_argument("--turns", type=int, default=5, help="synthetic caller turns")
+    parser.add_argument("--turn-timeout", type=float, default=10.0, help="seconds to wait for an answer")
+    parser.add_argument("--think-time", type=float, default=0.5, help="caller silence after the answer")
+    parser.add_argument("--kb-id", default="Akashvanni")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--tts-engine", default="cartesia", choices=["cartesia", "sarvam"])
+    parser.add_argument("--stt-latency", type=float, default=0.15, help="Deepgram result delay, seconds")
+    parser.add_argument("--endpointing", type=float, default=0.3, help="Deepgram silence before speech_final")
+    parser.add_argument("--interim-interval", type=float, default=0.3, help="seconds of speech per interim word")
+    parser.add_argument("--llm-ttft", type=float, default=0.25, help="Groq time to first token")
+    parser.add_argument("--llm-token-interval", type=float, default=0.015, help="Groq delay between tokens")
+    parser.add_argument("--tts-latency", type=float, default=0.12, help="Cartesia/Sarvam time to first audio")
+    parser.add_argument("--tts-speed", type=float, default=4.0, help="TTS audio produced per second of wall time")
+    parser.add_argument("--twilio-latency", type=float, default=0.2, help="Twilio REST response delay")
+    parser.add_argument("--jitter", type=float, default=0.3, help="+- fraction applied to every latency")
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--ws-port", type=int, default=9701, help="Deepgram/Cartesia/Sarvam stand-in port")
+    parser.add_argument("--http-port", type=int, default=9702, help="Groq/Twilio stand-in port")
+    parser.add_argument("--app-env", nargs="*", default=[], metavar="KEY=VALUE", help="extra server env vars")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--serve-standins", help=argparse.SUPPRESS)
+    parser.add_argument("--serve-app", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_standins:
+        asyncio.run(StandIns(json.loads(args.serve_standins)).serve(args.ws_port, args.http_port))
+        return
+    if args.serve_app:
+        asyncio.run(serve_app(args.app_port, os.environ["LOADTEST_LAG_FILE"]))
+        return
+
+    turns = load_turns(args.audio, args.turns)
+    workdir = tempfile.mkdtemp(prefix="voiceai-loadtest-")
+    lag_file = os.path.join(workdir, "loop_lag.log")
+    standin_config = {
+        "stt_latency": args.stt_latency, "endpointing": args.endpointing, "interim_interval": args.interim_interval,
+        "llm_ttft": args.llm_ttft, "llm_token_interval": args.llm_token_interval, "tts_latency": args.tts_latency,
+        "tts_speed": args.tts_speed, "twilio_latency": args.twilio_latency, "jitter": args.jitter
+    }
+    ports = {"app": args.app_port, "ws": args.ws_port, "http": args.http_port}
+
+    standins = subprocess.Popen(
+        [sys.executable, __file__, "--serve-standins", json.dumps(standin_config),
+         "--ws-port", str(args.ws_port), "--http-port", str(args.http_port)],
+        stdout=subprocess.PIPE, text=True
+    )
+    server_log = open(os.path.join(workdir, "server.log"), "w")
+    server = subprocess.Popen(
+        [sys.executable, __file__, "--serve-app", "--app-port", str(args.app_port)],
+        env=app_environment(args, ports, lag_file), stdout=server_log, stderr=subprocess.STDOUT
+    )
+    print(f"Server log: {server_log.name}")
+
+    rows = []
+    try:
+        if standins.stdout.readline().strip() != "ready":
+            raise SystemExit("Stand-ins failed to start")
+        wait_until_ready(args.app_port, server, args.startup_timeout)
+        sampler = ProcessSampler(server.pid)
+
+        print(f"{'calls':>5} {'turns':>6} {'answered':>8} {'timeout':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'lag p95':>8} {'lag max':>8} {'cpu %':>6} {'rss MB':>8} {'threads':>7}")
+        for calls in args.calls:
+            sampler.cpu = []
+            results = asyncio.run(run_level(args, turns, calls, sampler))
+            lags = read_lag(lag_file, *results["window"])
+            row = {
+                "calls": calls,
+                "turns": results["turns"],
+                "answered": results["answered"],
+                "timeouts": results["timeouts"],
+                "clears": results["clears"],
+                "dropped": results["dropped"],
+                "errors": results["errors"],
+                "latency_p50_ms": percentile(results["latencies"], 50) * 1000,
+                "latency_p95_ms": percentile(results["latencies"], 95) * 1000,
+                "latency_p99_ms": percentile(results["latencies"], 99) * 1000,
+                "loop_lag_p95_ms": percentile(lags, 95),
+                "loop_lag_max_ms": max(lags, default=0.0),
+                "cpu_percent": sum(sampler.cpu) / len(sampler.cpu) if sampler.cpu else 0.0,
+                "peak_rss_mb": sampler.peak_rss_mb,
+                "peak_threads": sampler.peak_threads,
+                "driver_lag_p95_ms": percentile(results["driver_lag"], 95) * 1000,
+            }
+            rows.append(row)
+            print(f"{calls:>5} {row['turns']:>6} {row['answered']:>8} {row['timeouts']:>7} "
+                  f"{row['latency_p50_ms']:>8.0f} {row['latency_p95_ms']:>8.0f} {row['latency_p99_ms']:>8.0f} "
+                  f"{row['loop_lag_p95_ms']:>8.1f} {row['loop_lag_max_ms']:>8.1f} {row['cpu_percent']:>6.0f} "
+                  f"{row['peak_rss_mb']:>8.1f} {row['peak_threads']:>7}")
+            if row["driver_lag_p95_ms"] > 20:
+                print(f"  ⚠️ load generator fell behind (media tick lag p95 {row['driver_lag_p95_ms']:.0f}ms), "
+                      f"latencies at this level are pessimistic")
+            if row["errors"] or row["dropped"]:
+                print(f"  ✗ {row['errors']} calls failed, {row['dropped']} dropped by the server")
+    finally:
+        server.terminate()
+        standins.terminate()
+        for process in (server, standins):
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        server_log.close()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": standin_config, "levels": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
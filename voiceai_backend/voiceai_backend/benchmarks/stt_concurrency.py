@@ -0,0 +1,163 @@
+"""Benchmark: thread-per-call Deepgram listener vs asyncio STT session
+
+Simulates N concurrent calls, each with a 20ms media loop and an STT
+"listener" that produces a transcript result every ~250ms, and measures:
+
+  - peak OS thread count
+  - peak RSS (MB)
+  - result delivery latency (producer -> per-call handler) p50/p95/p99
+  - event-loop lag p95 (how late a 20ms media tick fires)
+
+"thread" mode mirrors the old ConnectionManager: a daemon thread per call
+blocked in a listen loop, handing each result back to the loop with
+run_coroutine_threadsafe. "asyncio" mode mirrors DeepgramSTTSession: a
+reader task per call feeding an asyncio.Queue drained by a consumer task.
+
+Each (mode, calls) scenario runs in a fresh subprocess so RSS is not shared.
+
+Usage:
+    python benchmarks/stt_concurrency.py                 # 50/200/500 calls, both modes
+    python benchmarks/stt_concurrency.py --calls 200 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+MEDIA_INTERVAL = 0.02     # Twilio sends a 20ms frame per call
+RESULT_INTERVAL = 0.25    # Deepgram interim/final cadence per call
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def media_loop(stop, lags):
+    """Per-call media loop, records how late each 20ms tick fires"""
+    expected = time.perf_counter() + MEDIA_INTERVAL
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, expected - time.perf_counter()))
+        lags.append(max(0.0, time.perf_counter() - expected))
+        expected += MEDIA_INTERVAL
+
+
+async def run_thread_mode(calls, duration, latencies, lags, peak):
+    loop = asyncio.get_running_loop()
+    stop_flag = threading.Event()
+    stop = asyncio.Event()
+    state = [{"buffer": []} for _ in range(calls)]
+
+    async def handle(call_index, produced_at):
+        state[call_index]["buffer"].append(produced_at)
+        latencies.append(time.perf_counter() - produced_at)
+
+    def listen(call_index):
+        # Blocking listener, like start_listening() on the sync SDK client
+        while not stop_flag.is_set():
+            time.sleep(RESULT_INTERVAL * random.uniform(0.8, 1.2))
+            asyncio.run_coroutine_threadsafe(handle(call_index, time.perf_counter()), loop)
+
+    threads = [threading.Thread(target=listen, args=(i,), daemon=True) for i in range(calls)]
+    for thread in threads:
+        thread.start()
+    media = [asyncio.create_task(media_loop(stop, lags)) for _ in range(calls)]
+
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        peak["threads"] = max(peak["threads"], threading.active_count())
+        await asyncio.sleep(0.5)
+
+    stop_flag.set()
+    stop.set()
+    await asyncio.gather(*media)
+
+
+async def run_asyncio_mode(calls, duration, latencies, lags, peak):
+    stop = asyncio.Event()
+
+    async def reader(queue):
+        # Reader task, like DeepgramSTTSession._read_loop
+        while not stop.is_set():
+            await asyncio.sleep(RESULT_INTERVAL * random.uniform(0.8, 1.2))
+            queue.put_nowait(time.perf_counter())
+        queue.put_nowait(None)
+
+    async def consumer(queue):
+        buffer = []
+        while True:
+            produced_at = await queue.get()
+            if produced_at is None:
+                break
+            buffer.append(produced_at)
+            latencies.append(time.perf_counter() - produced_at)
+
+    tasks = []
+    for _ in range(calls):
+        queue = asyncio.Queue()
+        tasks.append(asyncio.create_task(reader(queue)))
+        tasks.append(asyncio.create_task(consumer(queue)))
+        tasks.append(asyncio.create_task(media_loop(stop, lags)))
+
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        peak["threads"] = max(peak["threads"], threading.active_count())
+        await asyncio.sleep(0.5)
+
+    stop.set()
+    await asyncio.gather(*tasks)
+
+
+def run_scenario(mode, calls, duration):
+    """Run one scenario in this process and return its metrics"""
+    latencies, lags, peak = [], [], {"threads": threading.active_count()}
+    runner = run_thread_mode if mode == "thread" else run_asyncio_mode
+    asyncio.run(runner(calls, duration, latencies, lags, peak))
+    return {
+        "mode": mode,
+        "calls": calls,
+        "peak_threads": peak["threads"],
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p95_ms": percentile(latencies, 95) * 1000,
+        "latency_p99_ms": percentile(latencies, 99) * 1000,
+        "loop_lag_p95_ms": percentile(lags, 95) * 1000,
+        "results": len(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, nargs="*", default=[50, 200, 500])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--modes", nargs="*", default=["thread", "asyncio"])
+    parser.add_argument("--single", nargs=2, metavar=("MODE", "CALLS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_scenario(args.single[0], int(args.single[1]), args.duration)))
+        return
+
+    print(f"{'mode':<8} {'calls':>5} {'threads':>8} {'rss MB':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'lag p95':>8}")
+    for calls in args.calls:
+        for mode in args.modes:
+            out = subprocess.run(
+                [sys.executable, __file__, "--single", mode, str(calls), "--duration", str(args.duration)],
+                capture_output=True, text=True, check=True
+            )
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{r['mode']:<8} {r['calls']:>5} {r['peak_threads']:>8} {r['peak_rss_mb']:>8.1f} "
+                  f"{r['latency_p50_ms']:>8.2f} {r['latency_p95_ms']:>8.2f} {r['latency_p99_ms']:>8.2f} "
+                  f"{r['loop_lag_p95_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
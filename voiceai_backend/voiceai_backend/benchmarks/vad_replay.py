@@ -0,0 +1,188 @@
+"""Replay benchmark: transcript accuracy and Deepgram audio saved by the local VAD gate
+
+Streams every recording of a replay corpus to Deepgram twice, once with
+all audio and once through VoiceActivityGate (same settings as main.py),
+and compares the final transcripts:
+
+  - suppressed %: caller audio the gate kept away from Deepgram
+  - WER all / WER gated: word error rate against <name>.txt next to the
+    recording, or against the ungated transcript when there is none
+  - utterances: speech_final results per run (endpointing must survive gating)
+
+Exits with status 1 when the gated WER is worse than the ungated one by more
+than --tolerance on the corpus, so it can gate changes to the VAD.
+
+Recordings are raw 8kHz μ-law (what Twilio sends), e.g. exported with
+    ffmpeg -i call.wav -ar 8000 -ac 1 -f mulaw call.ulaw
+
+Usage:
+    DEEPGRAM_API_KEY=... python benchmarks/vad_replay.py corpus/
+    python benchmarks/vad_replay.py corpus/ --offline          # suppression only, no Deepgram
+    python benchmarks/vad_replay.py corpus/ --preroll-ms 200 --hangover-ms 500 --language hi
+"""
+import argparse
+import asyncio
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vad import FRAME_BYTES, VoiceActivityGate  # noqa: E402
+
+
+def words(text):
+    return re.sub(r"[^\w\s]", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = words(reference), words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def make_gate(args, enabled):
+    return VoiceActivityGate(
+        enabled=enabled,
+        preroll_ms=args.preroll_ms,
+        hangover_ms=args.hangover_ms,
+        margin_db=args.margin_db,
+        min_db=args.min_db,
+        noise_window_ms=args.noise_window_ms
+    )
+
+
+async def transcribe(client, audio, args, gated):
+    """Stream one recording at --speed x real time, returns (transcript, utterances, gate)"""
+    from deepgram.listen.v1 import ListenV1CloseStream
+    from stt_session import DeepgramSTTSession
+
+    session = await DeepgramSTTSession(
+        client, "replay", language=args.language, model="nova-2", smart_format=True,
+        encoding="mulaw", sample_rate=8000, channels=1, interim_results=True,
+        endpointing=300, utterance_end_ms=1000, vad_events=True
+    ).start()
+    gate = make_gate(args, gated)
+    finals, utterances = [], 0
+
+    async def collect():
+        nonlocal utterances
+        while True:
+            result = await session.results.get()
+            if result is None:
+                return
+            if getattr(result, "type", None) == "Results" and result.is_final:
+                transcript = result.channel.alternatives[0].transcript
+                if transcript:
+                    finals.append(transcript)
+                utterances += bool(result.speech_final)
+
+    collector = asyncio.create_task(collect())
+    frame_time = FRAME_BYTES / 8000 / args.speed
+    clock = time.time()
+    for i in range(0, len(audio), FRAME_BYTES):
+        # The gate sees the call's clock (20ms per frame) regardless of replay speed
+        clock += FRAME_BYTES / 8000
+        frames = gate.process(audio[i:i + FRAME_BYTES], clock)
+        if frames:
+            await session.send_audio(b"".join(frames))
+        elif gate.keepalive_due(clock, 5.0):
+            await session.keep_alive()
+        await asyncio.sleep(frame_time)
+
+    await session.connection.send_close_stream(ListenV1CloseStream(type="CloseStream"))
+    try:
+        await asyncio.wait_for(collector, timeout=10)
+    except asyncio.TimeoutError:
+        collector.cancel()
+    await session.close()
+    return " ".join(finals), utterances, gate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of .ulaw recordings (optional .txt references)")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--speed", type=float, default=2.0, help="replay speed, x real time")
+    parser.add_argument("--preroll-ms", type=int, default=int(os.getenv("VAD_PREROLL_MS", "300")))
+    parser.add_argument("--hangover-ms", type=int, default=int(os.getenv("VAD_HANGOVER_MS", "600")))
+    parser.add_argument("--margin-db", type=float, default=float(os.getenv("VAD_MARGIN_DB", "12")))
+    parser.add_argument("--min-db", type=float, default=float(os.getenv("VAD_MIN_DB", "-50")))
+    parser.add_argument("--noise-window-ms", type=int, default=int(os.getenv("VAD_NOISE_WINDOW_MS", "3000")))
+    parser.add_argument("--tolerance", type=float, default=0.005, help="allowed corpus WER increase")
+    parser.add_argument("--offline", action="store_true", help="only measure suppression, no Deepgram")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.corpus, "*.ulaw")))
+    if not paths:
+        raise SystemExit(f"No .ulaw files in {args.corpus}")
+
+    client = None
+    if not args.offline:
+        from deepgram import AsyncDeepgramClient
+        api_key = os.getenv("DEEPGRAM_API_KEY")
+        if not api_key:
+            raise SystemExit("DEEPGRAM_API_KEY is required (or use --offline)")
+        client = AsyncDeepgramClient(api_key=api_key)
+
+    print(f"{'file':<28} {'audio s':>8} {'supp %':>7} {'WER all':>8} {'WER gate':>8} {'utt all':>7} {'utt gate':>8}")
+    total_audio = total_sent = 0.0
+    ref_words = errors_all = errors_gated = 0.0
+    for path in paths:
+        with open(path, "rb") as f:
+            audio = f.read()
+        name = os.path.basename(path)
+
+        if args.offline:
+            gate = make_gate(args, True)
+            for i in range(0, len(audio), FRAME_BYTES):
+                gate.process(audio[i:i + FRAME_BYTES], i / 8000)
+            stats = gate.stats()
+            total_audio += stats["audio_seconds"]
+            total_sent += stats["sent_seconds"]
+            print(f"{name:<28} {stats['audio_seconds']:>8.1f} {stats['suppressed_ratio'] * 100:>7.1f}")
+            continue
+
+        full_text, full_utterances, _ = asyncio.run(transcribe(client, audio, args, gated=False))
+        gated_text, gated_utterances, gate = asyncio.run(transcribe(client, audio, args, gated=True))
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(reference_path):
+            with open(reference_path) as f:
+                reference = f.read()
+        else:
+            reference = full_text
+
+        stats = gate.stats()
+        wer_all = word_error_rate(reference, full_text)
+        wer_gated = word_error_rate(reference, gated_text)
+        n = len(words(reference))
+        total_audio += stats["audio_seconds"]
+        total_sent += stats["sent_seconds"]
+        ref_words += n
+        errors_all += wer_all * n
+        errors_gated += wer_gated * n
+        print(f"{name:<28} {stats['audio_seconds']:>8.1f} {stats['suppressed_ratio'] * 100:>7.1f} "
+              f"{wer_all:>8.3f} {wer_gated:>8.3f} {full_utterances:>7} {gated_utterances:>8}")
+
+    suppressed = 1 - total_sent / total_audio if total_audio else 0.0
+    print(f"\nCorpus: {total_audio:.0f}s audio, {suppressed * 100:.1f}% not sent to Deepgram")
+    if args.offline or not ref_words:
+        return
+    corpus_all, corpus_gated = errors_all / ref_words, errors_gated / ref_words
+    print(f"WER all audio {corpus_all:.4f}, gated {corpus_gated:.4f}")
+    if corpus_gated > corpus_all + args.tolerance:
+        print(f"✗ Gated WER regressed by {corpus_gated - corpus_all:.4f} (tolerance {args.tolerance})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
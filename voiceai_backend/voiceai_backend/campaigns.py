@@ -5,6 +5,9 @@ from datetime import datetime
 from bson import ObjectId
 import os
 
+# Pre-rendered welcome audio is stored on the campaign but never returned by listings
+AUDIO_PROJECTION = {"welcome_audio": 0}
+
 class CampaignDB:
     """Database operations for campaign management"""
     
@@ -76,7 +79,7 @@ class CampaignDB:
     async def get_campaign(self, campaign_id: str) -> Optional[Dict]:
         """Get campaign by ID"""
         try:
-            campaign = await self.campaigns.find_one({"_id": ObjectId(campaign_id)})
+            campaign = await self.campaigns.find_one({"_id": ObjectId(campaign_id)}, AUDIO_PROJECTION)
             if campaign:
                 campaign["_id"] = str(campaign["_id"])
                 # Convert datetime objects to ISO format strings
@@ -102,7 +105,7 @@ class CampaignDB:
         if user_id:
             query["user_id"] = user_id
         
-        cursor = self.campaigns.find(query).sort("created_at", -1).skip(skip).limit(limit)
+        cursor = self.campaigns.find(query, AUDIO_PROJECTION).sort("created_at", -1).skip(skip).limit(limit)
         campaigns = await cursor.to_list(length=limit)
         
         for campaign in campaigns:
@@ -189,6 +192,32 @@ class CampaignDB:
         except:
             return False
     
+    async def set_welcome_audio(self, campaign_id: str, audio_key: str, audio: bytes) -> bool:
+        """Store the pre-rendered welcome message (8kHz μ-law) and its TTS cache key"""
+        try:
+            result = await self.campaigns.update_one(
+                {"_id": ObjectId(campaign_id)},
+                {"$set": {
+                    "welcome_audio_key": audio_key,
+                    "welcome_audio": audio,
+                    "welcome_audio_rendered_at": datetime.utcnow()
+                }}
+            )
+            return result.modified_count > 0
+        except:
+            return False
+    
+    async def get_welcome_audio(self, campaign_id: str, audio_key: str) -> Optional[bytes]:
+        """Pre-rendered welcome audio if it was rendered for this cache key"""
+        try:
+            campaign = await self.campaigns.find_one(
+                {"_id": ObjectId(campaign_id), "welcome_audio_key": audio_key},
+                {"welcome_audio": 1}
+            )
+            return bytes(campaign["welcome_audio"]) if campaign and campaign.get("welcome_audio") else None
+        except:
+            return None
+    
     async def get_failed_numbers(self, campaign_id: str) -> List[Dict]:
         """Get list of failed phone numbers from campaign"""
         try:
@@ -227,7 +256,7 @@ class CampaignDB:
                 "status": "scheduled",
                 "is_scheduled": True,
                 "scheduled_time": {"$lte": current_time}
-            })
+            }, AUDIO_PROJECTION)
             campaigns = await cursor.to_list(length=100)
             
             for campaign in campaigns:
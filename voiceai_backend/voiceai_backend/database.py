@@ -81,6 +81,13 @@ class CallHistoryDB:
                 call["updated_at"] = call["updated_at"].isoformat()
         return call
     
+    async def get_live_transcript(self, call_sid: str, since: int = 0) -> Optional[Dict[str, Any]]:
+        """Status and transcript messages from index `since` on, for polling a call in progress"""
+        return await self.collection.find_one(
+            {"call_sid": call_sid},
+            {"_id": 0, "status": 1, "user_id": 1, "transcript": {"$slice": [since, 1000]}}
+        )
+    
     async def update_call(self, call_sid: str, update_data: Dict[str, Any]) -> bool:
         """Update call record"""
         update_data["updated_at"] = datetime.utcnow()
@@ -146,6 +153,21 @@ class CallHistoryDB:
         result = await self.collection.delete_one({"call_sid": call_sid})
         return result.deleted_count > 0
     
+    async def get_latency_traces(
+        self,
+        filters: Dict[str, Any],
+        since: Optional[datetime] = None,
+        limit: int = 5000
+    ) -> List[Dict[str, Any]]:
+        """Stored per-turn latency traces of the most recent matching calls"""
+        query = {"latency.turns.0": {"$exists": True}, **filters}
+        if since:
+            query["started_at"] = {"$gte": since}
+        
+        cursor = self.collection.find(query, {"latency": 1}).sort("started_at", DESCENDING).limit(limit)
+        calls = await cursor.to_list(length=limit)
+        return [call["latency"] for call in calls]
+    
     async def get_calls_by_campaign(self, campaign_id: str) -> List[Dict[str, Any]]:
         """Get all calls for a specific campaign with full details"""
         cursor = self.collection.find({"campaign_id": campaign_id}).sort("started_at", ASCENDING)
@@ -188,6 +210,7 @@ async def connect_to_mongodb():
         await call_history_collection.create_index([("started_at", DESCENDING)])
         await call_history_collection.create_index([("campaign_id", ASCENDING)])
         await call_history_collection.create_index([("user_id", ASCENDING)])
+        await call_history_collection.create_index([("language", ASCENDING), ("tts_engine", ASCENDING)])
         
         # Create indexes for campaigns collection
         campaigns_collection = mongodb_database["campaigns"]
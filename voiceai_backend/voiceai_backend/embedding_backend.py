@@ -0,0 +1,121 @@
+# Embedding model backends - PyTorch SentenceTransformer or int8 ONNX Runtime
+import os
+from typing import List, Union
+
+import numpy as np
+
+BACKENDS = ("torch", "onnx")
+# onnxruntime, tokenizers and huggingface-hub are only needed by the opt-in onnx backend
+ONNX_INSTALL_HINT = "pip install -r requirements-onnx.txt"
+
+
+class OnnxEmbedder:
+    """all-MiniLM-L6-v2 style sentence embeddings on ONNX Runtime, no PyTorch
+
+    Runs a quantized (int8) export of the model with the same pipeline as the
+    SentenceTransformer: WordPiece tokenizer, mean pooling over the attention
+    mask, L2 normalisation. The model repo on the Hugging Face hub ships the
+    quantized exports under onnx/, so nothing is converted locally. Only the
+    encode() / get_sentence_embedding_dimension() subset of the
+    SentenceTransformer API used by this server is provided.
+    """
+
+    def __init__(self, model_name: str, onnx_file: str = "onnx/model_quint8_avx2.onnx",
+                 max_seq_length: int = 256, threads: int = 0):
+        """
+        Args:
+            model_name: Hub model id ("sentence-transformers/" is implied) or a local directory
+            onnx_file: Path of the ONNX export inside the model repo/directory
+            max_seq_length: Token limit, 256 like the SentenceTransformer config
+            threads: ONNX Runtime intra-op threads, 0 for its default
+        """
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(f"The onnx embedding backend needs onnxruntime and tokenizers ({ONNX_INSTALL_HINT}): {e}") from e
+
+        model_path = self._resolve(model_name, onnx_file)
+        tokenizer_path = self._resolve(model_name, "tokenizer.json")
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.model_path = model_path
+        self.dimension = int(self.encode("dimension probe").shape[0])
+
+    @staticmethod
+    def _resolve(model_name: str, filename: str) -> str:
+        if os.path.isdir(model_name):
+            return os.path.join(model_name, filename)
+        try:
+            from huggingface_hub import hf_hub_download
+        except ImportError as e:
+            raise ImportError(f"Downloading {model_name} needs huggingface-hub ({ONNX_INSTALL_HINT}): {e}") from e
+        repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        return hf_hub_download(repo, filename)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, convert_to_numpy: bool = True,
+               **kwargs) -> np.ndarray:
+        """float32 embeddings, (dimension,) for one string or (len, dimension) for a list"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        batches = []
+        for start in range(0, len(texts), max(1, batch_size)):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+        embeddings = np.vstack(batches) if batches else np.empty((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def load_embedding_model(model_name: str, backend: str = "torch", onnx_file: str = "onnx/model_quint8_avx2.onnx",
+                         threads: int = 0):
+    """Embedding model for a backend: "torch" (SentenceTransformer) or "onnx" (OnnxEmbedder, int8)
+
+    The import happens here so the ONNX backend never loads PyTorch. When the
+    onnx backend's packages are not installed the PyTorch model is returned
+    instead, check with isinstance(model, OnnxEmbedder).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+    if backend == "onnx":
+        try:
+            return OnnxEmbedder(model_name, onnx_file=onnx_file, threads=threads)
+        except ImportError as e:
+            print(f"✗ {e}, using PyTorch")
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def cosine_agreement(model, reference, texts: List[str]) -> dict:
+    """Cosine similarity between two models' embeddings of the same texts (min / mean / p1)"""
+    a = np.asarray(model.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    b = np.asarray(reference.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    a /= np.linalg.norm(a, axis=1, keepdims=True)
+    b /= np.linalg.norm(b, axis=1, keepdims=True)
+    cosines = np.sort((a * b).sum(axis=1))
+    return {
+        "texts": len(texts),
+        "min": round(float(cosines[0]), 4),
+        "p1": round(float(cosines[int(0.01 * (len(cosines) - 1))]), 4),
+        "mean": round(float(cosines.mean()), 4)
+    }
@@ -0,0 +1,178 @@
+# Cross-call micro-batching of query embeddings - one forward pass for concurrent turns
+import asyncio
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from tracing import percentile
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_WAIT_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+
+def _histogram(buckets) -> Dict[str, int]:
+    counts = {f"<={bucket}": 0 for bucket in buckets}
+    counts[f">{buckets[-1]}"] = 0
+    return counts
+
+
+def _percentiles(values, pcts) -> Dict[str, Optional[float]]:
+    ordered = sorted(values)
+    return {f"p{pct}": round(percentile(ordered, pct), 2) if ordered else None for pct in pcts}
+
+
+def _observe(histogram: Dict[str, int], buckets, value: float):
+    for bucket in buckets:
+        if value <= bucket:
+            histogram[f"<={bucket}"] += 1
+            return
+    histogram[f">{buckets[-1]}"] += 1
+
+
+class EmbeddingBatcher:
+    """Gathers query embeddings from concurrent calls and encodes them as one batch
+
+    The first query of a batch waits up to window_ms for others (no wait when
+    max_batch are already queued, or when the previous query came in so long
+    ago that nobody is likely to join); queries arriving while a batch is encoding
+    form the next one. Encoding runs on a single dedicated thread, so the
+    model does one forward pass at a time instead of many one-string passes
+    fighting over the GIL. Identical texts in flight share one future, and
+    recent results are kept in an LRU.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch: int = 32,
+        window_ms: float = 3.0,
+        cache_size: int = 1000
+    ):
+        """
+        Args:
+            encode: Blocking batch encoder, texts -> (len(texts), dimension) array
+            max_batch: Largest batch handed to encode
+            window_ms: How long the first query of a batch waits for company
+            cache_size: Recent query embeddings kept (0 disables)
+        """
+        self.encode = encode
+        self.max_batch = max(1, max_batch)
+        self.window = window_ms / 1000
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self._gap = 0.0  # seconds between the two most recent queries
+        self._last_queued: Optional[float] = None
+
+        # Metrics
+        self.requests = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.encoded = 0
+        self.errors = 0
+        self.batch_sizes = _histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = _histogram(QUEUE_WAIT_BUCKETS_MS)
+        self._recent_waits = deque(maxlen=2000)
+        self._recent_encodes = deque(maxlen=500)
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embedding of one text, batched with whatever other calls ask for meanwhile"""
+        self.requests += 1
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            self.cache_hits += 1
+            return cached
+        future = self._inflight.get(text)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[text] = future
+        now = time.perf_counter()
+        self._gap = now - self._last_queued if self._last_queued is not None else float("inf")
+        self._last_queued = now
+        self._queue.put_nowait((text, future, now))
+        return await asyncio.shield(future)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            busy = self._gap < 10 * self.window
+            if self.window and busy and self._queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.window)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            started = time.perf_counter()
+            for _, _, queued_at in batch:
+                wait_ms = (started - queued_at) * 1000
+                _observe(self.queue_wait_ms, QUEUE_WAIT_BUCKETS_MS, wait_ms)
+                self._recent_waits.append(wait_ms)
+            _observe(self.batch_sizes, BATCH_SIZE_BUCKETS, len(batch))
+            self.batches += 1
+            self.encoded += len(batch)
+
+            texts = [text for text, _, _ in batch]
+            try:
+                vectors = await loop.run_in_executor(self._executor, self.encode, texts)
+                self._recent_encodes.append((time.perf_counter() - started) * 1000)
+                for (text, future, _), vector in zip(batch, vectors):
+                    self._remember(text, vector)
+                    if not future.done():
+                        future.set_result(vector)
+            except Exception as e:
+                self.errors += 1
+                print(f"✗ Embedding batch of {len(batch)} failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for text in texts:
+                    self._inflight.pop(text, None)
+
+    def _remember(self, text: str, vector: np.ndarray):
+        if self.cache_size <= 0:
+            return
+        self._cache[text] = vector
+        self._cache.move_to_end(text)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def close(self):
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "window_ms": self.window * 1000,
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "avg_batch_size": round(self.encoded / self.batches, 2) if self.batches else None,
+            "errors": self.errors,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "batch_size_histogram": self.batch_sizes,
+            "queue_wait_ms_histogram": self.queue_wait_ms,
+            "queue_wait_ms": _percentiles(self._recent_waits, (50, 95, 99)),
+            "encode_ms": _percentiles(self._recent_encodes, (50, 95))
+        }
@@ -0,0 +1,268 @@
+# Resident knowledge bases - byte budget, LRU/LFU eviction, KB versions of active calls held
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+def estimate_kb_bytes(kb: dict) -> int:
+    """Approximate memory a loaded KB holds: index, texts and lexical index"""
+    total = 0
+    path = kb.get("path")
+    if path and os.path.exists(os.path.join(path, "index.faiss")):
+        total += os.path.getsize(os.path.join(path, "index.faiss"))
+    # The float32 embeddings are memory-mapped and only a few rows are read when re-ranking, not counted
+    texts = kb.get("texts", ())
+    if hasattr(texts, "nbytes"):
+        total += texts.nbytes
+    else:
+        # str object overhead (~50 bytes) plus the characters
+        total += sum(len(text) + 50 for text in texts)
+    lexical = kb.get("lexical")
+    if lexical is not None:
+        total += lexical.entries.nbytes + lexical.weights.nbytes + lexical.offsets.nbytes
+        total += 100 * len(lexical.vocabulary)
+    return total
+
+
+class KBCacheManager:
+    """Loaded KBs under a memory budget
+
+    Once the resident KBs exceed max_bytes, the least recently used ("lru")
+    or least often used ("lfu") KB is dropped. KBs pinned by a live call are
+    never evicted, so the budget may be exceeded while every resident KB is
+    in use. An evicted KB is simply reloaded from its persisted, memory-mapped
+    build on its next use (KBIndexStore), without re-embedding.
+
+    Calls hold the version they started with (acquire / release, counted per
+    kb_id and version). When put() swaps in a new version while calls still
+    hold the old one, the old one is retired: no new call gets it, it stays
+    counted against the budget, and it is dropped when its last call releases it.
+    Accessed from the event loop and from worker threads, hence the lock.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024, policy: str = "lru",
+                 on_version_dropped: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            max_bytes: Memory budget for resident KBs
+            policy: "lru" or "lfu" eviction order
+            on_version_dropped: Called with (kb_id, version) once a replaced version is no longer held by any call
+        """
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown KB cache policy '{policy}'")
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.on_version_dropped = on_version_dropped
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._entry_bytes: Dict[str, int] = {}
+        self._hits: Dict[str, int] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._used_at: Dict[str, float] = {}
+        self._refs: Dict[Tuple[str, str], int] = {}  # (kb_id, version) -> calls holding it
+        self._retired: Dict[Tuple[str, str], Tuple[dict, int]] = {}  # replaced versions still held: (kb, bytes)
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.swaps = 0
+
+    def __contains__(self, kb_id: str) -> bool:
+        return kb_id in self._entries
+
+    def get(self, kb_id: str) -> Optional[dict]:
+        """Resident KB (counted as a use), or None"""
+        with self._lock:
+            kb = self._entries.get(kb_id)
+            if kb is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(kb_id)
+            self._hits[kb_id] += 1
+            self._used_at[kb_id] = time.time()
+            self.hits += 1
+            return kb
+
+    def peek(self, kb_id: str) -> Optional[dict]:
+        """Resident KB without touching its recency or hit count"""
+        return self._entries.get(kb_id)
+
+    def put(self, kb_id: str, kb: dict) -> Optional[dict]:
+        """Make kb the resident copy of kb_id, returns the one it replaced"""
+        size = estimate_kb_bytes(kb)
+        dropped = None
+        with self._lock:
+            previous = self._entries.pop(kb_id, None)
+            if previous is not None:
+                previous_key = (kb_id, previous.get("version"))
+                if previous_key[1] != kb.get("version") and self._refs.get(previous_key):
+                    self._retired[previous_key] = (previous, self._entry_bytes[kb_id])
+                else:
+                    self.bytes -= self._entry_bytes[kb_id]
+                if previous_key[1] != kb.get("version"):
+                    self.swaps += 1
+                    if previous_key not in self._retired:
+                        dropped = previous_key
+            # Back to a version calls still hold: it is current again, not retired
+            restored = self._retired.pop((kb_id, kb.get("version")), None)
+            if restored is not None:
+                self.bytes -= restored[1]
+            self._entries[kb_id] = kb
+            self._entry_bytes[kb_id] = size
+            self._hits.setdefault(kb_id, 0)
+            self._loaded_at[kb_id] = self._used_at[kb_id] = time.time()
+            self.bytes += size
+            self.loads += 1
+            self._evict(keep=kb_id)
+        if dropped and self.on_version_dropped:
+            self.on_version_dropped(*dropped)
+        return previous
+
+    def _in_use(self, kb_id: str) -> int:
+        return self._refs.get((kb_id, self._entries[kb_id].get("version")), 0)
+
+    def _victim(self, keep: Optional[str]) -> Optional[str]:
+        candidates = [kb_id for kb_id in self._entries if kb_id != keep and not self._in_use(kb_id)]
+        if not candidates:
+            return None
+        if self.policy == "lfu":
+            return min(candidates, key=lambda kb_id: (self._hits[kb_id], self._used_at[kb_id]))
+        return candidates[0]  # OrderedDict order is least recently used first
+
+    def _evict(self, keep: Optional[str] = None):
+        while self.bytes > self.max_bytes:
+            kb_id = self._victim(keep)
+            if kb_id is None:
+                print(f"⚠️ KB cache over budget ({self.bytes / 1e6:.0f}/{self.max_bytes / 1e6:.0f} MB), "
+                      f"resident KBs are in use")
+                return
+            del self._entries[kb_id]
+            self.bytes -= self._entry_bytes.pop(kb_id)
+            self._hits.pop(kb_id, None)
+            self._loaded_at.pop(kb_id, None)
+            self._used_at.pop(kb_id, None)
+            self.evictions += 1
+            print(f"✓ KB cache evicted {kb_id} ({self.bytes / 1e6:.0f} MB resident)")
+
+    def acquire(self, kb_id: str) -> Optional[dict]:
+        """Resident KB held at its current version until release(), or None if not resident"""
+        with self._lock:
+            kb = self._entries.get(kb_id)
+            if kb is None:
+                return None
+            key = (kb_id, kb.get("version"))
+            self._refs[key] = self._refs.get(key, 0) + 1
+            self._entries.move_to_end(kb_id)
+            self._hits[kb_id] += 1
+            self._used_at[kb_id] = time.time()
+            return kb
+
+    def release(self, kb_id: str, version: str):
+        """Drop one hold on a KB version, a retired version is freed with its last hold"""
+        with self._lock:
+            key = (kb_id, version)
+            remaining = self._refs.get(key, 0) - 1
+            if remaining > 0:
+                self._refs[key] = remaining
+                return
+            self._refs.pop(key, None)
+            retired = self._retired.pop(key, None)
+            if retired is not None:
+                self.bytes -= retired[1]
+                print(f"✓ KB {kb_id} version {str(version)[:12]} released by its last call "
+                      f"({retired[1] / 1e6:.0f} MB freed)")
+            self._evict()
+        if retired is not None and self.on_version_dropped:
+            self.on_version_dropped(kb_id, version)
+
+    def stats(self) -> dict:
+        now = time.time()
+        lookups = self.hits + self.misses
+        with self._lock:
+            resident = [
+                {
+                    "kb_id": kb_id,
+                    "version": kb.get("version"),
+                    "entries": len(kb.get("texts", ())),
+                    "index": kb.get("index_kind"),
+                    "codec": kb.get("codec"),
+                    "bytes": self._entry_bytes[kb_id],
+                    "hits": self._hits[kb_id],
+                    "active_calls": self._in_use(kb_id),
+                    "resident_seconds": round(now - self._loaded_at[kb_id], 1),
+                    "idle_seconds": round(now - self._used_at[kb_id], 1)
+                }
+                for kb_id, kb in reversed(self._entries.items())
+            ]
+            retired = [
+                {
+                    "kb_id": kb_id,
+                    "version": version,
+                    "bytes": size,
+                    "active_calls": self._refs.get((kb_id, version), 0)
+                }
+                for (kb_id, version), (_, size) in self._retired.items()
+            ]
+        return {
+            "policy": self.policy,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "resident": resident,
+            "retired": retired,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "swaps": self.swaps
+        }
+
+
+class KBLease:
+    """One call's hold on a KB version
+
+    The version is acquired on first use (the KB may still be loading when the
+    call starts) and every later turn answers from it, even after a newer
+    upload is swapped in. release() at call end lets a retired version go.
+    """
+
+    def __init__(self, cache: KBCacheManager, kb_id: str, load: Callable[[str], Awaitable[None]]):
+        """
+        Args:
+            cache: KBCacheManager the version is held in
+            kb_id: Knowledge base of the call
+            load: Coroutine that makes kb_id resident in cache (raises if it can't)
+        """
+        self.cache = cache
+        self.kb_id = kb_id
+        self.load = load
+        self.kb: Optional[dict] = None
+        self.version: Optional[str] = None
+        self.released = False
+
+    async def get(self) -> dict:
+        """The call's KB, loading and acquiring it the first time"""
+        while self.kb is None:
+            await self.load(self.kb_id)
+            kb = self.cache.acquire(self.kb_id) if self.kb is None else None
+            if kb is None:
+                continue  # another turn got it meanwhile, or it was evicted before we could hold it
+            if self.released:  # the call ended while its KB loaded
+                self.cache.release(self.kb_id, kb.get("version"))
+                return kb
+            self.kb = kb
+            self.version = kb.get("version")
+        return self.kb
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        if self.kb is not None:
+            self.cache.release(self.kb_id, self.version)
+            self.kb = None
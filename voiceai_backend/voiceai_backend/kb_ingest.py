@@ -0,0 +1,204 @@
+# Background knowledge base ingestion - embedding runs in a process pool, off the event loop
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from embedding_backend import load_embedding_model
+from kb_store import KBIndexStore, read_kb_texts
+
+EMBED_BATCH_SIZE = 256
+
+# Worker process state (set by _init_worker, the model is loaded on first use)
+_progress_queue = None
+_models: Dict[tuple, object] = {}
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _build_kb(job_id: str, kb_id: str, source_path: str, store_config: dict, embedding_options: dict) -> dict:
+    """Embed and persist one KB (runs in a worker process), returns what the parent needs to load it"""
+    store = KBIndexStore(**{**store_config, "lexical": False})  # the parent builds its own on load
+    model_name = store.model_name
+
+    def embed(texts: List[str]):
+        import numpy as np
+        key = (model_name, embedding_options.get("backend"))
+        if key not in _models:
+            _models[key] = load_embedding_model(model_name, **embedding_options)
+        model = _models[key]
+        batches = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            batches.append(model.encode(texts[start:start + EMBED_BATCH_SIZE], convert_to_numpy=True))
+            _progress_queue.put((job_id, min(start + EMBED_BATCH_SIZE, len(texts)), len(texts)))
+        return np.vstack(batches)
+
+    kb = store.load_or_build(kb_id, source_path, parse=lambda: read_kb_texts(source_path), embed=embed)
+    return {"content_hash": kb["content_hash"], "count": len(kb["texts"]), "built": kb["built"]}
+
+
+class KBIngestionJob:
+    """One (re)build of a knowledge base"""
+
+    def __init__(self, kb_id: str):
+        self.job_id = uuid.uuid4().hex
+        self.kb_id = kb_id
+        self.status = "queued"  # queued -> embedding (only if the text changed) -> ready | failed
+        self.done = 0
+        self.total: Optional[int] = None
+        self.error: Optional[str] = None
+        self.version: Optional[str] = None
+        self.rebuilt: Optional[bool] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "kb_id": self.kb_id,
+            "status": self.status,
+            "progress": {"embedded": self.done, "total": self.total},
+            "version": self.version,
+            "rebuilt": self.rebuilt,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "seconds": round((self.finished_at or time.time()) - self.created_at, 2)
+        }
+
+
+class KBIngestionManager:
+    """Runs KB builds in a process pool and swaps finished indexes in
+
+    Embedding a large file never touches the event loop thread: the worker
+    process writes the build to the KBIndexStore, then the parent loads it
+    memory-mapped and hands it to on_ready, which replaces the KB in one
+    assignment. Live calls keep answering from the old index until then.
+    Only the newest job of a KB may swap in, so an older build that finishes
+    late cannot overwrite a newer upload.
+    """
+
+    def __init__(self, store: KBIndexStore, kb_directory: str, on_ready: Callable[[str, dict], Awaitable[None]],
+                 workers: int = 1, embedding_options: Optional[dict] = None):
+        """
+        Args:
+            store: KBIndexStore the workers write to and the parent loads from
+            kb_directory: Directory with the <kb_id>.txt sources
+            on_ready: Coroutine (kb_id, loaded kb) called once a build can be served
+            workers: Worker processes (each holds its own copy of the embedding model)
+            embedding_options: load_embedding_model keyword arguments (backend, onnx_file, threads)
+        """
+        self.store = store
+        self.embedding_options = embedding_options or {}
+        self.kb_directory = kb_directory
+        self.on_ready = on_ready
+        self.workers = max(1, workers)
+        self.jobs: Dict[str, KBIngestionJob] = {}
+        self.latest: Dict[str, KBIngestionJob] = {}  # kb_id -> newest job
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._progress = None
+        self._progress_task: Optional[asyncio.Task] = None
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            # spawn: never fork a process that has an event loop, threads and sockets
+            context = multiprocessing.get_context("spawn")
+            self._progress = context.Queue()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._progress,)
+            )
+            self._progress_task = asyncio.create_task(self._read_progress())
+
+    async def _read_progress(self):
+        while True:
+            try:
+                while True:
+                    job_id, done, total = self._progress.get_nowait()
+                    job = self.jobs.get(job_id)
+                    if job:
+                        job.status = "embedding"
+                        job.done, job.total = done, total
+            except queue.Empty:
+                pass
+            await asyncio.sleep(0.25)
+
+    def active_job(self, kb_id: str) -> Optional[KBIngestionJob]:
+        job = self.latest.get(kb_id)
+        return job if job and job.status in ("queued", "embedding") else None
+
+    def submit(self, kb_id: str, force: bool = False) -> KBIngestionJob:
+        """Start building a KB, or return the build already running unless force (new content)"""
+        source_path = os.path.join(self.kb_directory, f"{kb_id}.txt")
+        if not os.path.exists(source_path):
+            raise FileNotFoundError(f"Knowledge base file '{source_path}' not found")
+        job = self.active_job(kb_id)
+        if job and not force:
+            return job
+
+        self._ensure_pool()
+        self._prune()
+        job = KBIngestionJob(kb_id)
+        self.jobs[job.job_id] = job
+        self.latest[kb_id] = job
+        asyncio.create_task(self._run(job, source_path))
+        return job
+
+    async def _run(self, job: KBIngestionJob, source_path: str):
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self._pool, _build_kb, job.job_id, job.kb_id, source_path, self.store.config(),
+                dict(self.embedding_options)
+            )
+            kb = await asyncio.to_thread(self.store.load, job.kb_id, result["content_hash"])
+            if kb is None:
+                raise RuntimeError("build finished but could not be loaded")
+            job.version = kb["version"]
+            job.rebuilt = result["built"]
+            job.total = job.done = result["count"]
+            if self.latest.get(job.kb_id) is job:
+                await self.on_ready(job.kb_id, kb)
+            job.status = "ready"
+            print(f"✓ KB ingestion {job.kb_id} ready ({result['count']} entries, "
+                  f"{'embedded' if result['built'] else 'unchanged'}, {time.time() - job.created_at:.1f}s)")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"✗ KB ingestion {job.kb_id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            if not job.future.done():
+                if job.status == "ready":
+                    job.future.set_result(job)
+                else:
+                    job.future.set_exception(RuntimeError(job.error))
+                    job.future.exception()  # nobody may be waiting, don't warn about it
+
+    def _prune(self, keep_seconds: float = 3600):
+        """Forget finished jobs after an hour, except each KB's latest"""
+        cutoff = time.time() - keep_seconds
+        for job_id, job in list(self.jobs.items()):
+            if job.finished_at and job.finished_at < cutoff and self.latest.get(job.kb_id) is not job:
+                del self.jobs[job_id]
+
+    def status(self, kb_id: str) -> Optional[dict]:
+        job = self.latest.get(kb_id)
+        return job.to_dict() if job else None
+
+    def shutdown(self):
+        if self._progress_task and not self._progress_task.done():
+            self._progress_task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
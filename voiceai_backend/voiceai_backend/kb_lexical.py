@@ -0,0 +1,108 @@
+# Lexical (BM25) retrieval over KB entries and rank fusion with the vector search
+import re
+from typing import Dict, List
+
+import numpy as np
+
+# Latin words and numbers, or runs of Devanagari (its vowel signs are not \w)
+TOKEN_PATTERN = re.compile(r"[\u0900-\u097F]+|[^\W_]+")
+DIGIT_GROUPING = re.compile(r"(?<=\d),(?=\d)")  # "4,999" / "1,00,000" -> one number, as STT may write either
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word and number tokens, English plurals folded ("plans" -> "plan")"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(DIGIT_GROUPING.sub("", text.lower())):
+        if len(token) > 3 and token.isascii() and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """In-memory BM25 inverted index over a KB's entries
+
+    Postings are stored CSR-style in flat numpy arrays (per-term offsets into
+    one entry-id array), and each posting carries its precomputed BM25 weight,
+    so a query only slices the arrays of its terms and sums weights per entry.
+    Terms in more than max_df of the entries carry almost no signal and are
+    left out, which keeps the lists a query touches short.
+    """
+
+    def __init__(self, texts: List[str], k1: float = 1.2, b: float = 0.75, max_df: float = 0.5):
+        """
+        Args:
+            texts: KB entries, ids are list positions (same as the FAISS index)
+            k1: Term frequency saturation
+            b: Entry length normalisation
+            max_df: Highest fraction of entries a term may appear in and stay indexed
+        """
+        self.count = len(texts)
+        term_ids: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        lengths = np.zeros(self.count, dtype=np.float32)
+        for entry, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[entry] = len(tokens)
+            for token in tokens:
+                rows.append(term_ids.setdefault(token, len(term_ids)))
+                cols.append(entry)
+
+        # (term, entry) pairs -> term frequency, sorted by term then entry
+        pairs = np.array(rows, dtype=np.int64) * max(1, self.count) + np.array(cols, dtype=np.int64)
+        pairs, tf = np.unique(pairs, return_counts=True)
+        terms = pairs // max(1, self.count)
+        entries = (pairs % max(1, self.count)).astype(np.int32)
+
+        df = np.bincount(terms, minlength=len(term_ids))
+        idf = np.log(1 + (self.count - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_length = float(lengths.mean()) if self.count else 0.0
+        norm = k1 * (1 - b + b * lengths[entries] / max(avg_length, 1e-9))
+        weights = idf[terms] * tf * (k1 + 1) / (tf + norm)
+
+        keep = df[terms] <= max(1, max_df * self.count)
+        self.entries = entries[keep]
+        self.weights = weights[keep].astype(np.float32)
+        self.offsets = np.zeros(len(term_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms[keep], minlength=len(term_ids)), out=self.offsets[1:])
+        self.vocabulary = term_ids
+
+    def search(self, query: str, top_k: int) -> List[int]:
+        """Entry ids of the top_k BM25 matches, best first (empty when no query term is indexed)"""
+        spans = []
+        for token in set(tokenize(query)):
+            term = self.vocabulary.get(token)
+            if term is not None and self.offsets[term + 1] > self.offsets[term]:
+                spans.append((self.offsets[term], self.offsets[term + 1]))
+        if not spans:
+            return []
+        entries = np.concatenate([self.entries[start:end] for start, end in spans])
+        weights = np.concatenate([self.weights[start:end] for start, end in spans])
+        if len(entries) * 16 > self.count:
+            # Long lists: a dense accumulator over all entries beats sorting the postings
+            scores = np.bincount(entries, weights=weights, minlength=self.count)
+            candidates = np.flatnonzero(scores)
+            scores = scores[candidates]
+        else:
+            candidates, slots = np.unique(entries, return_inverse=True)
+            scores = np.bincount(slots, weights=weights)
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return candidates[best].tolist()
+
+    def stats(self) -> dict:
+        return {"entries": self.count, "terms": len(self.vocabulary), "postings": len(self.entries)}
+
+
+def fuse_rankings(rankings: List[List[int]], top_k: int, rrf_k: int = 60) -> List[int]:
+    """Reciprocal rank fusion: sum of 1 / (rrf_k + rank) over the rankings an entry appears in"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, entry in enumerate(ranking):
+            scores[entry] = scores.get(entry, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(scores, key=lambda entry: -scores[entry])[:top_k]
+
@@ -0,0 +1,448 @@
+# On-disk knowledge base indexes - FAISS index, embeddings and texts, loaded memory-mapped
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from typing import Callable, List, Optional
+
+import faiss
+import numpy as np
+
+from kb_lexical import BM25Index, fuse_rankings
+
+FORMAT_VERSION = 2  # 1: texts.json, 2: packed texts (older builds are converted without re-embedding)
+ADD_BATCH = 65536  # vectors added to an index at a time, bounds the copy of a memory-mapped matrix
+TRAIN_SAMPLE = 65536  # vectors used to train a scalar quantizer
+CODECS = ("fp32", "fp16", "int8")
+# Flat/SQ/HNSW storage is only mapped in place with IO_FLAG_MMAP_IFC (IO_FLAG_MMAP copies it into
+# private memory); IVF inverted lists map with IO_FLAG_MMAP, and IVF can't take both flags
+MMAP_FLAGS = {"ivfpq": faiss.IO_FLAG_MMAP}
+SQ_TYPES = {"fp16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}
+
+
+def file_content_hash(path: str) -> str:
+    """sha256 of a KB source file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_kb_texts(path: str) -> List[str]:
+    """Non-empty stripped lines of a KB source file, one entry each"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    texts = [line.strip() for line in content.split("\n") if line.strip()]
+    if not texts:
+        raise ValueError(f"Knowledge base file '{path}' is empty")
+    return texts
+
+
+class PackedTexts:
+    """KB entries as one contiguous UTF-8 buffer plus an offsets array
+
+    Stands in for the list of str (len, indexing, iteration): a million short
+    str objects cost ~50 bytes of header each and are scattered over the heap,
+    whereas the buffer and offsets load memory-mapped from texts.bin and
+    text_offsets.npy. Entries are decoded on access.
+    """
+
+    def __init__(self, buffer: np.ndarray, offsets: np.ndarray):
+        """
+        Args:
+            buffer: uint8 array of all entries' UTF-8 bytes back to back
+            offsets: int64 array, entry i is buffer[offsets[i]:offsets[i + 1]]
+        """
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def from_texts(cls, texts: List[str]) -> "PackedTexts":
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    @classmethod
+    def load(cls, path: str) -> "PackedTexts":
+        offsets = np.load(os.path.join(path, "text_offsets.npy"), mmap_mode="r")
+        if offsets[-1] == 0:
+            return cls(np.empty(0, dtype=np.uint8), offsets)
+        return cls(np.memmap(os.path.join(path, "texts.bin"), dtype=np.uint8, mode="r"), offsets)
+
+    def save(self, path: str):
+        self.buffer.tofile(os.path.join(path, "texts.bin"))
+        np.save(os.path.join(path, "text_offsets.npy"), self.offsets)
+
+    @property
+    def nbytes(self) -> int:
+        return self.buffer.nbytes + self.offsets.nbytes
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("KB entry index out of range")
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def search_kb(kb: dict, query: np.ndarray, top_k: int) -> List[int]:
+    """Entry ids of the top_k nearest KB entries to a (1, dimension) float32 query
+
+    IVF-PQ and int8 distances are approximate, so their candidates
+    (rerank x top_k) are re-ordered by exact distance against the
+    memory-mapped float32 embeddings.
+    """
+    rerank = kb.get("rerank", 1)
+    _, ids = kb["index"].search(query, top_k * rerank)
+    ids = ids[0][ids[0] >= 0]  # IVF returns -1 when the probed lists hold fewer than k
+    if rerank > 1 and len(ids) > top_k:
+        vectors = np.asarray(kb["embeddings"][ids], dtype="float32")
+        distances = ((vectors - query[0]) ** 2).sum(axis=1)
+        ids = ids[np.argsort(distances)[:top_k]]
+    return ids[:top_k].tolist()
+
+
+def hybrid_search_kb(kb: dict, query: str, query_emb: np.ndarray, top_k: int,
+                     candidates: int = 10, rrf_k: int = 60) -> List[int]:
+    """top_k entries fusing the vector ranking with the BM25 ranking of the query text
+
+    Product names, plan names and numbers match poorly as embeddings but
+    exactly as terms. Falls back to the vector ranking alone when the KB has
+    no lexical index or no query term is in it.
+    """
+    vector_ids = search_kb(kb, query_emb, max(top_k, candidates))
+    lexical = kb.get("lexical")
+    lexical_ids = lexical.search(query, max(top_k, candidates)) if lexical is not None else []
+    if not lexical_ids:
+        return vector_ids[:top_k]
+    return fuse_rankings([vector_ids, lexical_ids], top_k, rrf_k)
+
+
+class KBIndexStore:
+    """Persisted per-KB FAISS index, embedding matrix and texts
+
+    Each build lives in its own immutable directory named after the source
+    content hash and the embedding model, e.g.
+    <root>/<kb_id>/<hash>-<model>/{index.faiss, embeddings.npy, texts.bin, text_offsets.npy, meta.json}.
+    Loads map the index file in place (MMAP_FLAGS) and np.load(mmap_mode="r")
+    the rest, so uvicorn workers on one host share the pages and a cold start
+    does not re-embed.
+    A new directory is only built when the source text or the model changes.
+    Replaced builds are deleted only once no call can still need them (see
+    _remove_old_builds).
+
+    The index type follows the KB size: exact flat search below hnsw_min
+    entries, HNSW up to ivfpq_min, IVF-PQ (48 bytes a vector) above. When the
+    thresholds or build parameters change, the index is rebuilt from the
+    stored embeddings without re-embedding. Search-time recall knobs
+    (ef_search, nprobe, rerank) are applied at load and need no rebuild.
+    Flat and HNSW vectors are stored with the codec: fp32, fp16 (half the
+    memory, practically lossless) or int8 scalar quantization (a quarter).
+    embeddings.npy always keeps float32, the source for rebuilds and re-ranking.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        model_name: str,
+        dimension: int,
+        hnsw_min: int = 50000,
+        ivfpq_min: int = 1000000,
+        hnsw_m: int = 32,
+        ef_construction: int = 80,
+        ef_search: int = 64,
+        nprobe: int = 16,
+        rerank: int = 4,
+        lexical: bool = True,
+        codec: str = "fp16",
+        keep_builds: int = 2,
+        build_grace_seconds: float = 7200.0
+    ):
+        """
+        Args:
+            root: Directory holding the persisted indexes
+            model_name: Embedding model, part of each build's identity
+            dimension: Embedding dimension of the model
+            hnsw_min: Entries from which an HNSW graph replaces exact search
+            ivfpq_min: Entries from which IVF-PQ replaces HNSW
+            hnsw_m: HNSW neighbours per node (memory vs recall)
+            ef_construction: HNSW build-time candidate list
+            ef_search: HNSW search-time candidate list (latency vs recall)
+            nprobe: IVF lists scanned per query (latency vs recall)
+            rerank: IVF-PQ / int8 candidates per result re-ordered by exact distance (1 disables)
+            lexical: Build the in-memory BM25 index of the texts on load
+            codec: Vector storage of flat and HNSW indexes, "fp32", "fp16" or "int8"
+            keep_builds: Newest builds of a KB never deleted, the current one included
+            build_grace_seconds: How long a replaced build is kept after its successor was built,
+                at least the longest call
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown vector codec '{codec}', expected one of {CODECS}")
+        self.root = root
+        self.model_name = model_name
+        self.dimension = dimension
+        self.model_tag = re.sub(r"[^\w.-]", "_", f"{model_name}-{dimension}")
+        self.hnsw_min = hnsw_min
+        self.ivfpq_min = ivfpq_min
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.nprobe = nprobe
+        self.rerank = max(1, rerank)
+        self.lexical = lexical
+        self.codec = codec
+        self.keep_builds = max(1, keep_builds)
+        self.build_grace_seconds = build_grace_seconds
+
+        # Metrics
+        self.loads = 0
+        self.builds = 0
+        self.reindexes = 0
+
+    def config(self) -> dict:
+        """Constructor arguments, so a worker process can open the same store"""
+        return {
+            "root": self.root,
+            "model_name": self.model_name,
+            "dimension": self.dimension,
+            "hnsw_min": self.hnsw_min,
+            "ivfpq_min": self.ivfpq_min,
+            "hnsw_m": self.hnsw_m,
+            "ef_construction": self.ef_construction,
+            "ef_search": self.ef_search,
+            "nprobe": self.nprobe,
+            "rerank": self.rerank,
+            "lexical": self.lexical,
+            "codec": self.codec,
+            "keep_builds": self.keep_builds,
+            "build_grace_seconds": self.build_grace_seconds
+        }
+
+    def index_spec(self, count: int) -> dict:
+        """Index type and build parameters for a KB of count entries"""
+        if count < self.hnsw_min:
+            return {"kind": "flat", "codec": self.codec}
+        if count < self.ivfpq_min:
+            return {"kind": "hnsw", "codec": self.codec, "m": self.hnsw_m, "ef_construction": self.ef_construction}
+        # ~4*sqrt(n) lists; PQ sub-quantizers of about 8 dimensions, 8 bits each
+        nlist = int(4 * np.sqrt(count))
+        subquantizers = next(m for m in range(max(1, self.dimension // 8), 0, -1) if self.dimension % m == 0)
+        return {"kind": "ivfpq", "nlist": nlist, "m": subquantizers, "nbits": 8}
+
+    def _write_index(self, path: str, embeddings: np.ndarray, spec: dict):
+        """Build the index described by spec over embeddings and write it atomically into path"""
+        codec = spec.get("codec", "fp32")
+        if spec["kind"] == "flat":
+            if codec == "fp32":
+                index = faiss.IndexFlatL2(self.dimension)
+            else:
+                index = faiss.IndexScalarQuantizer(self.dimension, SQ_TYPES[codec], faiss.METRIC_L2)
+        elif spec["kind"] == "hnsw":
+            if codec == "fp32":
+                index = faiss.IndexHNSWFlat(self.dimension, spec["m"])
+            else:
+                index = faiss.IndexHNSWSQ(self.dimension, SQ_TYPES[codec], spec["m"])
+            index.hnsw.efConstruction = spec["ef_construction"]
+        else:
+            index = faiss.index_factory(self.dimension, f"IVF{spec['nlist']},PQ{spec['m']}x{spec['nbits']}")
+
+        if not index.is_trained:
+            # int8 needs per-dimension ranges; 64 training vectors per IVF list is plenty for k-means
+            sample_size = min(len(embeddings), spec["nlist"] * 64 if "nlist" in spec else TRAIN_SAMPLE)
+            sample = np.random.default_rng(0).choice(len(embeddings), sample_size, replace=False)
+            index.train(np.ascontiguousarray(embeddings[np.sort(sample)], dtype="float32"))
+
+        for start in range(0, len(embeddings), ADD_BATCH):
+            index.add(np.ascontiguousarray(embeddings[start:start + ADD_BATCH], dtype="float32"))
+
+        tmp = os.path.join(path, f"index.faiss.tmp-{os.getpid()}")
+        faiss.write_index(index, tmp)
+        os.replace(tmp, os.path.join(path, "index.faiss"))
+
+    def _apply_search_params(self, index, kind: str):
+        if kind == "hnsw":
+            index.hnsw.efSearch = self.ef_search
+        elif kind == "ivfpq":
+            faiss.extract_index_ivf(index).nprobe = self.nprobe
+
+    def _read_meta(self, kb_id: str, content_hash: str) -> Optional[dict]:
+        """meta.json of the build for this content and model, None if there is no valid one"""
+        path = self._build_dir(kb_id, content_hash)
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (meta.get("format") not in (1, FORMAT_VERSION) or meta.get("content_hash") != content_hash
+                or meta.get("model") != self.model_name):
+            return None
+        return meta
+
+    def _build_dir(self, kb_id: str, content_hash: str) -> str:
+        return os.path.join(self.root, kb_id, f"{content_hash[:16]}-{self.model_tag}")
+
+    def load(self, kb_id: str, content_hash: str) -> Optional[dict]:
+        """Memory-mapped KB for this content and model, None if it was never built or needs a new index"""
+        path = self._build_dir(kb_id, content_hash)
+        meta = self._read_meta(kb_id, content_hash)
+        if (meta is None or meta["format"] != FORMAT_VERSION
+                or meta.get("index") != self.index_spec(meta.get("count", 0))):
+            return None
+        try:
+            flags = MMAP_FLAGS.get(meta["index"]["kind"], faiss.IO_FLAG_MMAP_IFC)
+            index = faiss.read_index(os.path.join(path, "index.faiss"), flags)
+            embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+            texts = PackedTexts.load(path)
+        except (OSError, ValueError, RuntimeError):
+            return None
+        kind = meta["index"]["kind"]
+        self._apply_search_params(index, kind)
+        self.loads += 1
+        lossy = kind == "ivfpq" or meta["index"].get("codec") == "int8"
+        return {
+            "index": index,
+            "index_kind": kind,
+            "codec": meta["index"].get("codec", "pq"),
+            "rerank": self.rerank if lossy else 1,
+            "texts": texts,
+            "lexical": BM25Index(texts) if self.lexical else None,
+            "embeddings": embeddings,
+            "version": content_hash[:16],
+            "content_hash": content_hash,
+            "path": path
+        }
+
+    def save(self, kb_id: str, content_hash: str, texts: List[str], embeddings: np.ndarray) -> dict:
+        """Persist a freshly embedded KB and return it loaded from disk"""
+        final = self._build_dir(kb_id, content_hash)
+        tmp = f"{final}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        spec = self.index_spec(len(texts))
+        self._write_index(tmp, embeddings, spec)
+        np.save(os.path.join(tmp, "embeddings.npy"), embeddings)
+        PackedTexts.from_texts(texts).save(tmp)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "format": FORMAT_VERSION,
+                "kb_id": kb_id,
+                "content_hash": content_hash,
+                "model": self.model_name,
+                "dimension": self.dimension,
+                "count": len(texts),
+                "index": spec,
+                "built_at": time.time()
+            }, f)
+
+        try:
+            os.rename(tmp, final)
+        except OSError:
+            # Another worker finished the same build first, use theirs
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.builds += 1
+        self._remove_old_builds(kb_id, keep=final)
+
+        kb = self.load(kb_id, content_hash)
+        if kb is None:
+            raise RuntimeError(f"Persisted KB '{kb_id}' could not be loaded back from {final}")
+        return kb
+
+    def reindex(self, kb_id: str, content_hash: str) -> Optional[dict]:
+        """Rebuild only the index of an existing build from its stored embeddings, None if there is no build
+
+        Also converts format 1 builds (texts.json) to packed texts.
+        """
+        meta = self._read_meta(kb_id, content_hash)
+        if meta is None:
+            return None
+        path = self._build_dir(kb_id, content_hash)
+        try:
+            embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+            if meta["format"] == 1:
+                with open(os.path.join(path, "texts.json"), encoding="utf-8") as f:
+                    PackedTexts.from_texts(json.load(f)).save(path)
+        except (OSError, ValueError):
+            return None
+        spec = self.index_spec(len(embeddings))
+        if meta.get("index") != spec:
+            self._write_index(path, embeddings, spec)
+        meta.update({"format": FORMAT_VERSION, "index": spec, "count": len(embeddings)})
+        tmp = os.path.join(path, f"meta.json.tmp-{os.getpid()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+        if os.path.exists(os.path.join(path, "texts.json")):
+            os.remove(os.path.join(path, "texts.json"))
+        self.reindexes += 1
+        return self.load(kb_id, content_hash)
+
+    def load_current(self, kb_id: str, source_path: str) -> Optional[dict]:
+        """Persisted KB matching the source file as it is now, None if it needs (re)building"""
+        return self.load(kb_id, file_content_hash(source_path))
+
+    def load_or_build(self, kb_id: str, source_path: str, parse: Callable[[], List[str]],
+                      embed: Callable[[List[str]], np.ndarray]) -> dict:
+        """Load the persisted KB for the current source file, embedding it only if needed"""
+        content_hash = file_content_hash(source_path)
+        kb = self.load(kb_id, content_hash) or self.reindex(kb_id, content_hash)
+        if kb is not None:
+            kb["built"] = False
+            return kb
+        texts = parse()
+        kb = self.save(kb_id, content_hash, texts, embed(texts))
+        kb["built"] = True
+        return kb
+
+    @staticmethod
+    def _built_at(path: str) -> float:
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                return float(json.load(f)["built_at"])
+        except (OSError, ValueError, KeyError):
+            return os.path.getmtime(path)
+
+    def _remove_old_builds(self, kb_id: str, keep: str):
+        """Delete builds that calls can no longer need
+
+        Mapped pages survive an unlink only in a process that still has the
+        build open. A call holds the version it started with (KBLease) and may
+        have to load it again after an eviction, or for the first time in
+        another worker. So the newest keep_builds builds stay, and an older one
+        goes only once the build that replaced it is build_grace_seconds old.
+        """
+        kb_dir = os.path.join(self.root, kb_id)
+        builds = sorted(
+            ((self._built_at(os.path.join(kb_dir, name)), os.path.join(kb_dir, name))
+             for name in os.listdir(kb_dir) if ".tmp-" not in name),
+            reverse=True
+        )
+        now = time.time()
+        for position in range(self.keep_builds, len(builds)):
+            replaced_at = builds[position - 1][0]
+            path = builds[position][1]
+            if path != keep and now - replaced_at > self.build_grace_seconds:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self) -> dict:
+        return {
+            "root": self.root,
+            "model": self.model_tag,
+            "loads": self.loads,
+            "builds": self.builds,
+            "reindexes": self.reindexes
+        }
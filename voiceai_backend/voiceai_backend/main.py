@@ -6,9 +6,10 @@ from twilio.twiml.voice_response import VoiceResponse, Connect, Stream
 from twilio.rest import Client
 import openai
 from openai import OpenAI
-from groq import Groq
+from groq import AsyncGroq
+import httpx
 import os, io
-import faiss
+import uuid
 import numpy as np
 import json
 import base64
@@ -18,14 +19,11 @@ import audioop
 import time
 import traceback
 from sarvamai import AsyncSarvamAI, AudioOutput, EventResponse
+from sarvamai.environment import SarvamAIEnvironment
 from functools import lru_cache
-from deepgram import DeepgramClient
-from deepgram.core.events import EventType as LiveTranscriptionEvents
-import threading
-import websockets
-from websockets.protocol import State
+from deepgram import AsyncDeepgramClient
+from deepgram.environment import DeepgramClientEnvironment
 from contextlib import asynccontextmanager
-from sentence_transformers import SentenceTransformer
 from datetime import datetime
 from database import connect_to_mongodb, close_mongodb_connection, get_call_history_db, CallHistoryDB
 from campaigns import get_campaign_db, CampaignDB
@@ -35,6 +33,21 @@ from wallet import get_wallet_db, initialize_wallet_db
 from transactions import get_transaction_db, initialize_transaction_db
 from payments import PaymentService
 from scheduler import initialize_scheduler, get_scheduler
+from stt_session import DeepgramSTTSession
+from kb_store import KBIndexStore, hybrid_search_kb, read_kb_texts, search_kb
+from kb_ingest import KBIngestionManager
+from kb_cache import KBCacheManager, KBLease
+from embedding_service import EmbeddingBatcher
+from embedding_backend import OnnxEmbedder, cosine_agreement, load_embedding_model
+from vad import VoiceActivityGate
+from tts_pool import CartesiaConnectionPool
+from tts_mux import CartesiaMultiplexer
+from tts_cache import TTSAudioCache, make_tts_cache_key
+from tracing import CallTrace, summarize_latency
+from speculation import SpeculativeTurn, SpeculationStats, utterance_similarity
+from answer_cache import SemanticAnswerCache
+from post_call import bill_call, initialize_post_call_queue, get_post_call_queue
+from transcripts import ConversationMemory, estimate_tokens, initialize_transcript_writer, get_transcript_writer
 from typing import Optional
 import shutil
 import aiofiles
@@ -53,22 +66,62 @@ print(f"[STARTUP] WebSocket URL will be: {SERVER_URL.replace('https://', 'wss://
 
 twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 
+# Provider endpoint overrides, used to point the server at local stand-ins (benchmarks/load_test.py)
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL")
+if TWILIO_API_BASE_URL:
+    twilio_client.api.base_url = TWILIO_API_BASE_URL
+
 # Initialize Sentence Transformer for embeddings (free, local, fast)
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')  # 384 dimensions, very fast
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+# torch: SentenceTransformer (fp32 PyTorch), onnx: int8 ONNX Runtime export of the same model, no PyTorch import
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_OPTIONS = {
+    "backend": EMBEDDING_BACKEND,
+    "onnx_file": os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx"),
+    "threads": int(os.getenv("EMBEDDING_THREADS", "0"))
+}
+# Startup check that the onnx backend agrees with PyTorch (stored KB embeddings stay valid), else fall back
+EMBEDDING_VERIFY = os.getenv("EMBEDDING_VERIFY", "false").lower() == "true"
+EMBEDDING_MIN_COSINE = float(os.getenv("EMBEDDING_MIN_COSINE", "0.98"))
+embedding_model = load_embedding_model(EMBEDDING_MODEL_NAME, **EMBEDDING_OPTIONS)  # 384 dimensions, very fast
+if EMBEDDING_BACKEND == "onnx" and not isinstance(embedding_model, OnnxEmbedder):
+    EMBEDDING_BACKEND = EMBEDDING_OPTIONS["backend"] = "torch"  # onnx packages missing, ingestion workers follow
 
 # Groq Configuration for ultra-fast LLM inference
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY environment variable is required")
 
-groq_client = Groq(api_key=GROQ_API_KEY)
+# One async client and one pooled HTTP connection set shared by every call, so
+# token streams are consumed on the event loop instead of in worker threads
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "100"))
+groq_http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=GROQ_MAX_CONNECTIONS,
+        max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+        keepalive_expiry=60
+    ),
+    timeout=httpx.Timeout(30.0, connect=5.0)
+)
+groq_client = AsyncGroq(api_key=GROQ_API_KEY, http_client=groq_http_client)
 
 # Deepgram Configuration for ultra-low latency STT
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
 if not DEEPGRAM_API_KEY:
     raise ValueError("DEEPGRAM_API_KEY environment variable is required")
 
-deepgram_client = DeepgramClient(api_key=DEEPGRAM_API_KEY)
+DEEPGRAM_WS_URL = os.getenv("DEEPGRAM_WS_URL")  # e.g. ws://127.0.0.1:9001, default is Deepgram's production host
+if DEEPGRAM_WS_URL:
+    deepgram_client = AsyncDeepgramClient(
+        api_key=DEEPGRAM_API_KEY,
+        environment=DeepgramClientEnvironment(
+            base=DEEPGRAM_WS_URL.replace("ws://", "http://").replace("wss://", "https://"),
+            production=DEEPGRAM_WS_URL,
+            agent=DEEPGRAM_WS_URL
+        )
+    )
+else:
+    deepgram_client = AsyncDeepgramClient(api_key=DEEPGRAM_API_KEY)
 
 # Cartesia TTS Configuration for ultra-fast voice synthesis
 CARTESIA_API_KEY = os.getenv("CARTESIA_API_KEY")
@@ -78,16 +131,66 @@ CARTESIA_HINDI_VOICE_ID = os.getenv("CARTESIA_HINDI_VOICE_ID", "47f3bbb1-e98f-4e
 if not CARTESIA_API_KEY:
     raise ValueError("CARTESIA_API_KEY environment variable is required")
 
+CARTESIA_WS_BASE = os.getenv("CARTESIA_WS_BASE", "wss://api.cartesia.ai")
+CARTESIA_WS_URL = f"{CARTESIA_WS_BASE}/tts/websocket?api_key={CARTESIA_API_KEY}&cartesia_version=2024-06-10"
+
+# Pre-warmed Cartesia connections (keeps the handshake off the first turn)
+cartesia_pool = CartesiaConnectionPool(
+    CARTESIA_WS_URL,
+    min_size=int(os.getenv("CARTESIA_POOL_MIN_SIZE", "6")),
+    max_size=int(os.getenv("CARTESIA_POOL_MAX_SIZE", "100")),
+    idle_timeout=float(os.getenv("CARTESIA_POOL_IDLE_TIMEOUT", "300")),
+    ping_interval=float(os.getenv("CARTESIA_POOL_PING_INTERVAL", "20"))
+)
+
+# All calls share a few pooled sockets, each TTS generation is its own context_id
+cartesia_mux = CartesiaMultiplexer(
+    cartesia_pool,
+    sockets=int(os.getenv("CARTESIA_MUX_SOCKETS", "4")),
+    max_contexts_per_socket=int(os.getenv("CARTESIA_MUX_MAX_CONTEXTS", "50"))
+)
+
 # Sarvam TTS Configuration for Indian language voice synthesis
 SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
 SARVAM_HINDI_SPEAKER = os.getenv("SARVAM_HINDI_SPEAKER", "anushka")
 SARVAM_MODEL = "bulbul:v2"
+SARVAM_WS_URL = os.getenv("SARVAM_WS_URL")  # e.g. ws://127.0.0.1:9003, default is Sarvam's production host
+sarvam_environment = SarvamAIEnvironment(
+    base=SARVAM_WS_URL.replace("ws://", "http://").replace("wss://", "https://"),
+    creative=SARVAM_WS_URL.replace("ws://", "http://").replace("wss://", "https://"),
+    production=SARVAM_WS_URL
+) if SARVAM_WS_URL else SarvamAIEnvironment.PRODUCTION
 
 if SARVAM_API_KEY:
     print(f"[STARTUP] Sarvam TTS enabled: model={SARVAM_MODEL}, speaker={SARVAM_HINDI_SPEAKER}")
 else:
     print("[STARTUP] Sarvam TTS not configured, Hindi will use Cartesia")
 
+# Barge-in: caller speech during bot playback stops the bot and starts a new turn
+BARGE_IN_MIN_WORDS = int(os.getenv("BARGE_IN_MIN_WORDS", "2"))
+BARGE_IN_ON_VAD = os.getenv("BARGE_IN_ON_VAD", "false").lower() == "true"  # interrupt on Deepgram SpeechStarted alone
+
+# Local VAD: only caller speech (plus pre-roll/hangover) is streamed to Deepgram
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", "300"))      # audio sent ahead of detected speech
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "600"))    # keep streaming after speech, > Deepgram endpointing
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "12"))       # speech threshold above the noise floor
+VAD_MIN_DB = float(os.getenv("VAD_MIN_DB", "-50"))            # nothing quieter than this is speech (dBFS)
+VAD_NOISE_WINDOW_MS = int(os.getenv("VAD_NOISE_WINDOW_MS", "3000"))  # noise floor = quietest frame in this span
+DEEPGRAM_KEEPALIVE_SECONDS = float(os.getenv("DEEPGRAM_KEEPALIVE_SECONDS", "5"))
+
+# Speculative generation: start RAG + LLM once the interim transcript stops changing
+SPECULATIVE_ENABLED = os.getenv("SPECULATIVE_ENABLED", "false").lower() == "true"
+SPECULATIVE_STABLE_MS = int(os.getenv("SPECULATIVE_STABLE_MS", "300"))        # interim unchanged this long
+SPECULATIVE_MIN_WORDS = int(os.getenv("SPECULATIVE_MIN_WORDS", "3"))          # don't speculate on fragments
+SPECULATIVE_MATCH_RATIO = float(os.getenv("SPECULATIVE_MATCH_RATIO", "0.9"))  # final vs speculated text similarity
+speculation_stats = SpeculationStats()
+
+# Conversation messages kept in RAM per call (the full transcript is persisted turn by turn)
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "16"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "600"))   # history tokens per prompt, older turns get summarized
+HISTORY_SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", "llama-3.1-8b-instant")
+
 # Language configuration
 LANGUAGE_CONFIG = {
     "en": {
@@ -104,42 +207,105 @@ LANGUAGE_CONFIG = {
     }
 }
 
+# Synthesized-audio cache: recurring clauses are played without a TTS round trip
+tts_cache = TTSAudioCache(
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "64")) * 1024 * 1024,
+    disk_dir=os.getenv("TTS_CACHE_DIR") or None,
+    warm_after=int(os.getenv("TTS_CACHE_WARM_AFTER", "3"))
+)
+tts_warm_semaphore = asyncio.Semaphore(2)  # background cache syntheses at a time
+
+# Play welcome messages as pre-rendered audio over the media stream instead of Twilio <Say>
+PRERENDER_WELCOME = os.getenv("PRERENDER_WELCOME", "true").lower() == "true"
+welcome_renders = {}  # cache key -> in-flight render task
+welcome_prerenders = {}  # (cache key, campaign_id) -> prerender_welcome_audio task, held until it finishes
+
 # Knowledge Base Configuration
 KB_DIRECTORY = "knowledge_bases"
-kb_cache = {}
+# Loaded KBs under a byte budget, evicted ones reload from their persisted build on next use
+kb_cache = KBCacheManager(
+    max_bytes=int(os.getenv("KB_CACHE_MAX_MB", "512")) * 1024 * 1024,
+    policy=os.getenv("KB_CACHE_POLICY", "lru").lower(),
+    # Answers of a replaced KB version go once the last call on it has ended
+    on_version_dropped=lambda kb_id, version: answer_cache.drop_version(kb_id, version)
+)
+kb_source_stats = {}  # kb_id -> (mtime, size) of the source file the served version was read from
+KB_SOURCE_CHECK_SECONDS = float(os.getenv("KB_SOURCE_CHECK_SECONDS", "5"))  # per KB, how often a changed source is looked for
+kb_source_checked_at = {}
+# hybrid: vector and BM25 rankings fused (names, plans, numbers), vector: embeddings only
+KB_RETRIEVAL_MODE = os.getenv("KB_RETRIEVAL_MODE", "hybrid").lower()
+KB_HYBRID_CANDIDATES = int(os.getenv("KB_HYBRID_CANDIDATES", "10"))  # per ranking, before fusion
+KB_RRF_K = int(os.getenv("KB_RRF_K", "60"))
+# Embedded KBs persisted next to the sources, rebuilt only when the text or embedding model changes.
+# Index type by size: exact below KB_HNSW_MIN_ENTRIES, HNSW below KB_IVFPQ_MIN_ENTRIES, IVF-PQ above
+kb_index_store = KBIndexStore(
+    os.getenv("KB_INDEX_DIR", os.path.join(KB_DIRECTORY, ".index")),
+    EMBEDDING_MODEL_NAME,
+    embedding_model.get_sentence_embedding_dimension(),
+    hnsw_min=int(os.getenv("KB_HNSW_MIN_ENTRIES", "50000")),
+    ivfpq_min=int(os.getenv("KB_IVFPQ_MIN_ENTRIES", "1000000")),
+    hnsw_m=int(os.getenv("KB_HNSW_M", "32")),
+    ef_construction=int(os.getenv("KB_HNSW_EF_CONSTRUCTION", "80")),
+    ef_search=int(os.getenv("KB_HNSW_EF_SEARCH", "64")),
+    nprobe=int(os.getenv("KB_IVF_NPROBE", "16")),
+    rerank=int(os.getenv("KB_IVF_RERANK", "4")),
+    lexical=KB_RETRIEVAL_MODE == "hybrid",
+    codec=os.getenv("KB_VECTOR_CODEC", "fp16").lower(),  # fp32 | fp16 | int8 (flat and HNSW indexes)
+    keep_builds=int(os.getenv("KB_KEEP_BUILDS", "2")),
+    build_grace_seconds=float(os.getenv("KB_BUILD_GRACE_SECONDS", "7200"))  # longer than any call
+)
 embedding_cache = {}  # NEW: Cache embeddings to avoid repeated API calls
 
+# Query embeddings of concurrent turns are encoded together in small batches
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "true").lower() == "true"
+embedding_batcher = EmbeddingBatcher(
+    lambda texts: embedding_model.encode(texts, batch_size=len(texts), convert_to_numpy=True),
+    max_batch=int(os.getenv("EMBED_MAX_BATCH", "32")),
+    window_ms=float(os.getenv("EMBED_BATCH_WINDOW_MS", "3")),
+    cache_size=int(os.getenv("EMBED_CACHE_SIZE", "1000"))
+)
+
+# Semantic answer cache: recurring questions on a KB are answered without an LLM call
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MIN_WORDS = int(os.getenv("ANSWER_CACHE_MIN_WORDS", "4"))  # short replies ("yes", "okay") depend on context
+answer_cache = SemanticAnswerCache(
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+)
+
 # Global WebSocket Connection Manager
 class ConnectionManager:
     """Manages per-call Deepgram and Cartesia WebSocket connections for parallel processing"""
     def __init__(self):
-        self.deepgram_connections = {}  # call_id -> connection
-        self.cartesia_connections = {}  # call_id -> websocket
+        self.deepgram_connections = {}  # call_id -> DeepgramSTTSession
+        self.cartesia_connections = {}  # call_id -> CartesiaCallHandle on the shared multiplexer
         self.sarvam_connections = {}    # call_id -> AsyncSarvamAI streaming ws
         self.is_initialized = False
     
     async def create_cartesia_connection(self, call_id: str):
-        """Create a new Cartesia WebSocket connection for a specific call"""
+        """Attach a call to the shared Cartesia multiplexer"""
         try:
-            cartesia_url = f"wss://api.cartesia.ai/tts/websocket?api_key={CARTESIA_API_KEY}&cartesia_version=2024-06-10"
-            cartesia_ws = await websockets.connect(cartesia_url)
-            self.cartesia_connections[call_id] = cartesia_ws
-            print(f"✓ Cartesia WebSocket created for call: {call_id}")
-            return cartesia_ws
+            cartesia_tts = cartesia_mux.for_call(call_id)
+            self.cartesia_connections[call_id] = cartesia_tts
+            print(f"✓ Cartesia attached for call: {call_id}")
+            return cartesia_tts
         except Exception as e:
             print(f"✗ Failed to connect to Cartesia for call {call_id}: {e}")
             return None
     
     def get_cartesia_connection(self, call_id: str):
-        """Get Cartesia WebSocket for a specific call"""
+        """Get Cartesia handle for a specific call"""
         return self.cartesia_connections.get(call_id)
     
-    def create_deepgram_connection(self, call_id: str, language: str = "en"):
-        """Create a new Deepgram connection for a specific call"""
+    async def create_deepgram_connection(self, call_id: str, language: str = "en"):
+        """Create a new asyncio Deepgram STT session for a specific call"""
         try:
-            dg_connection_manager = deepgram_client.listen.v1.connect(
-                model="nova-2",
+            session = DeepgramSTTSession(
+                deepgram_client,
+                call_id,
                 language=language,
+                model="nova-2",
                 smart_format=True,
                 encoding="mulaw",
                 sample_rate=8000,
@@ -149,44 +315,31 @@ class ConnectionManager:
                 utterance_end_ms=1000,
                 vad_events=True,
             )
-            
-            dg_connection = dg_connection_manager.__enter__()
-            self.deepgram_connections[call_id] = {
-                'connection': dg_connection,
-                'manager': dg_connection_manager
-            }
+            await session.start()
+            self.deepgram_connections[call_id] = session
             print(f"✓ Deepgram connection created for call: {call_id}")
-            return dg_connection
+            return session
         except Exception as e:
             print(f"✗ Failed to create Deepgram connection: {e}")
             return None
     
-    def cleanup_deepgram(self, call_id: str):
+    async def cleanup_deepgram(self, call_id: str):
         """Cleanup Deepgram connection for a specific call"""
         if call_id in self.deepgram_connections:
             try:
-                conn_data = self.deepgram_connections[call_id]
-                try:
-                    conn_data['connection']._websocket.close()
-                except:
-                    pass
-                try:
-                    conn_data['manager'].__exit__(None, None, None)
-                except:
-                    pass
-                del self.deepgram_connections[call_id]
+                session = self.deepgram_connections.pop(call_id)
+                await session.close()
                 print(f"✓ Deepgram connection cleaned up for call: {call_id}")
             except Exception as e:
                 print(f"✗ Error cleaning up Deepgram: {e}")
     
     async def cleanup_cartesia(self, call_id: str):
-        """Cleanup Cartesia connection for a specific call"""
+        """Cancel any Cartesia contexts a call still has open"""
         if call_id in self.cartesia_connections:
             try:
-                cartesia_ws = self.cartesia_connections[call_id]
-                await cartesia_ws.close()
-                del self.cartesia_connections[call_id]
-                print(f"✓ Cartesia connection cleaned up for call: {call_id}")
+                cartesia_tts = self.cartesia_connections.pop(call_id)
+                await cartesia_tts.close()
+                print(f"✓ Cartesia contexts cleaned up for call: {call_id}")
             except Exception as e:
                 print(f"✗ Error cleaning up Cartesia: {e}")
 
@@ -196,7 +349,7 @@ class ConnectionManager:
             print(f"✗ Sarvam API key not configured")
             return None
         try:
-            client = AsyncSarvamAI(api_subscription_key=SARVAM_API_KEY)
+            client = AsyncSarvamAI(api_subscription_key=SARVAM_API_KEY, environment=sarvam_environment)
             self.sarvam_connections[call_id] = client
             print(f"✓ Sarvam client created for call: {call_id}")
             return client
@@ -242,9 +395,12 @@ async def lifespan(app: FastAPI):
     await initialize_transaction_db()
     print("✓ Wallet and transaction databases initialized")
     
-    # Pre-initialize knowledge base
+    if EMBEDDING_VERIFY and EMBEDDING_BACKEND != "torch":
+        await asyncio.to_thread(verify_embedding_backend)
+
+    # Pre-initialize knowledge base (mapped in a thread, or embedded by the ingestion workers)
     try:
-        initialize_kb("Akashvanni")
+        await ensure_kb_loaded("Akashvanni")
         print("✓ KB pre-loaded")
     except Exception as e:
         print(f"Warning: Could not pre-load KB: {e}")
@@ -252,6 +408,21 @@ async def lifespan(app: FastAPI):
     # Initialize campaign scheduler
     initialize_scheduler(process_campaign)
     print("✓ Campaign scheduler initialized")
+
+    # Start the batched transcript writer
+    initialize_transcript_writer(db, flush_interval=float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", "1.0")))
+
+    # Start post-call workers (also resumes jobs left over from a previous run)
+    await initialize_post_call_queue(
+        db,
+        process_post_call_job,
+        workers=int(os.getenv("POST_CALL_WORKERS", "4")),
+        max_attempts=int(os.getenv("POST_CALL_MAX_ATTEMPTS", "5"))
+    )
+
+    # Warm the Cartesia connection pool and open the shared TTS sockets
+    await cartesia_pool.start()
+    await cartesia_mux.start()
     
     print("✓ All connections ready (per-call Deepgram + Cartesia)")
     
@@ -261,7 +432,18 @@ async def lifespan(app: FastAPI):
     scheduler = get_scheduler()
     scheduler.stop()
     print("✓ Campaign scheduler stopped")
+
+    await get_post_call_queue().stop()
+    await get_transcript_writer().stop()
+    kb_ingestion.shutdown()
+    await embedding_batcher.close()
+
+    await cartesia_mux.stop()
+    await cartesia_pool.stop()
     
+    # Close the shared Groq HTTP connection pool
+    await groq_client.close()
+
     # Close MongoDB connection
     await close_mongodb_connection()
 
@@ -278,75 +460,173 @@ app.add_middleware(
 )
 
 
-def load_kb_from_file(kb_id: str):
-    """Load knowledge base text from file"""
-    kb_file = os.path.join(KB_DIRECTORY, f"{kb_id}.txt")
-    if not os.path.exists(kb_file):
-        raise FileNotFoundError(f"Knowledge base file '{kb_file}' not found")
-    
-    with open(kb_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    kb_texts = [line.strip() for line in content.split('\n') if line.strip()]
-    if not kb_texts:
-        raise ValueError(f"Knowledge base file '{kb_file}' is empty")
-    
-    return kb_texts
+def kb_source_stat(kb_id: str):
+    """(mtime, size) of a KB source file, None if it does not exist"""
+    try:
+        stat = os.stat(os.path.join(KB_DIRECTORY, f"{kb_id}.txt"))
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def load_kb(kb_id: str):
+    """Current version of a KB for RAG in a worker thread, mapped from its persisted build if it was evicted
+
+    Never embeds: building goes through ensure_kb_loaded and the ingestion
+    workers, which turn paths await before calling this.
+    """
+    kb = kb_cache.get(kb_id)
+    if kb is not None:
+        return kb
+    kb = kb_index_store.load_current(kb_id, os.path.join(KB_DIRECTORY, f"{kb_id}.txt"))
+    if kb is None:
+        raise LookupError(f"Knowledge base '{kb_id}' is not built yet")
+    kb_cache.put(kb_id, kb)
+    return kb
+
+async def swap_in_kb(kb_id: str, kb: dict):
+    """Serve a freshly built KB to new calls, calls in progress keep the version they hold"""
+    previous = kb_cache.put(kb_id, kb)
+    if previous is not None and previous["version"] != kb["version"]:
+        print(f"✓ KB {kb_id} swapped to version {kb['version'][:12]} (was {previous['version'][:12]})")
+
+# Uploads and first use of an unbuilt KB are embedded in worker processes
+kb_ingestion = KBIngestionManager(
+    kb_index_store,
+    KB_DIRECTORY,
+    on_ready=swap_in_kb,
+    workers=int(os.getenv("KB_INGEST_WORKERS", "1")),
+    embedding_options=EMBEDDING_OPTIONS
+)
 
-def initialize_kb(kb_id: str):
-    """Initialize and cache a knowledge base from file"""
+async def ensure_kb_loaded(kb_id: str):
+    """Get a KB into kb_cache without blocking the event loop
+
+    A persisted build is mapped in a worker thread, anything that needs
+    embedding goes through an ingestion job. A resident KB whose source file
+    changed since it was read (uploaded through another server process, or
+    edited in place) is rebuilt in the background and swapped in when ready,
+    meanwhile the resident version keeps serving. Raises FileNotFoundError for
+    an unknown KB.
+    """
+    if not kb_id or kb_id == "general":
+        return
     if kb_id in kb_cache:
+        schedule_kb_source_check(kb_id)
         return
-    
-    kb_texts = load_kb_from_file(kb_id)
-    dimension = 384  # all-MiniLM-L6-v2 produces 384-dim embeddings
-    index = faiss.IndexFlatL2(dimension)
-    
-    # Batch embeddings for faster initialization using sentence transformers
-    embeddings = embedding_model.encode(kb_texts, convert_to_numpy=True)
-    emb_array = embeddings.astype('float32')
-    index.add(emb_array)
-    
-    kb_cache[kb_id] = {
-        "index": index,
-        "texts": kb_texts
-    }
-    
-    print(f"✓ Initialized KB: {kb_id} ({len(kb_texts)} entries)")
+    job = kb_ingestion.active_job(kb_id)
+    if job is None:
+        kb_path = os.path.join(KB_DIRECTORY, f"{kb_id}.txt")
+        if not os.path.exists(kb_path):
+            raise FileNotFoundError(f"Knowledge base file '{kb_path}' not found")
+        kb_source_stats[kb_id] = kb_source_stat(kb_id)
+        kb = await asyncio.to_thread(kb_index_store.load_current, kb_id, kb_path)
+        if kb is not None:
+            if kb_id not in kb_cache:
+                kb_cache.put(kb_id, kb)
+            return
+        job = kb_ingestion.submit(kb_id)
+    await job.future
 
-def load_kb(kb_id: str):
-    """Load a specific knowledge base from cache"""
-    if kb_id not in kb_cache:
-        initialize_kb(kb_id)
-    return kb_cache[kb_id]
+def schedule_kb_source_check(kb_id: str):
+    """Look for a changed KB source in the background, at most every KB_SOURCE_CHECK_SECONDS per KB"""
+    now = time.time()
+    if now - kb_source_checked_at.get(kb_id, 0) < KB_SOURCE_CHECK_SECONDS:
+        return
+    kb_source_checked_at[kb_id] = now
+    asyncio.create_task(check_kb_source(kb_id))
+
+async def check_kb_source(kb_id: str):
+    """Start rebuilding a KB whose source file changed since it was read, without waiting for it"""
+    stat = await asyncio.to_thread(kb_source_stat, kb_id)
+    if stat is None or stat == kb_source_stats.get(kb_id) or kb_ingestion.active_job(kb_id) is not None:
+        return
+    kb_source_stats[kb_id] = stat
+    print(f"✓ KB {kb_id} source changed, reloading in background")
+    try:
+        kb_ingestion.submit(kb_id)
+    except FileNotFoundError as e:
+        print(f"⚠️ KB reload skipped: {e}")
+
+async def preload_kb(kb_lease: KBLease):
+    """Background KB load at call start, the first turn waits for it if still running"""
+    try:
+        await kb_lease.get()
+        print(f"✓ KB initialized: {kb_lease.kb_id} (version {str(kb_lease.version)[:12]})")
+    except Exception as e:
+        print(f"Warning: KB init failed: {e}")
 
 @lru_cache(maxsize=100)
 def get_embedding_cached(query: str):
     """Cache embeddings for repeated queries - MASSIVE speedup"""
     return embedding_model.encode(query, convert_to_numpy=True)
 
-def get_kb_context_fast(kb_id: str, query: str, top_k: int = 2):
-    """OPTIMIZED: Faster KB context retrieval with caching"""
+def verify_embedding_backend():
+    """Compare the configured backend with PyTorch on KB lines, switch to PyTorch if they disagree"""
+    global embedding_model
+    texts = []
+    for name in sorted(os.listdir(KB_DIRECTORY)):
+        if name.endswith(".txt"):
+            texts.extend(read_kb_texts(os.path.join(KB_DIRECTORY, name))[:100])
+    if not texts:
+        return
+    reference = load_embedding_model(EMBEDDING_MODEL_NAME, "torch")
+    agreement = cosine_agreement(embedding_model, reference, texts)
+    if agreement["min"] >= EMBEDDING_MIN_COSINE:
+        print(f"✓ Embedding backend {EMBEDDING_BACKEND} agrees with PyTorch: {agreement}")
+        return
+    print(f"✗ Embedding backend {EMBEDDING_BACKEND} disagrees with PyTorch ({agreement}), using PyTorch")
+    embedding_model = reference
+    EMBEDDING_OPTIONS["backend"] = "torch"  # ingestion workers follow
+    get_embedding_cached.cache_clear()
+
+async def embed_query(text: str):
+    """Query embedding from the batcher, None when batching is off (callers embed in their thread)"""
+    if not EMBED_BATCHING:
+        return None
+    return await embedding_batcher.embed(text.lower().strip())
+
+def get_kb_context_fast(kb_id: str, query: str, top_k: int = 2, embedding=None, kb=None):
+    """OPTIMIZED: Faster KB context retrieval with caching (kb: the call's version, else the current one)"""
     if not kb_id or kb_id == "general":
         return None
     
-    kb = load_kb(kb_id)
+    if kb is None:
+        kb = load_kb(kb_id)
     
     # Use cached embeddings
-    query_lower = query.lower().strip()
-    embedding = get_embedding_cached(query_lower)
+    if embedding is None:
+        embedding = get_embedding_cached(query.lower().strip())
     
     query_emb = np.array([embedding]).astype('float32')
     
-    _, indices = kb["index"].search(query_emb, top_k)
+    if KB_RETRIEVAL_MODE == "hybrid":
+        indices = hybrid_search_kb(kb, query, query_emb, top_k, KB_HYBRID_CANDIDATES, KB_RRF_K)
+    else:
+        indices = search_kb(kb, query_emb, top_k)
     kb_texts = kb["texts"]
     
     # Return only first 300 chars of each result (truncate for speed)
-    context_parts = [kb_texts[i][:300] for i in indices[0]]
+    context_parts = [kb_texts[i][:300] for i in indices]
     context = "\n".join(context_parts)
     
     return context
 
+def lookup_cached_answer(kb_id: str, language: str, question: str, embedding=None, kb=None):
+    """Embed a question and look it up in the answer cache (runs in a worker thread)
+
+    Returns (embedding, kb_version, hit or None). The embedding is the same
+    cached one RAG uses, so a miss costs nothing extra.
+    """
+    if kb is None:
+        kb = load_kb(kb_id)
+    if embedding is None:
+        embedding = get_embedding_cached(question.lower().strip())
+    return embedding, kb["version"], answer_cache.lookup(kb_id, language, kb["version"], embedding)
+
+async def replay_cached_answer(answer: str):
+    """Token source for a cached answer, feeds the normal clause -> TTS path"""
+    yield answer
+
 @app.post("/api/upload-knowledge-base")
 async def upload_knowledge_base(file: UploadFile = File(...)):
     """Upload a knowledge base text file"""
@@ -358,25 +638,51 @@ async def upload_knowledge_base(file: UploadFile = File(...)):
         kb_id = file.filename.replace('.txt', '').replace(' ', '_').lower()
         kb_path = os.path.join(KB_DIRECTORY, f"{kb_id}.txt")
         
-        # Save file
-        async with aiofiles.open(kb_path, 'wb') as out_file:
-            content = await file.read()
+        # Save file (written to a temp name first, a running job may be reading the old one)
+        content = await file.read()
+        tmp_path = f"{kb_path}.upload-{uuid.uuid4().hex}"
+        async with aiofiles.open(tmp_path, 'wb') as out_file:
             await out_file.write(content)
+        os.replace(tmp_path, kb_path)
         
-        # Initialize KB in cache
-        initialize_kb(kb_id)
+        # Embed in the background, calls keep using the current index until the new one is ready
+        kb_source_stats[kb_id] = kb_source_stat(kb_id)
+        job = kb_ingestion.submit(kb_id, force=True)
         
         return JSONResponse({
-            "status": "success",
+            "status": "processing",
             "kb_id": kb_id,
+            "job_id": job.job_id,
             "filename": file.filename,
-            "message": f"Knowledge base '{kb_id}' uploaded and initialized"
-        })
+            "status_url": f"/api/knowledge-bases/{kb_id}/status",
+            "message": f"Knowledge base '{kb_id}' uploaded, indexing in background"
+        }, status_code=202)
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/knowledge-bases/{kb_id}/status")
+async def get_knowledge_base_status(kb_id: str):
+    """Ingestion progress of a knowledge base and the version currently served"""
+    kb = kb_cache.peek(kb_id)
+    job = kb_ingestion.status(kb_id)
+    if kb is None and job is None and not os.path.exists(os.path.join(KB_DIRECTORY, f"{kb_id}.txt")):
+        raise HTTPException(status_code=404, detail=f"Knowledge base '{kb_id}' not found")
+    return JSONResponse({
+        "kb_id": kb_id,
+        "loaded": kb is not None,
+        "version": kb["version"] if kb else None,
+        "entries": len(kb["texts"]) if kb else None,
+        "index": kb["index_kind"] if kb else None,
+        # Replaced versions still answering the calls that started on them
+        "retired_versions": [v for v in kb_cache.stats()["retired"] if v["kb_id"] == kb_id],
+        "job": job
+    })
+
+
 @app.get("/api/knowledge-bases")
 async def list_knowledge_bases():
     """List all available knowledge bases"""
@@ -777,7 +1083,7 @@ async def get_all_campaigns_admin(
         
         # Get campaigns with filter
         campaigns = await campaign_db.campaigns.find(
-            filter_query
+            filter_query, {"welcome_audio": 0}
         ).sort("created_at", -1).skip(offset).limit(limit).to_list(length=limit)
         
         # Convert ObjectId to string and datetime objects
@@ -1066,7 +1372,7 @@ async def get_all_wallets_admin(
         
         # Get all wallets with pagination
         wallets = await wallet_db.collection.find(
-            {}
+            {}, {"applied_debits": 0}
         ).sort("created_at", -1).skip(offset).limit(limit).to_list(length=limit)
         
         # Convert ObjectId and datetime objects
@@ -1593,7 +1899,7 @@ async def make_outbound_call(
     
     # Verify KB exists
     try:
-        initialize_kb(kb_id)
+        await ensure_kb_loaded(kb_id)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"Knowledge base '{kb_id}' not found")
     
@@ -1606,12 +1912,18 @@ async def make_outbound_call(
     print(f"[CALL] WebSocket URL for Twilio: {websocket_url}")
     print(f"[CALL] Calling {to_number} with kb_id={kb_id}, language={language}")
 
+    # Pre-rendered greeting is played over the stream, rendered while Twilio dials;
+    # if it is not ready when the call connects the stream speaks it with live TTS
+    welcome_key = welcome_audio_key(welcome_message, language, tts_engine, tts_voice)
+    start_welcome_prerender(welcome_message, language, tts_engine, tts_voice)
+
     twiml = VoiceResponse()
-    if language == 'en':
-        twiml.say(welcome_message, voice="Polly.Joanna")
-    elif language == 'hi':
-        twiml.say(welcome_message, language="hi-IN")
-    twiml.pause(length=1)
+    if not welcome_key:
+        if language == 'en':
+            twiml.say(welcome_message, voice="Polly.Joanna")
+        elif language == 'hi':
+            twiml.say(welcome_message, language="hi-IN")
+        twiml.pause(length=1)
 
     connect = Connect()
     stream = Stream(url=websocket_url)
@@ -1621,6 +1933,9 @@ async def make_outbound_call(
     stream.parameter(name='language', value=language)
     stream.parameter(name='tts_engine', value=tts_engine)
     stream.parameter(name='tts_voice', value=tts_voice)
+    if welcome_key:
+        stream.parameter(name='welcome_key', value=welcome_key)
+        stream.parameter(name='welcome_message', value=welcome_message)
     
     connect.append(stream)
     twiml.append(connect)
@@ -1716,6 +2031,38 @@ async def get_call_details(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/call-history/{call_sid}/live")
+async def get_live_transcript(
+    call_sid: str,
+    since: int = 0,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Transcript of a call as it happens; pass since=<messages already shown> to poll for new turns"""
+    try:
+        call_history_db = get_call_history_db()
+        call = await call_history_db.get_live_transcript(call_sid, since=max(since, 0))
+        
+        if not call:
+            raise HTTPException(status_code=404, detail="Call not found")
+        
+        # Check authorization - users can only see their own calls, admin can see all
+        if not is_admin(current_user) and call.get("user_id") != current_user["_id"]:
+            raise HTTPException(status_code=403, detail="Not authorized to view this call")
+        
+        messages = call.get("transcript") or []
+        return JSONResponse({
+            "call_sid": call_sid,
+            "status": call.get("status"),
+            "messages": messages,
+            "next_since": max(since, 0) + len(messages)
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ============================================================================
 # CAMPAIGN MANAGEMENT ENDPOINTS
 # ============================================================================
@@ -1761,7 +2108,7 @@ async def create_campaign(
         
         # Verify KB exists
         try:
-            initialize_kb(kb_id)
+            await ensure_kb_loaded(kb_id)
         except FileNotFoundError:
             raise HTTPException(status_code=404, detail=f"Knowledge base '{kb_id}' not found")
         
@@ -1807,6 +2154,8 @@ async def create_campaign(
             asyncio.create_task(process_campaign(campaign["_id"]))
             message = f"Campaign '{name}' created and processing started"
         else:
+            # Render the greeting now so the scheduled run starts dialing immediately
+            start_welcome_prerender(welcome_message, language, tts_engine, tts_voice, campaign["_id"])
             message = f"Campaign '{name}' scheduled for {scheduled_datetime.isoformat()}"
         
         return JSONResponse({
@@ -1878,7 +2227,7 @@ async def create_campaign_with_file(
         
         # Verify KB exists
         try:
-            initialize_kb(kb_id)
+            await ensure_kb_loaded(kb_id)
         except FileNotFoundError:
             raise HTTPException(status_code=404, detail=f"Knowledge base '{kb_id}' not found")
         
@@ -1924,6 +2273,8 @@ async def create_campaign_with_file(
             asyncio.create_task(process_campaign(campaign["_id"]))
             message = f"Campaign '{campaign_name}' created with {len(numbers_list)} numbers and processing started"
         else:
+            # Render the greeting now so the scheduled run starts dialing immediately
+            start_welcome_prerender(welcome_message, language, tts_engine, tts_voice, campaign["_id"])
             message = f"Campaign '{campaign_name}' scheduled for {scheduled_datetime.isoformat()} with {len(numbers_list)} numbers"
         
         return JSONResponse({
@@ -2038,7 +2389,9 @@ async def retry_failed_calls(
             language=campaign["language"],
             chunk_size=campaign["chunk_size"],
             retry_failed=campaign["retry_failed"],
-            user_id=campaign.get("user_id")
+            user_id=campaign.get("user_id"),
+            tts_engine=campaign.get("tts_engine", "cartesia"),
+            tts_voice=campaign.get("tts_voice", "")
         )
         
         # Start processing retry campaign
@@ -2156,6 +2509,168 @@ async def delete_campaign(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def resolve_tts_voice(tts_engine: str, language: str, tts_voice: str = "") -> tuple:
+    """(engine, voice) the media stream will actually use for a call's TTS settings"""
+    if tts_engine == "sarvam" and SARVAM_API_KEY:
+        return "sarvam", tts_voice or SARVAM_HINDI_SPEAKER
+    if tts_engine == "cartesia" and tts_voice:
+        return "cartesia", tts_voice
+    return "cartesia", LANGUAGE_CONFIG.get(language, LANGUAGE_CONFIG["en"])["voice_id"]
+
+
+def welcome_audio_key(welcome_message, language, tts_engine="cartesia", tts_voice=""):
+    """TTS cache key a welcome message's pre-rendered audio is stored under, None if it is not pre-rendered"""
+    if not PRERENDER_WELCOME or not welcome_message or not welcome_message.strip():
+        return None
+    engine, voice = resolve_tts_voice(tts_engine, language, tts_voice)
+    return make_tts_cache_key(engine, voice, language, welcome_message)
+
+
+def start_welcome_prerender(welcome_message, language, tts_engine="cartesia", tts_voice="", campaign_id=None):
+    """Pre-render a welcome message in the background, or join the render already running
+
+    The task is held in welcome_prerenders until it finishes and a failed
+    render is logged. Returns the task (its result is the welcome key), or
+    None if the message is not pre-rendered.
+    """
+    cache_key = welcome_audio_key(welcome_message, language, tts_engine, tts_voice)
+    if not cache_key:
+        return None
+    key = (cache_key, campaign_id)
+    task = welcome_prerenders.get(key)
+    if task is None:
+        task = asyncio.create_task(prerender_welcome_audio(welcome_message, language, tts_engine, tts_voice, campaign_id))
+        welcome_prerenders[key] = task
+        task.add_done_callback(lambda done: finish_welcome_prerender(key, done))
+    return task
+
+
+def finish_welcome_prerender(key, task):
+    """Drop a finished pre-render task, logging it if it raised"""
+    welcome_prerenders.pop(key, None)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"✗ Welcome pre-render {key[0][:12]} failed: {task.exception()}")
+
+
+async def prerender_welcome_audio(welcome_message, language, tts_engine="cartesia", tts_voice="", campaign_id=None):
+    """Render a welcome message once with the call's TTS voice
+
+    Returns the TTS cache key the media stream plays the greeting from, or
+    None if it could not be rendered. With campaign_id the audio is also
+    stored on the campaign, so other workers and restarts reuse it instead
+    of synthesizing again.
+    """
+    cache_key = welcome_audio_key(welcome_message, language, tts_engine, tts_voice)
+    if not cache_key:
+        return None
+
+    engine, voice = resolve_tts_voice(tts_engine, language, tts_voice)
+    campaign_db = get_campaign_db() if campaign_id else None
+
+    if campaign_db:
+        stored = await campaign_db.get_welcome_audio(campaign_id, cache_key)
+        if stored:
+            if not tts_cache.contains(cache_key):
+                await tts_cache.put(cache_key, stored)
+            return cache_key
+
+    frames = await tts_cache.get(cache_key)
+    if frames:
+        audio = b"".join(base64.b64decode(frame) for frame in frames)
+    else:
+        # Campaign creation and the campaign run may ask at the same time, render once
+        render = welcome_renders.get(cache_key)
+        if render is None:
+            render = asyncio.create_task(synthesize_tts_audio(
+                welcome_message, engine, language,
+                voice_id=voice if engine == "cartesia" else None,
+                sarvam_speaker=voice if engine == "sarvam" else None
+            ))
+            welcome_renders[cache_key] = render
+            render.add_done_callback(lambda _: welcome_renders.pop(cache_key, None))
+        try:
+            render_start = time.time()
+            audio = await asyncio.shield(render)
+        except Exception as e:
+            print(f"✗ Welcome pre-render failed: {e}")
+            return None
+        if not audio:
+            return None
+        await tts_cache.put(cache_key, audio)
+        print(f"✓ Welcome message pre-rendered ({engine}/{voice}, {len(audio) / 8000:.1f}s audio) in {time.time() - render_start:.2f}s")
+
+    if campaign_db:
+        await campaign_db.set_welcome_audio(campaign_id, cache_key, audio)
+    return cache_key
+
+
+async def play_welcome_audio(websocket, stream_sid, welcome_key, campaign_id=None) -> bool:
+    """Send a pre-rendered welcome message to Twilio, True if it was played"""
+    frames = await tts_cache.get(welcome_key)
+    if not frames and campaign_id:
+        # Rendered by another worker: load it from the campaign
+        audio = await get_campaign_db().get_welcome_audio(campaign_id, welcome_key)
+        if audio:
+            await tts_cache.put(welcome_key, audio)
+            frames = await tts_cache.get(welcome_key)
+    if not frames:
+        print(f"⚠️ Pre-rendered welcome {welcome_key[:12]} not ready, speaking it live")
+        return False
+
+    for frame in frames:
+        await websocket.send_json({
+            "event": "media",
+            "streamSid": stream_sid,
+            "media": {"payload": frame}
+        })
+    return True
+
+
+async def get_welcome_message(custom_params) -> Optional[str]:
+    """Welcome message text of a call, from its stream parameters or its campaign"""
+    welcome_message = custom_params.get("welcome_message")
+    campaign_id = custom_params.get("campaign_id")
+    if not welcome_message and campaign_id:
+        campaign = await get_campaign_db().get_campaign(campaign_id)
+        welcome_message = campaign.get("welcome_message") if campaign else None
+    return welcome_message
+
+
+async def speak_welcome_live(websocket, stream_sid, welcome_message, language, turn_id,
+                             tts_engine, cartesia_tts, voice_id, sarvam_client=None, sarvam_speaker=None):
+    """Speak the welcome message with live TTS, used when its pre-rendered audio is not ready yet"""
+    clause_queue = asyncio.Queue()
+    clauses, _ = split_speakable_clauses(welcome_message, final=True)
+    for clause in clauses:
+        await clause_queue.put(clause)
+    await clause_queue.put(None)
+
+    turn_timing = {}
+    start_time = time.time()
+    try:
+        if tts_engine == "sarvam" and sarvam_client:
+            await speak_clauses_sarvam(
+                websocket, stream_sid, sarvam_client, clause_queue, language, sarvam_speaker,
+                turn_timing, cartesia_tts=cartesia_tts, voice_id=voice_id
+            )
+        else:
+            await speak_clauses_cartesia(websocket, stream_sid, cartesia_tts, clause_queue, language, voice_id, turn_timing)
+    except Exception as e:
+        print(f"✗ Live welcome message failed: {e}")
+    if "first_audio" in turn_timing:
+        print(f"⏱️ Live welcome audio started in {(turn_timing['first_audio'] - start_time) * 1000:.0f}ms")
+
+    # Playback end is reported by the mark like any other turn
+    try:
+        await websocket.send_text(json.dumps({
+            "event": "mark",
+            "streamSid": stream_sid,
+            "mark": {"name": f"response_end_{turn_id}"}
+        }))
+    except Exception:
+        pass
+
+
 async def process_campaign(campaign_id: str):
     """Process campaign calls in chunks with retry logic"""
     try:
@@ -2185,6 +2700,17 @@ async def process_campaign(campaign_id: str):
         tts_engine = campaign.get("tts_engine", "cartesia")
         tts_voice = campaign.get("tts_voice", "")
 
+        # One synthesis for the whole campaign, every call plays the same audio.
+        # The first chunk is dialed once it is ready (usually it was rendered when
+        # the campaign was scheduled), without it the calls greet with <Say>
+        welcome_key = None
+        render = start_welcome_prerender(welcome_message, language, tts_engine, tts_voice, campaign_id)
+        if render is not None:
+            try:
+                welcome_key = await asyncio.shield(render)
+            except Exception:
+                pass  # logged by finish_welcome_prerender
+
         print(f"✓ Processing campaign: {campaign['name']} ({len(phone_numbers)} numbers, tts={tts_engine})")
         
         # Process numbers in chunks
@@ -2205,7 +2731,8 @@ async def process_campaign(campaign_id: str):
                     campaign_db=campaign_db,
                     call_history_db=call_history_db,
                     tts_engine=tts_engine,
-                    tts_voice=tts_voice
+                    tts_voice=tts_voice,
+                    welcome_key=welcome_key
                 )
                 tasks.append(task)
             
@@ -2254,7 +2781,8 @@ async def make_single_call(
     campaign_db: CampaignDB,
     call_history_db: CallHistoryDB,
     tts_engine: str = "cartesia",
-    tts_voice: str = ""
+    tts_voice: str = "",
+    welcome_key: Optional[str] = None
 ):
     """Make a single call as part of a campaign"""
     try:
@@ -2265,15 +2793,16 @@ async def make_single_call(
         # Update campaign progress (in_progress +1)
         await campaign_db.update_campaign_progress(campaign_id, in_progress=1)
         
-        # Create TwiML
+        # Create TwiML (greeting via <Say> only if it could not be pre-rendered)
         twiml = VoiceResponse()
         
-        if language == 'en':
-            twiml.say(welcome_message, voice="Polly.Joanna")
-        elif language == 'hi':
-            twiml.say(welcome_message, language="hi-IN")
-        
-        twiml.pause(length=1)
+        if not welcome_key:
+            if language == 'en':
+                twiml.say(welcome_message, voice="Polly.Joanna")
+            elif language == 'hi':
+                twiml.say(welcome_message, language="hi-IN")
+            
+            twiml.pause(length=1)
         
         connect = Connect()
         websocket_url = f'{SERVER_URL.replace("https://", "wss://").replace("http://", "ws://")}/ws/media-stream'
@@ -2285,6 +2814,8 @@ async def make_single_call(
         stream.parameter(name='tts_engine', value=tts_engine)
         stream.parameter(name='tts_voice', value=tts_voice)
         stream.parameter(name='campaign_id', value=campaign_id)
+        if welcome_key:
+            stream.parameter(name='welcome_key', value=welcome_key)
         
         connect.append(stream)
         twiml.append(connect)
@@ -2415,18 +2946,37 @@ async def media_stream_handler(websocket: WebSocket):
     call_history_db = get_call_history_db()
     call_record = None
     
-    # Deepgram streaming connection state
-    deepgram_connection = None
+    # Deepgram streaming session state (results are consumed by one task per call)
+    stt_session = None
+    stt_consumer_task = None
     transcript_buffer = []
-    is_processing = False
-    is_speaking = False
     stt_start_time = None
-    
-    # Get the current event loop for scheduling tasks from threads
-    event_loop = asyncio.get_event_loop()
+
+    # Decides which caller audio reaches Deepgram, and maps Deepgram timestamps back to wall time
+    vad_gate = VoiceActivityGate(
+        enabled=VAD_ENABLED,
+        preroll_ms=VAD_PREROLL_MS,
+        hangover_ms=VAD_HANGOVER_MS,
+        margin_db=VAD_MARGIN_DB,
+        min_db=VAD_MIN_DB,
+        noise_window_ms=VAD_NOISE_WINDOW_MS
+    )
+
+    # Turn / playback state shared with process_transcript
+    call_state = {
+        "turn_id": 0,
+        "turn_task": None,      # in-flight process_transcript task
+        "is_speaking": False,   # bot audio queued at Twilio whose end mark hasn't come back
+        "speech_end": None,     # stream offset (s) where the caller's last final word ended
+        "speculation": None,    # SpeculativeTurn running on the caller's unfinished utterance
+        "spec_candidate": None, # transcript the stability timer is waiting on
+        "spec_timer": None,
+        "kb_lease": None,       # KB version the call answers from, held in kb_cache until it ends
+    }
+    call_trace = None           # per-turn latency spans, saved on the call record
     
     # Per-call connections (created after start event)
-    cartesia_ws = None
+    cartesia_tts = None
     sarvam_client = None
     tts_engine = "cartesia"
     call_identifier = None
@@ -2442,6 +2992,7 @@ async def media_stream_handler(websocket: WebSocket):
                 print(f"[WS] Message #{msg_count}: event={event_type}")
 
             if event_type == "start":
+                stream_start_time = time.time()
                 stream_sid = data["start"]["streamSid"]
                 call_sid = data["start"]["callSid"]
 
@@ -2457,6 +3008,20 @@ async def media_stream_handler(websocket: WebSocket):
                 print(f"[WS] ✓ Stream STARTED: streamSid={stream_sid}, callSid={call_sid}")
                 print(f"[WS] ✓ Custom params: kb_id={kb_id}, language={language}, tts_engine={tts_engine}, tts_voice={tts_voice}")
 
+                # Pre-rendered greeting goes out first, before any provider connection is set up
+                welcome_key = custom_params.get("welcome_key")
+                live_welcome = None  # greeting to speak with live TTS, its audio was not rendered in time
+                if welcome_key and await play_welcome_audio(websocket, stream_sid, welcome_key, custom_params.get("campaign_id")):
+                    call_state["is_speaking"] = True
+                    await websocket.send_json({
+                        "event": "mark",
+                        "streamSid": stream_sid,
+                        "mark": {"name": f"response_end_{call_state['turn_id']}"}
+                    })
+                    print(f"⏱️ Welcome audio sent {(time.time() - stream_start_time) * 1000:.0f}ms after stream start")
+                elif welcome_key:
+                    live_welcome = await get_welcome_message(custom_params)
+
                 # Get language configuration
                 lang_config = LANGUAGE_CONFIG.get(language, LANGUAGE_CONFIG["en"])
                 voice_id = lang_config["voice_id"]
@@ -2476,15 +3041,21 @@ async def media_stream_handler(websocket: WebSocket):
 
                 print(f"[WS] ✓ TTS engine: {tts_engine}, voice: {tts_voice or 'default'}")
 
-                # Pre-initialize KB
-                try:
-                    initialize_kb(kb_id)
-                    print(f"✓ KB initialized: {kb_id}")
-                except Exception as e:
-                    print(f"Warning: KB init failed: {e}")
+                # Load the KB in the background so call setup is not held up by it
+                if kb_id and kb_id != "general":
+                    call_state["kb_lease"] = KBLease(kb_cache, kb_id, ensure_kb_loaded)
+                    asyncio.create_task(preload_kb(call_state["kb_lease"]))
 
                 # Create unique identifier for this call
                 call_identifier = f"call_{call_sid}_{int(time.time() * 1000)}"
+                call_trace = CallTrace(call_identifier)
+                conversation_history = ConversationMemory(
+                    call_sid,
+                    get_transcript_writer(),
+                    max_messages=HISTORY_MAX_MESSAGES,
+                    token_budget=HISTORY_TOKEN_BUDGET,
+                    summarizer=summarize_conversation
+                )
 
                 # Create TTS connection based on engine
                 if tts_engine == "sarvam":
@@ -2494,22 +3065,135 @@ async def media_stream_handler(websocket: WebSocket):
                         tts_engine = "cartesia"
 
                 if tts_engine == "cartesia":
-                    cartesia_ws = await connection_manager.create_cartesia_connection(call_identifier)
-                    if not cartesia_ws:
+                    cartesia_tts = await connection_manager.create_cartesia_connection(call_identifier)
+                    if not cartesia_tts:
                         print("✗ Failed to create Cartesia connection")
                         await websocket.close()
                         return
+
+                if live_welcome:
+                    call_state["is_speaking"] = True
+                    call_state["turn_task"] = asyncio.create_task(speak_welcome_live(
+                        websocket, stream_sid, live_welcome, language, call_state["turn_id"],
+                        tts_engine, cartesia_tts, voice_id, sarvam_client, sarvam_speaker
+                    ))
                 
                 # Initialize Deepgram with correct language
-                deepgram_connection = connection_manager.create_deepgram_connection(call_identifier, deepgram_language)
+                stt_session = await connection_manager.create_deepgram_connection(call_identifier, deepgram_language)
                 
-                if deepgram_connection:
-                    def on_open(_):
-                        print(f"✓ Deepgram connection opened for language: {deepgram_language}")
-                    
-                    def on_message(result):
-                        nonlocal transcript_buffer, is_processing, stt_start_time
-                        
+                if stt_session:
+                    async def barge_in(reason):
+                        """Stop the bot: flush Twilio's audio buffer and cancel the in-flight turn"""
+                        turn_task = call_state["turn_task"]
+                        turn_active = turn_task is not None and not turn_task.done()
+                        if not call_state["is_speaking"] and not turn_active:
+                            return
+                        print(f"✋ Barge-in ({reason}): stopping bot playback")
+                        call_state["is_speaking"] = False
+                        try:
+                            await websocket.send_text(json.dumps({"event": "clear", "streamSid": stream_sid}))
+                        except Exception:
+                            pass
+                        if turn_active:
+                            turn_task.cancel()
+                            try:
+                                await turn_task
+                            except (asyncio.CancelledError, Exception):
+                                pass
+
+                    async def start_turn(utterance, stt_final=None, speculation=None):
+                        """Interrupt whatever the bot is doing and answer the new utterance right away"""
+                        await barge_in("new utterance")
+                        turn_trace = call_trace.new_turn()
+                        turn_trace.record("stt_final", stt_final)
+                        call_state["turn_id"] += 1
+                        call_state["is_speaking"] = True
+                        call_state["turn_task"] = asyncio.create_task(
+                            process_transcript(
+                                websocket,
+                                utterance,
+                                conversation_history,
+                                kb_id,
+                                stream_sid,
+                                cartesia_tts,
+                                language,
+                                voice_id,
+                                tts_engine=tts_engine,
+                                sarvam_client=sarvam_client,
+                                sarvam_speaker=sarvam_speaker,
+                                turn_id=call_state["turn_id"],
+                                trace=turn_trace,
+                                speculation=speculation,
+                                kb_lease=call_state["kb_lease"]
+                            )
+                        )
+
+                    def bot_is_busy():
+                        turn_task = call_state["turn_task"]
+                        return call_state["is_speaking"] or (turn_task is not None and not turn_task.done())
+
+                    def discard_speculation(reason):
+                        spec = call_state["speculation"]
+                        if spec is not None:
+                            call_state["speculation"] = None
+                            spec.cancel()
+                            speculation_stats.record_discard(spec)
+                            print(f"🔮 Speculation discarded ({reason}, {spec.token_count} tokens wasted)")
+
+                    def take_speculation(utterance):
+                        """Stop the stability timer and return the speculation if it answers utterance"""
+                        timer = call_state["spec_timer"]
+                        if timer and not timer.done():
+                            timer.cancel()
+                        call_state["spec_candidate"] = None
+                        spec = call_state["speculation"]
+                        if spec is None:
+                            return None
+                        if not spec.matches(utterance, conversation_history.version, SPECULATIVE_MATCH_RATIO):
+                            discard_speculation("final transcript differs")
+                            return None
+                        call_state["speculation"] = None
+                        speculation_stats.record_commit(spec)
+                        return spec
+
+                    async def speculate_when_stable(candidate):
+                        await asyncio.sleep(SPECULATIVE_STABLE_MS / 1000)
+                        if call_state["spec_candidate"] != candidate or call_state["speculation"] or bot_is_busy():
+                            return
+                        print(f"🔮 Speculating on: {candidate}")
+                        speculation_stats.started += 1
+                        call_state["speculation"] = SpeculativeTurn(
+                            candidate,
+                            conversation_history.version,
+                            lambda timing: speculative_generate(candidate, conversation_history, kb_id, language, timing,
+                                                                call_state["kb_lease"])
+                        )
+
+                    def track_partial_utterance(candidate):
+                        """(Re)arm the stability timer for the caller's unfinished utterance"""
+                        candidate = candidate.strip()
+                        if not SPECULATIVE_ENABLED or candidate == call_state["spec_candidate"]:
+                            return
+                        call_state["spec_candidate"] = candidate
+                        timer = call_state["spec_timer"]
+                        if timer and not timer.done():
+                            timer.cancel()
+                        spec = call_state["speculation"]
+                        if spec is not None and utterance_similarity(spec.text, candidate) < SPECULATIVE_MATCH_RATIO:
+                            discard_speculation("caller kept talking")
+                        if len(candidate.split()) >= SPECULATIVE_MIN_WORDS:
+                            call_state["spec_timer"] = asyncio.create_task(speculate_when_stable(candidate))
+
+                    async def handle_stt_result(result):
+                        """Handle one Deepgram result, runs on the event loop in the call's consumer task"""
+                        nonlocal stt_start_time
+
+                        if getattr(result, 'type', None) == "SpeechStarted":
+                            # Deepgram VAD: caller started talking
+                            if BARGE_IN_ON_VAD and bot_is_busy():
+                                await barge_in("vad")
+                            return
+
                         if hasattr(result, 'channel'):
                             if isinstance(result.channel, list) and len(result.channel) > 0:
                                 channel = result.channel[0]
@@ -2523,60 +3207,59 @@ async def media_stream_handler(websocket: WebSocket):
                             
                             if len(sentence) == 0:
                                 return
-                            
+
+                            # Caller is talking over the bot, cut playback before the utterance ends
+                            if len(sentence.split()) >= BARGE_IN_MIN_WORDS and bot_is_busy():
+                                await barge_in("speech")
+
                             if result.is_final:
                                 if stt_start_time is None:
                                     stt_start_time = time.time()
                                 print(f"🎤 [FINAL]: {sentence}")
                                 transcript_buffer.append(sentence)
+                                words = getattr(channel.alternatives[0], 'words', None)
+                                if words:
+                                    call_state["speech_end"] = words[-1].end
                                 
                                 if result.speech_final:
                                     if stt_start_time is not None:
                                         stt_time = time.time() - stt_start_time
                                         print(f"⏱️ STT: {stt_time:.2f}s")
                                         stt_start_time = None
+
+                                    # End of speech (audio clock) -> final transcript (wall clock)
+                                    stt_final = None
+                                    if call_state["speech_end"] is not None:
+                                        spoken_at = vad_gate.to_wall_time(call_state["speech_end"])
+                                        if spoken_at is not None:
+                                            stt_final = time.time() - spoken_at
+                                        call_state["speech_end"] = None
                                     
                                     full_transcript = " ".join(transcript_buffer).strip()
                                     transcript_buffer.clear()
+                                    speculation = take_speculation(full_transcript)
                                     
-                                    if full_transcript and not is_processing:
+                                    if full_transcript:
                                         print(f"👤 Complete utterance: {full_transcript}")
-                                        is_processing = True
-                                        asyncio.run_coroutine_threadsafe(
-                                            process_transcript(
-                                                websocket,
-                                                full_transcript,
-                                                conversation_history,
-                                                kb_id,
-                                                stream_sid,
-                                                cartesia_ws,
-                                                language,
-                                                voice_id,
-                                                tts_engine=tts_engine,
-                                                sarvam_client=sarvam_client,
-                                                sarvam_speaker=sarvam_speaker
-                                            ),
-                                            event_loop
-                                        )
+                                        await start_turn(full_transcript, stt_final, speculation)
+                                else:
+                                    track_partial_utterance(" ".join(transcript_buffer))
                             else:
                                 print(f"🎤 [INTERIM]: {sentence}")
+                                track_partial_utterance(" ".join(transcript_buffer + [sentence]))
                     
-                    def on_error(error):
-                        print(f"✗ Deepgram error: {error}")
-                    
-                    def on_close(close_msg):
-                        print("✓ Deepgram connection closed")
-                    
-                    deepgram_connection.on(LiveTranscriptionEvents.OPEN, on_open)
-                    deepgram_connection.on(LiveTranscriptionEvents.MESSAGE, on_message)
-                    deepgram_connection.on(LiveTranscriptionEvents.ERROR, on_error)
-                    deepgram_connection.on(LiveTranscriptionEvents.CLOSE, on_close)
-                    
-                    def start_deepgram():
-                        deepgram_connection.start_listening()
-                    
-                    deepgram_thread = threading.Thread(target=start_deepgram, daemon=True)
-                    deepgram_thread.start()
+                    async def consume_stt_results():
+                        """Per-call consumer: drains the STT session queue in order"""
+                        while True:
+                            result = await stt_session.results.get()
+                            if result is None:
+                                break
+                            try:
+                                await handle_stt_result(result)
+                            except Exception as e:
+                                print(f"✗ Error handling Deepgram result: {e}")
+
+                    stt_consumer_task = asyncio.create_task(consume_stt_results())
                     print(f"✓ Deepgram connection established for language: {deepgram_language}")
                 else:
                     print("✗ Failed to create Deepgram connection")
@@ -2594,22 +3277,28 @@ async def media_stream_handler(websocket: WebSocket):
             elif event_type == "media":
                 if msg_count == 6:
                     print(f"[WS] ✓ First MEDIA packet received - audio is flowing from Twilio")
-                if deepgram_connection and not is_speaking:
+                # Keep streaming caller audio while the bot talks so barge-in can be detected
+                if stt_session:
                     try:
                         payload = data["media"]["payload"]
                         audio_chunk = base64.b64decode(payload)
-                        deepgram_connection.send_media(audio_chunk)
+                        now = time.time()
+                        speech_frames = vad_gate.process(audio_chunk, now)
+                        if speech_frames:
+                            await stt_session.send_audio(b"".join(speech_frames))
+                        elif vad_gate.keepalive_due(now, DEEPGRAM_KEEPALIVE_SECONDS):
+                            await stt_session.keep_alive()
                     except Exception as e:
                         print(f"[WS] ✗ Error sending to Deepgram: {e}")
-                elif not deepgram_connection:
+                else:
                     if msg_count < 10:
                         print(f"[WS] ✗ Media received but NO Deepgram connection!")
             
             elif event_type == "mark":
                 mark_name = data.get("mark", {}).get("name", "")
-                if mark_name.startswith("response_end"):
-                    is_speaking = False
-                    is_processing = False
+                # Marks from interrupted turns come back after a clear, ignore those
+                if mark_name == f"response_end_{call_state['turn_id']}":
+                    call_state["is_speaking"] = False
                     print("✓ Ready for next input")
             
             elif event_type == "stop":
@@ -2626,89 +3315,60 @@ async def media_stream_handler(websocket: WebSocket):
         import traceback
         traceback.print_exc()
     finally:
-        # Save final call data to MongoDB
+        vad_stats = vad_gate.stats()
+        if vad_stats["audio_seconds"]:
+            print(f"🔇 VAD: {vad_stats['suppressed_ratio'] * 100:.0f}% of {vad_stats['audio_seconds']:.0f}s caller audio not sent to Deepgram")
+
+        if isinstance(conversation_history, ConversationMemory):
+            conversation_history.close()
+
+        # Drop speculative work for an utterance that will never finish
+        if call_state["spec_timer"] and not call_state["spec_timer"].done():
+            call_state["spec_timer"].cancel()
+        if call_state["speculation"] is not None:
+            call_state["speculation"].cancel()
+            speculation_stats.record_discard(call_state["speculation"])
+
+        # Stop any response still being generated for this call (before its TTS connection is returned)
+        turn_task = call_state["turn_task"]
+        if turn_task and not turn_task.done():
+            turn_task.cancel()
+            try:
+                await turn_task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+        # Let go of the call's KB version, freed here if a newer upload replaced it meanwhile
+        kb_lease = call_state["kb_lease"]
+        if kb_lease:
+            kb_lease.release()
+
+        # Hand the finished call to the post-call workers (summary, lead scoring, billing)
         if call_record and call_sid:
             try:
                 call_duration = (time.time() - call_start_time) + 6 # Add 6 seconds to account for processing time after last media packet
-                
-                # Generate summary using LLM
-                summary = None
-                lead_status = None
-                if conversation_history:
-                    summary = await generate_call_summary(conversation_history)
-                    # Analyze lead status based on conversation
-                    lead_status = await analyze_lead_status(conversation_history, summary)
-                
-                # Calculate call cost and deduct from wallet
-                wallet_db = get_wallet_db()
-                transaction_db = get_transaction_db()
-                
-                call_cost = await wallet_db.calculate_call_cost(call_duration)
-                user_id = call_record.get("user_id")
-                
-                if user_id and call_cost > 0:
-                    try:
-                        new_balance = await wallet_db.deduct_funds(
-                            user_id=user_id,
-                            amount=call_cost,
-                            transaction_id=call_sid
-                        )
-                        
-                        # Create debit transaction
-                        await transaction_db.create_transaction(
-                            user_id=user_id,
-                            transaction_type="debit",
-                            amount=call_cost,
-                            description=f"Call charges ({call_duration:.1f}s)",
-                            call_sid=call_sid,
-                            campaign_id=call_record.get("campaign_id"),
-                            metadata={
-                                "duration_seconds": call_duration,
-                                "lead_status": lead_status
-                            }
-                        )
-                        
-                        print(f"✓ Debited Rs. {call_cost:.2f} from wallet. New balance: Rs. {new_balance:.2f}")
-                    except ValueError as e:
-                        print(f"⚠️ Could not debit wallet: {e}")
-                    except Exception as e:
-                        print(f"✗ Error debiting wallet: {e}")
-                
-                # Update call record
-                await call_history_db.update_call(
-                    call_sid,
-                    {
-                        "ended_at": datetime.utcnow(),
-                        "duration": call_duration,
-                        "status": "completed",
-                        "transcript": conversation_history,
-                        "summary": summary,
-                        "lead_status": lead_status,
-                        "call_cost": call_cost
-                    }
-                )
-                print(f"✓ Call record saved (duration: {call_duration:.1f}s, cost: Rs. {call_cost:.2f}, lead: {lead_status})")
-                
-                # Update campaign progress with lead status if this is a campaign call
-                if call_record.get("campaign_id") and lead_status:
-                    from campaigns import get_campaign_db
-                    campaign_db = get_campaign_db()
-                    if lead_status == "hot":
-                        await campaign_db.update_campaign_progress(
-                            call_record["campaign_id"],
-                            hot_leads=1
-                        )
-                    else:
-                        await campaign_db.update_campaign_progress(
-                            call_record["campaign_id"],
-                            cold_leads=1
-                        )
+                # Write the last turns first, workers read the transcript from the call record
+                await get_transcript_writer().flush()
+                await get_post_call_queue().enqueue(call_sid, {
+                    "duration": call_duration,
+                    "ended_at": datetime.utcnow(),
+                    "user_id": call_record.get("user_id"),
+                    "campaign_id": call_record.get("campaign_id"),
+                    "language": language,
+                    "tts_engine": tts_engine,
+                    "latency": call_trace.to_document() if call_trace else None,
+                    "vad": vad_gate.stats(),
+                    "kb_version": kb_lease.version if kb_lease else None
+                })
+                print(f"✓ Call queued for post-call processing (duration: {call_duration:.1f}s)")
             except Exception as e:
-                print(f"✗ Error saving call record: {e}")
+                print(f"✗ Error queueing post-call processing: {e}")
         
         # Cleanup Deepgram connection for this call
+        if stt_consumer_task and not stt_consumer_task.done():
+            stt_consumer_task.cancel()
         if call_identifier:
-            connection_manager.cleanup_deepgram(call_identifier)
+            await connection_manager.cleanup_deepgram(call_identifier)
             await connection_manager.cleanup_cartesia(call_identifier)
             await connection_manager.cleanup_sarvam(call_identifier)
         
@@ -2718,96 +3378,592 @@ async def media_stream_handler(websocket: WebSocket):
             pass
 
 
-async def analyze_lead_status(conversation_history, summary):
-    """Analyze conversation to determine if lead is hot or cold"""
-    try:
-        # Create transcript text
-        transcript_text = "\n".join([
-            f"{msg['role'].upper()}: {msg['content']}" 
-            for msg in conversation_history
-        ])
-        
-        response = await asyncio.to_thread(
-            groq_client.chat.completions.create,
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Analyze this phone conversation and determine if the lead is HOT or COLD.
-                    
-                    HOT lead indicators:
-                    - User shows interest in the service/product
-                    - User asks for more information or details
-                    - User agrees to follow-up or next steps
-                    - User expresses positive sentiment
-                    - User asks questions about pricing, features, or implementation
-                    - User schedules a meeting or callback
-                    
-                    COLD lead indicators:
-                    - User explicitly says not interested
-                    - User hangs up quickly or doesn't engage
-                    - User asks to be removed from list
-                    - User shows negative sentiment or frustration
-                    - Minimal conversation or engagement
-                    
-                    Respond with ONLY 'hot' or 'cold' (lowercase)."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Conversation:\n{transcript_text}\n\nSummary: {summary}"
-                }
-            ],
-            temperature=0.1,
-            max_tokens=10
-        )
+async def analyze_call(conversation_history):
+    """Summarize the call and classify the lead in one LLM request, returns (summary, lead_status)
+
+    Raises on LLM/parse errors so the post-call job can retry.
+    """
+    transcript_text = "\n".join([
+        f"{msg['role'].upper()}: {msg['content']}" 
+        for msg in conversation_history
+    ])
+    
+    response = await groq_client.chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        messages=[
+            {
+                "role": "system",
+                "content": """Analyze this phone conversation.
+
+                1. Summarize it in 2-3 concise sentences. Focus on the main topics discussed and any outcomes.
+                2. Determine if the lead is HOT or COLD.
+                
+                HOT lead indicators:
+                - User shows interest in the service/product
+                - User asks for more information or details
+                - User agrees to follow-up or next steps
+                - User expresses positive sentiment
+                - User asks questions about pricing, features, or implementation
+                - User schedules a meeting or callback
+                
+                COLD lead indicators:
+                - User explicitly says not interested
+                - User hangs up quickly or doesn't engage
+                - User asks to be removed from list
+                - User shows negative sentiment or frustration
+                - Minimal conversation or engagement
+                
+                Respond with ONLY a JSON object: {"summary": "...", "lead_status": "hot" or "cold"}"""
+            },
+            {
+                "role": "user",
+                "content": f"Conversation:\n{transcript_text}"
+            }
+        ],
+        temperature=0.2,
+        max_tokens=220,
+        response_format={"type": "json_object"}
+    )
+    
+    result = json.loads(response.choices[0].message.content)
+    summary = str(result.get("summary") or "").strip() or "Summary generation failed"
+    # Ensure we only return 'hot' or 'cold'
+    lead_status = "hot" if "hot" in str(result.get("lead_status", "")).lower() else "cold"
+    return summary, lead_status
+
+
+async def process_post_call_job(job):
+    """Post-call work for one finished call: analysis, billing, call record, campaign progress
+
+    Every finished step is saved on the job, so a retry (or a restart) resumes
+    after it. Billing is guarded by a claimed debit record (post_call.bill_call)
+    rather than by its step, a worker may die between charging and saving the step.
+    """
+    queue = get_post_call_queue()
+    call_sid = job["call_sid"]
+    data = job["payload"]
+    steps = job.get("steps") or {}
+    call_duration = data["duration"]
+    call_history_db = get_call_history_db()
+
+    if "analysis" not in steps:
+        call = await call_history_db.get_call_by_sid(call_sid)
+        conversation_history = (call or {}).get("transcript") or []
+        summary = None
+        lead_status = None
+        if conversation_history:
+            try:
+                summary, lead_status = await analyze_call(conversation_history)
+            except Exception as e:
+                if job["attempts"] < queue.max_attempts:
+                    raise
+                print(f"Error analyzing call: {e}")
+                summary, lead_status = "Summary generation failed", "cold"
+        steps["analysis"] = {"summary": summary, "lead_status": lead_status}
+        await queue.save_step(job["_id"], "analysis", steps["analysis"])
+    summary = steps["analysis"]["summary"]
+    lead_status = steps["analysis"]["lead_status"]
+
+    # Calculate call cost and deduct from wallet
+    if "billing" not in steps:
+        wallet_db = get_wallet_db()
+        transaction_db = get_transaction_db()
         
-        lead_status = response.choices[0].message.content.strip().lower()
-        # Ensure we only return 'hot' or 'cold'
-        return "hot" if "hot" in lead_status else "cold"
-    except Exception as e:
-        print(f"Error analyzing lead status: {e}")
-        return "cold"  # Default to cold if analysis fails
+        call_cost = await wallet_db.calculate_call_cost(call_duration)
+        user_id = data.get("user_id")
+        
+        if user_id and call_cost > 0:
+            try:
+                new_balance = await bill_call(
+                    wallet_db,
+                    transaction_db,
+                    user_id=user_id,
+                    call_sid=call_sid,
+                    amount=call_cost,
+                    description=f"Call charges ({call_duration:.1f}s)",
+                    campaign_id=data.get("campaign_id"),
+                    metadata={
+                        "duration_seconds": call_duration,
+                        "lead_status": lead_status
+                    }
+                )
+                if new_balance is not None:
+                    print(f"✓ Debited Rs. {call_cost:.2f} from wallet. New balance: Rs. {new_balance:.2f}")
+            except ValueError as e:
+                print(f"⚠️ Could not debit wallet: {e}")
+        steps["billing"] = {"call_cost": call_cost}
+        await queue.save_step(job["_id"], "billing", steps["billing"])
+    call_cost = steps["billing"]["call_cost"]
+
+    # Update call record
+    if "call_record" not in steps:
+        await call_history_db.update_call(
+            call_sid,
+            {
+                "ended_at": data.get("ended_at"),
+                "duration": call_duration,
+                "status": "completed",
+                "summary": summary,
+                "lead_status": lead_status,
+                "call_cost": call_cost,
+                "language": data.get("language"),
+                "tts_engine": data.get("tts_engine"),
+                "latency": data.get("latency"),
+                "vad": data.get("vad"),
+                "knowledge_base_version": data.get("kb_version")
+            }
+        )
+        steps["call_record"] = {"saved_at": datetime.utcnow()}
+        await queue.save_step(job["_id"], "call_record", steps["call_record"])
+        print(f"✓ Call record saved (duration: {call_duration:.1f}s, cost: Rs. {call_cost:.2f}, lead: {lead_status})")
+    
+    # Update campaign progress with lead status if this is a campaign call
+    if data.get("campaign_id") and lead_status and "campaign" not in steps:
+        campaign_db = get_campaign_db()
+        if lead_status == "hot":
+            await campaign_db.update_campaign_progress(
+                data["campaign_id"],
+                hot_leads=1
+            )
+        else:
+            await campaign_db.update_campaign_progress(
+                data["campaign_id"],
+                cold_leads=1
+            )
+        await queue.save_step(job["_id"], "campaign", {"lead_status": lead_status})
+
+
+# Clause boundaries used to cut the streamed LLM reply into speakable pieces
+SENTENCE_END_CHARS = ".!?।"
+CLAUSE_BREAK_CHARS = ",;:"
+MIN_CLAUSE_CHARS = 20  # don't send tiny fragments like "Sure," to TTS on their own
+
+
+def split_speakable_clauses(buffer: str, final: bool = False):
+    """Cut buffered LLM text into speakable clauses, returns (clauses, remaining_text)"""
+    clauses = []
+    start = 0
+    for i, ch in enumerate(buffer):
+        if ch not in SENTENCE_END_CHARS and ch not in CLAUSE_BREAK_CHARS:
+            continue
+        # Only cut when followed by whitespace so "3.5" or "Rs.10" are not split
+        if i + 1 >= len(buffer) or not buffer[i + 1].isspace():
+            continue
+        clause = buffer[start:i + 1].strip()
+        if ch in CLAUSE_BREAK_CHARS and len(clause) < MIN_CLAUSE_CHARS:
+            continue
+        if clause:
+            clauses.append(clause)
+        start = i + 1
+
+    remaining = buffer[start:]
+    if final and remaining.strip():
+        clauses.append(remaining.strip())
+        remaining = ""
+    return clauses, remaining
+
+
+async def stream_llm_tokens(messages, model="llama-3.3-70b-versatile", temperature=0.7, max_tokens=200, usage=None):
+    """Yield Groq completion tokens as they arrive without blocking the event loop
+
+    If usage (a dict) is given, the prompt/completion token counts Groq reports
+    on the last chunk are stored in it.
+    """
+    stream = await groq_client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True
+    )
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            reported = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None)
+            if usage is not None and reported is not None:
+                usage["prompt_tokens"] = reported.prompt_tokens
+                usage["completion_tokens"] = reported.completion_tokens
+    finally:
+        # Release the pooled connection even if the caller stopped early
+        await stream.close()
+
+
+async def summarize_conversation(previous_summary, messages):
+    """Fold older turns into the call's rolling summary (runs in the background, off the turn path)"""
+    transcript_text = "\n".join(f"{msg['role'].upper()}: {msg['content']}" for msg in messages)
+    prompt = f"Summary so far: {previous_summary}\n\nNew turns:\n{transcript_text}" if previous_summary else transcript_text
+    response = await groq_client.chat.completions.create(
+        model=HISTORY_SUMMARY_MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": "You maintain a running summary of a phone call between a caller and a voice assistant. "
+                           "Merge the new turns into the summary in at most 4 sentences. Keep names, numbers, "
+                           "the caller's needs, questions already answered and anything agreed. Reply with the summary only."
+            },
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.2,
+        max_tokens=160
+    )
+    return response.choices[0].message.content
+
+
+async def send_audio_frame(websocket, stream_sid, audio_b64, turn_timing):
+    """Send one μ-law audio payload to Twilio, noting when the turn's first audio went out"""
+    await websocket.send_text(json.dumps({
+        "event": "media",
+        "streamSid": stream_sid,
+        "media": {"payload": audio_b64}
+    }))
+    if "first_audio" not in turn_timing:
+        turn_timing["first_audio"] = time.time()
+
+
+async def speak_clauses_cartesia(websocket, stream_sid, cartesia_tts, clause_queue, language, voice_id, turn_timing, captured_audio=None):
+    """Stream clauses into one Cartesia context (continue=True) while forwarding audio to Twilio"""
+    context = await cartesia_tts.open_context()
+    text_done = asyncio.Event()
+    chunks = 0
+
+    def build_request(transcript, keep_open):
+        request = {
+            "model_id": "sonic-multilingual",
+            "transcript": transcript,
+            "voice": {
+                "mode": "id",
+                "id": voice_id
+            },
+            "output_format": {
+                "container": "raw",
+                "encoding": "pcm_mulaw",
+                "sample_rate": 8000
+            },
+            "continue": keep_open
+        }
+        if language == "hi":
+            request["language"] = "hi"
+        return request
 
+    async def send_clauses():
+        sent = 0
+        try:
+            while True:
+                clause = await clause_queue.get()
+                if clause is None:
+                    break
+                # Continued transcripts must end with a space so words don't merge
+                await context.send(build_request(clause + " ", True))
+                sent += 1
+            if sent:
+                # Close the context, Cartesia answers with "done" once all audio is out
+                await context.send(build_request("", False))
+            else:
+                # Everything was served from the audio cache, nothing to wait for
+                context.queue.put_nowait({"type": "done", "context_id": context.context_id})
+        finally:
+            text_done.set()
 
-async def generate_call_summary(conversation_history):
-    """Generate a brief summary of the call using LLM"""
+    sender = asyncio.create_task(send_clauses())
     try:
-        # Create summary prompt
-        transcript_text = "\n".join([
-            f"{msg['role'].upper()}: {msg['content']}" 
-            for msg in conversation_history
-        ])
-        
-        response = await asyncio.to_thread(
-            groq_client.chat.completions.create,
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Summarize this phone conversation in 2-3 concise sentences. Focus on the main topics discussed and any outcomes."
-                },
-                {
-                    "role": "user",
-                    "content": transcript_text
-                }
-            ],
-            temperature=0.3,
-            max_tokens=150
-        )
-        
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print(f"Error generating summary: {e}")
-        return "Summary generation failed"
+        while True:
+            try:
+                data = await context.receive(timeout=2.0)
+            except asyncio.TimeoutError:
+                # The LLM may still be producing the next clause
+                if text_done.is_set():
+                    break
+                continue
+
+            if data.get("type") == "chunk":
+                audio_b64 = data.get("data")
+                if audio_b64:
+                    await send_audio_frame(websocket, stream_sid, audio_b64, turn_timing)
+                    chunks += 1
+                    if captured_audio is not None:
+                        captured_audio.append(base64.b64decode(audio_b64))
+            elif data.get("type") == "done":
+                break
+            elif data.get("type") == "error":
+                print(f"✗ Cartesia error: {data.get('error') or data}")
+                break
+    finally:
+        if not sender.done():
+            sender.cancel()
+        try:
+            await sender
+        except (asyncio.CancelledError, Exception):
+            pass
+        # No-op when finished, otherwise (barge-in / timeout) stops audio nobody will hear
+        await context.cancel()
+
+    return chunks
+
+
+async def speak_clauses_sarvam(websocket, stream_sid, sarvam_client, clause_queue, language, sarvam_speaker, turn_timing, captured_audio=None, cartesia_tts=None, voice_id=None):
+    """Stream clauses into a Sarvam TTS session with convert() while forwarding audio to Twilio
+
+    If Sarvam fails, the rest of the reply is spoken by Cartesia (cartesia_tts,
+    voice_id): the clauses Sarvam had not voiced yet, then those still coming.
+    """
+    chunks = 0
+    sent_clauses = []
+    text_ended = False
+    try:
+        sarvam_lang = "hi-IN" if language == "hi" else "en-IN"
+        async with sarvam_client.text_to_speech_streaming.connect(
+            model=SARVAM_MODEL,
+            send_completion_event="true"
+        ) as sarvam_ws:
+            await sarvam_ws.configure(
+                target_language_code=sarvam_lang,
+                speaker=sarvam_speaker or SARVAM_HINDI_SPEAKER,
+                pace=1.0,
+                output_audio_codec="mulaw",
+                speech_sample_rate=8000,
+            )
+
+            async def send_clauses():
+                nonlocal text_ended
+                while True:
+                    clause = await clause_queue.get()
+                    if clause is None:
+                        text_ended = True
+                        break
+                    sent_clauses.append(clause)
+                    await sarvam_ws.convert(clause)
+                if sent_clauses:
+                    await sarvam_ws.flush()
+                return len(sent_clauses)
+
+            async def forward_audio():
+                nonlocal chunks
+                async for msg in sarvam_ws:
+                    if isinstance(msg, AudioOutput):
+                        audio_b64 = msg.data.audio
+                        if audio_b64:
+                            await send_audio_frame(websocket, stream_sid, audio_b64, turn_timing)
+                            chunks += 1
+                            if captured_audio is not None:
+                                captured_audio.append(base64.b64decode(audio_b64))
+                    elif isinstance(msg, EventResponse):
+                        if msg.data.event_type == "final":
+                            break
+
+            sender = asyncio.create_task(send_clauses())
+            receiver = asyncio.create_task(forward_audio())
+            try:
+                if await sender:
+                    await receiver
+                # else: everything was served from the audio cache, nothing to wait for
+            finally:
+                for task in (sender, receiver):
+                    if not task.done():
+                        task.cancel()
+                    try:
+                        await task
+                    except (asyncio.CancelledError, Exception):
+                        pass
+    except Exception as sarvam_err:
+        if cartesia_tts is None:
+            print(f"✗ Sarvam TTS error: {sarvam_err}")
+            return chunks
+        print(f"✗ Sarvam TTS error: {sarvam_err}, falling back to Cartesia")
+        # Once audio went out there's no telling which clause it stopped in, so only an unheard reply is repeated
+        fallback_queue = asyncio.Queue()
+        for clause in sent_clauses if chunks == 0 else []:
+            fallback_queue.put_nowait(clause)
+
+        async def relay_clauses():
+            if text_ended:
+                fallback_queue.put_nowait(None)
+                return
+            while True:
+                clause = await clause_queue.get()
+                fallback_queue.put_nowait(clause)
+                if clause is None:
+                    return
+
+        if captured_audio is not None:
+            captured_audio.clear()  # Cartesia audio must not be cached under the Sarvam voice
+        relay = asyncio.create_task(relay_clauses())
+        try:
+            chunks += await speak_clauses_cartesia(
+                websocket, stream_sid, cartesia_tts, fallback_queue, language, voice_id, turn_timing
+            )
+        finally:
+            if not relay.done():
+                relay.cancel()
+
+    return chunks
+
+
+async def synthesize_tts_audio(text, tts_engine, language, voice_id=None, sarvam_speaker=None):
+    """Render text to raw 8kHz μ-law off the call path (used to fill the audio cache)"""
+    audio = []
+    if tts_engine == "sarvam":
+        if not SARVAM_API_KEY:
+            return b""
+        sarvam_lang = "hi-IN" if language == "hi" else "en-IN"
+        async with AsyncSarvamAI(api_subscription_key=SARVAM_API_KEY, environment=sarvam_environment).text_to_speech_streaming.connect(
+            model=SARVAM_MODEL,
+            send_completion_event="true"
+        ) as sarvam_ws:
+            await sarvam_ws.configure(
+                target_language_code=sarvam_lang,
+                speaker=sarvam_speaker or SARVAM_HINDI_SPEAKER,
+                pace=1.0,
+                output_audio_codec="mulaw",
+                speech_sample_rate=8000,
+            )
+            await sarvam_ws.convert(text)
+            await sarvam_ws.flush()
+            async for msg in sarvam_ws:
+                if isinstance(msg, AudioOutput) and msg.data.audio:
+                    audio.append(base64.b64decode(msg.data.audio))
+                elif isinstance(msg, EventResponse) and msg.data.event_type == "final":
+                    break
+        return b"".join(audio)
+
+    context = await cartesia_mux.open_context("tts_cache")
+    try:
+        request = {
+            "model_id": "sonic-multilingual",
+            "transcript": text,
+            "voice": {
+                "mode": "id",
+                "id": voice_id or LANGUAGE_CONFIG.get(language, LANGUAGE_CONFIG["en"])["voice_id"]
+            },
+            "output_format": {
+                "container": "raw",
+                "encoding": "pcm_mulaw",
+                "sample_rate": 8000
+            },
+            "continue": False
+        }
+        if language == "hi":
+            request["language"] = "hi"
+        await context.send(request)
+        while True:
+            data = await context.receive(timeout=10.0)
+            if data.get("type") == "chunk" and data.get("data"):
+                audio.append(base64.b64decode(data["data"]))
+            elif data.get("type") == "done":
+                break
+            elif data.get("type") == "error":
+                raise RuntimeError(data.get("error") or "Cartesia error")
+    finally:
+        await context.cancel()
+    return b"".join(audio)
+
 
+async def warm_tts_cache(cache_key, text, tts_engine, language, voice_id=None, sarvam_speaker=None):
+    """Background: synthesize a recurring clause once so later turns play it from cache"""
+    async with tts_warm_semaphore:
+        if tts_cache.contains(cache_key):
+            return
+        try:
+            audio = await synthesize_tts_audio(text, tts_engine, language, voice_id, sarvam_speaker)
+            await tts_cache.put(cache_key, audio)
+            print(f"✓ TTS cache warmed ({len(audio)} bytes): {text[:60]}")
+        except Exception as e:
+            print(f"✗ TTS cache warm failed: {e}")
 
-async def process_transcript(websocket, transcript, conversation_history, kb_id, stream_sid, cartesia_ws, language="en", voice_id=None, tts_engine="cartesia", sarvam_client=None, sarvam_speaker=None):
-    """Process transcript from Deepgram and generate response with TTS (Cartesia or Sarvam)"""
+
+# Persona prompts, the KB context of each turn is appended to these
+SYSTEM_PROMPTS = {
+    "hi": """आप आरती हैं, आकाशवाणी (Akashwanni) की आधिकारिक Voice AI प्रतिनिधि।
+
+आपके नियम:
+- आप सिर्फ़ आकाशवाणी और उसकी Voice AI सेवाओं के बारे में बात करेंगी। किसी और विषय पर बात न करें।
+- अगर कोई आकाशवाणी से असंबंधित सवाल पूछे, तो विनम्रता से कहें "मैं सिर्फ़ आकाशवाणी की सेवाओं के बारे में बात कर सकती हूँ। क्या मैं आपको हमारे Voice AI समाधान के बारे में बता सकती हूँ?"
+- पूरे और स्पष्ट वाक्यों में जवाब दें। अधूरा जवाब कभी न दें।
+- दो से तीन वाक्यों में जवाब दें — न बहुत छोटा, न बहुत लंबा।
+- सहज, स्वाभाविक हिंदी में बोलें जैसे फ़ोन पर बात करते हैं।
+- ग्राहक की ज़रूरत समझें और डेमो बुक करने की कोशिश करें।
+- नीचे दिए गए संदर्भ (Context) का उपयोग करके जवाब दें।""",
+    "en": """You are Aarati, the official Voice AI Representative of Akashwanni.
+
+Your rules:
+- You ONLY talk about Akashwanni and its Voice AI services. Do NOT discuss any other topic.
+- If someone asks about anything unrelated to Akashwanni, politely say "I can only help with Akashwanni's voice AI services. Would you like to know how we can help your business?"
+- Give complete, well-formed responses. Never give half-finished answers.
+- Keep responses to 2-3 sentences — not too short, not too long. Enough to be helpful and conversational.
+- Sound warm, confident, and natural like a real person on a phone call.
+- Understand the caller's business need and try to book a demo.
+- Use the Context provided below to answer questions accurately."""
+}
+
+
+async def call_kb(kb_id, kb_lease=None):
+    """The KB a turn answers from: the call's leased version, else the current one once loaded
+
+    With a lease the turn never waits on a rebuild, a changed source is only
+    picked up in the background for later calls.
+    """
+    if kb_lease is None:
+        await ensure_kb_loaded(kb_id)
+        return None  # get_kb_context_fast / lookup_cached_answer load the current version
+    kb = await kb_lease.get()
+    schedule_kb_source_check(kb_id)
+    return kb
+
+
+async def build_turn_messages(user_message, conversation_history, kb_id, language, turn_timing, kb_lease=None):
+    """System prompt + KB context + budgeted history for one turn
+
+    RAG time and the estimated prompt size go into turn_timing. With a
+    kb_lease (a KBLease) the context comes from the call's KB version.
+    """
+    # RAG context retrieval
+    rag_start = time.time()
+    base_prompt = SYSTEM_PROMPTS["hi"] if language == "hi" else SYSTEM_PROMPTS["en"]
+
+    if kb_id and kb_id != "general":
+        kb = await call_kb(kb_id, kb_lease)
+        embedding = await embed_query(user_message)
+        context = await asyncio.to_thread(get_kb_context_fast, kb_id, user_message, 3, embedding, kb)
+        rag_time = time.time() - rag_start
+        turn_timing["rag"] = rag_time
+        print(f"⏱️ RAG: {rag_time:.2f}s")
+        system_prompt = f"{base_prompt}\n\nContext: {context}"
+    else:
+        system_prompt = base_prompt
+
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(conversation_history.prompt_messages())
+    messages.append({"role": "user", "content": user_message})
+    turn_timing["prompt_tokens"] = sum(estimate_tokens(m["content"]) for m in messages)
+    return messages
+
+
+async def speculative_generate(user_message, conversation_history, kb_id, language, timing, kb_lease=None):
+    """RAG + streaming LLM for a speculative turn, timings go into the speculation's dict"""
+    messages = await build_turn_messages(user_message, conversation_history, kb_id, language, timing, kb_lease)
+    timing["llm_start"] = time.time()
+    async for token in stream_llm_tokens(messages, usage=timing):
+        timing.setdefault("llm_first_token", time.time())
+        yield token
+
+
+async def process_transcript(websocket, transcript, conversation_history, kb_id, stream_sid, cartesia_tts, language="en", voice_id=None, tts_engine="cartesia", sarvam_client=None, sarvam_speaker=None, turn_id=None, trace=None, speculation=None, kb_lease=None):
+    """Process transcript from Deepgram and generate response with TTS (Cartesia or Sarvam)
+
+    Runs as a cancellable task: on barge-in the LLM stream and TTS context are
+    cancelled and only the part of the reply generated so far is kept in history.
+    Stage timings are recorded on trace (a tracing.TurnTrace) when given.
+    With a committed speculation (a SpeculativeTurn) RAG and the LLM already ran
+    on the interim transcript, and its tokens are spoken instead. kb_lease (a
+    KBLease) keeps every turn of a call on the KB version it started with.
+    """
     
     # Use provided voice_id or get from language config
     if voice_id is None:
         voice_id = LANGUAGE_CONFIG.get(language, LANGUAGE_CONFIG["en"])["voice_id"]
     start_time = time.time()
+    turn_timing = {"start": start_time}
+    cancelled = False
     
     try:
         user_message = transcript.strip()
@@ -2833,177 +3989,171 @@ async def process_transcript(websocket, transcript, conversation_history, kb_id,
         # Clear any pending audio immediately
         await websocket.send_text(json.dumps({"event": "clear", "streamSid": stream_sid}))
         
-        # RAG context retrieval
-        rag_start = time.time()
+        # Recurring question on this KB: reuse the answer, its clauses usually hit the TTS cache too
+        cached_answer = None
+        question_embedding = None
+        kb_version = None
+        if (speculation is None and ANSWER_CACHE_ENABLED and kb_id and kb_id != "general"
+                and len(user_message.split()) >= ANSWER_CACHE_MIN_WORDS):
+            try:
+                kb = await call_kb(kb_id, kb_lease)
+                question_embedding, kb_version, cached_answer = await asyncio.to_thread(
+                    lookup_cached_answer, kb_id, language, user_message, await embed_query(user_message), kb
+                )
+            except Exception as e:
+                print(f"⚠️ Answer cache lookup failed: {e}")
+
+        if speculation is not None:
+            turn_timing.update(speculation.timing)
+            token_source = speculation.tokens()
+            print(f"🔮 Using speculative reply ({speculation.token_count} tokens ready)")
+        elif cached_answer is not None:
+            token_source = replay_cached_answer(cached_answer["answer"])
+            print(f"💾 Answer cache hit ({cached_answer['similarity']:.3f}): {cached_answer['question']}")
+        else:
+            messages = await build_turn_messages(user_message, conversation_history, kb_id, language, turn_timing,
+                                                 kb_lease)
+            token_source = stream_llm_tokens(messages, usage=turn_timing)
         
-        # Set system prompt based on language
-        if language == "hi":
-            base_prompt = """आप आरती हैं, आकाशवाणी (Akashwanni) की आधिकारिक Voice AI प्रतिनिधि।
+        # LLM (Groq streaming) -> clause splitter -> TTS, all running concurrently
+        # so the first clause is spoken while the rest of the reply is generated
+        clause_queue = asyncio.Queue()
 
-आपके नियम:
-- आप सिर्फ़ आकाशवाणी और उसकी Voice AI सेवाओं के बारे में बात करेंगी। किसी और विषय पर बात न करें।
-- अगर कोई आकाशवाणी से असंबंधित सवाल पूछे, तो विनम्रता से कहें "मैं सिर्फ़ आकाशवाणी की सेवाओं के बारे में बात कर सकती हूँ। क्या मैं आपको हमारे Voice AI समाधान के बारे में बता सकती हूँ?"
-- पूरे और स्पष्ट वाक्यों में जवाब दें। अधूरा जवाब कभी न दें।
-- दो से तीन वाक्यों में जवाब दें — न बहुत छोटा, न बहुत लंबा।
-- सहज, स्वाभाविक हिंदी में बोलें जैसे फ़ोन पर बात करते हैं।
-- ग्राहक की ज़रूरत समझें और डेमो बुक करने की कोशिश करें।
-- नीचे दिए गए संदर्भ (Context) का उपयोग करके जवाब दें।"""
-        else:
-            base_prompt = """You are Aarati, the official Voice AI Representative of Akashwanni.
+        captured_audio = []  # provider audio, cached when the reply was a single clause
 
-Your rules:
-- You ONLY talk about Akashwanni and its Voice AI services. Do NOT discuss any other topic.
-- If someone asks about anything unrelated to Akashwanni, politely say "I can only help with Akashwanni's voice AI services. Would you like to know how we can help your business?"
-- Give complete, well-formed responses. Never give half-finished answers.
-- Keep responses to 2-3 sentences — not too short, not too long. Enough to be helpful and conversational.
-- Sound warm, confident, and natural like a real person on a phone call.
-- Understand the caller's business need and try to book a demo.
-- Use the Context provided below to answer questions accurately."""
-        
-        if kb_id and kb_id != "general":
-            context = await asyncio.to_thread(get_kb_context_fast, kb_id, user_message, 3)
-            rag_time = time.time() - rag_start
-            print(f"⏱️ RAG: {rag_time:.2f}s")
-            system_prompt = f"{base_prompt}\n\nContext: {context}"
+        if tts_engine == "sarvam" and sarvam_client:
+            tts_voice_key = sarvam_speaker or SARVAM_HINDI_SPEAKER
+            tts_task = asyncio.create_task(speak_clauses_sarvam(
+                websocket, stream_sid, sarvam_client, clause_queue,
+                language, sarvam_speaker, turn_timing, captured_audio,
+                cartesia_tts=cartesia_tts, voice_id=voice_id
+            ))
         else:
-            system_prompt = base_prompt
-        
-        messages_base = conversation_history[-8:]
-        messages = [{"role": "system", "content": system_prompt}]
-        messages.extend(messages_base)
-        messages.append({"role": "user", "content": user_message})
-        
-        # LLM with Groq streaming (ultra-fast inference)
-        llm_start = time.time()
-        stream = await asyncio.to_thread(
-            groq_client.chat.completions.create,
-            model="llama-3.3-70b-versatile",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=200,
-            stream=True
-        )
-        
-        # Collect streaming response
+            tts_engine = "cartesia"
+            tts_voice_key = voice_id
+            tts_task = asyncio.create_task(speak_clauses_cartesia(
+                websocket, stream_sid, cartesia_tts, clause_queue,
+                language, voice_id, turn_timing, captured_audio
+            ))
+
+        provider_clauses = []  # (cache_key, clause) sent to the TTS provider
+        cached_chunks = 0
+
+        async def route_clause(clause):
+            """Play a clause from the audio cache if possible, otherwise hand it to the provider"""
+            nonlocal cached_chunks
+            turn_timing.setdefault("first_clause", time.time())
+            cache_key = make_tts_cache_key(tts_engine, tts_voice_key, language, clause)
+            # Cached audio can only be used before the provider stream starts,
+            # after that clauses must follow the provider's audio in order
+            if not provider_clauses:
+                frames = await tts_cache.get(cache_key)
+                if frames:
+                    for frame in frames:
+                        await send_audio_frame(websocket, stream_sid, frame, turn_timing)
+                    cached_chunks += len(frames)
+                    return
+            if not tts_cache.contains(cache_key) and tts_cache.note_miss(cache_key):
+                asyncio.create_task(warm_tts_cache(cache_key, clause, tts_engine, language, voice_id, sarvam_speaker))
+            provider_clauses.append((cache_key, clause))
+            await clause_queue.put(clause)
+
+        llm_start = turn_timing.setdefault("llm_start", time.time())
         ai_response = ""
-        for chunk in stream:
-            if chunk.choices[0].delta.content:
-                ai_response += chunk.choices[0].delta.content
-        
+        pending_text = ""
+        try:
+            async for token in token_source:
+                if "llm_first_token" not in turn_timing:
+                    turn_timing["llm_first_token"] = time.time()
+                ai_response += token
+                pending_text += token
+                clauses, pending_text = split_speakable_clauses(pending_text)
+                for clause in clauses:
+                    await route_clause(clause)
+
+            clauses, _ = split_speakable_clauses(pending_text, final=True)
+            for clause in clauses:
+                await route_clause(clause)
+            turn_timing["llm_done"] = time.time()
+
+            # Sentinel: no more text for this turn
+            await clause_queue.put(None)
+            chunks = await tts_task + cached_chunks
+            turn_timing["tts_done"] = time.time()
+
+            # A single-clause reply's audio is exactly that clause, keep it for next time
+            if len(provider_clauses) == 1 and captured_audio:
+                await tts_cache.put(provider_clauses[0][0], b"".join(captured_audio))
+        except asyncio.CancelledError:
+            # Barge-in: drop the TTS stream and keep only what was generated so far
+            tts_task.cancel()
+            try:
+                await tts_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            if ai_response.strip():
+                conversation_history.append({"role": "user", "content": user_message})
+                conversation_history.append({"role": "assistant", "content": ai_response.strip() + " ..."})
+            raise
+        except Exception:
+            tts_task.cancel()
+            raise
+
         ai_response = ai_response.strip()
-        llm_time = time.time() - llm_start
-        print(f"⏱️ LLM (Groq Streaming): {llm_time:.2f}s")
+        llm_time = turn_timing.get("llm_done", time.time()) - llm_start
+        print(f"⏱️ LLM (Groq Streaming): {llm_time:.2f}s (first token: {turn_timing.get('llm_first_token', time.time()) - llm_start:.2f}s)")
         print(f"🤖 AI: {ai_response}")
-        
+
         # Update history
         conversation_history.append({"role": "user", "content": user_message})
         conversation_history.append({"role": "assistant", "content": ai_response})
-        
-        # TTS - Route to Cartesia or Sarvam based on engine
-        tts_start = time.time()
-        chunks = 0
 
-        if tts_engine == "sarvam" and sarvam_client:
-            # Sarvam TTS (streaming) - optimized for Indian languages
-            try:
-                sarvam_lang = "hi-IN" if language == "hi" else "en-IN"
-                async with sarvam_client.text_to_speech_streaming.connect(
-                    model=SARVAM_MODEL,
-                    send_completion_event="true"
-                ) as sarvam_ws:
-                    await sarvam_ws.configure(
-                        target_language_code=sarvam_lang,
-                        speaker=sarvam_speaker or SARVAM_HINDI_SPEAKER,
-                        pace=1.0,
-                        output_audio_codec="mulaw",
-                        speech_sample_rate=8000,
-                    )
+        if question_embedding is not None and cached_answer is None and ai_response:
+            answer_cache.store(kb_id, language, kb_version, user_message, question_embedding, ai_response)
 
-                    await sarvam_ws.convert(ai_response)
-                    await sarvam_ws.flush()
+        tts_total = time.time() - llm_start
+        print(f"⏱️ TTS ({tts_engine.capitalize()}): {tts_total:.2f}s after LLM start ({cached_chunks} cached chunks)")
 
-                    async for msg in sarvam_ws:
-                        if isinstance(msg, AudioOutput):
-                            audio_b64 = msg.data.audio
-                            if audio_b64:
-                                await websocket.send_text(json.dumps({
-                                    "event": "media",
-                                    "streamSid": stream_sid,
-                                    "media": {"payload": audio_b64}
-                                }))
-                                chunks += 1
-                        elif isinstance(msg, EventResponse):
-                            if msg.data.event_type == "final":
-                                break
-
-                tts_time = time.time() - tts_start
-                print(f"⏱️ TTS (Sarvam): {tts_time:.2f}s")
-            except Exception as sarvam_err:
-                print(f"✗ Sarvam TTS error: {sarvam_err}, falling back to Cartesia")
-                tts_engine = "cartesia"
-
-        if tts_engine == "cartesia":
-            # Cartesia TTS (ULTRA-FAST streaming)
-            context_id = f"ctx_{int(time.time() * 1000)}"
-
-            request = {
-                "model_id": "sonic-multilingual",
-                "transcript": ai_response,
-                "voice": {
-                    "mode": "id",
-                    "id": voice_id
-                },
-                "context_id": context_id,
-                "output_format": {
-                    "container": "raw",
-                    "encoding": "pcm_mulaw",
-                    "sample_rate": 8000
-                },
-                "continue": False
-            }
-            if language == "hi":
-                request["language"] = "hi"
-
-            await cartesia_ws.send(json.dumps(request))
-
-            while True:
-                try:
-                    response = await asyncio.wait_for(cartesia_ws.recv(), timeout=2.0)
-                    data = json.loads(response)
-
-                    if data.get("type") == "chunk":
-                        audio_b64 = data.get("data")
-                        if audio_b64:
-                            await websocket.send_text(json.dumps({
-                                "event": "media",
-                                "streamSid": stream_sid,
-                                "media": {"payload": audio_b64}
-                            }))
-                            chunks += 1
-
-                    elif data.get("type") == "done":
-                        break
-
-                except asyncio.TimeoutError:
-                    break
-
-            tts_time = time.time() - tts_start
-            print(f"⏱️ TTS (Cartesia): {tts_time:.2f}s")
-        
-        # Mark completion
-        await websocket.send_text(json.dumps({
-            "event": "mark",
-            "streamSid": stream_sid,
-            "mark": {"name": f"response_end_{len(conversation_history)}"}
-        }))
-        
         total = time.time() - start_time
+        if "first_audio" in turn_timing:
+            # Time the caller waited for the bot to start talking, and TTS's share of it
+            tts_ttfb = turn_timing["first_audio"] - turn_timing.get("first_clause", turn_timing["first_audio"])
+            print(f"⏱️ FIRST AUDIO: {turn_timing['first_audio'] - start_time:.2f}s (TTS TTFB: {tts_ttfb:.2f}s)")
         print(f"⏱️ TOTAL: {total:.2f}s ({chunks} chunks)")
-        
+
+    except asyncio.CancelledError:
+        cancelled = True
+        print(f"✋ Turn cancelled after {time.time() - start_time:.2f}s")
+        raise
     except Exception as e:
         print(f"✗ Error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if speculation is not None:
+            speculation.cancel()
+        if trace is not None:
+            trace.interrupted = cancelled
+            # A speculation's usage arrives on its own timing dict, possibly after it was merged
+            trace.prompt_tokens = (speculation.timing if speculation is not None else turn_timing).get("prompt_tokens")
+            trace.record("rag", turn_timing.get("rag"))
+            trace.record_between("llm_ttft", turn_timing.get("llm_start"), turn_timing.get("llm_first_token"))
+            trace.record_between("llm_total", turn_timing.get("llm_start"), turn_timing.get("llm_done"))
+            trace.record_between("tts_ttfa", turn_timing.get("first_clause"), turn_timing.get("first_audio"))
+            trace.record_between("tts_total", turn_timing.get("first_clause"), turn_timing.get("tts_done"))
+            trace.record_between("first_media", start_time, turn_timing.get("first_audio"))
+            trace.record_between("turn_total", start_time, turn_timing.get("tts_done"))
+
+        # Mark the end of this turn's audio, Twilio echoes it back once playback finishes
+        if not cancelled:
+            try:
+                await websocket.send_text(json.dumps({
+                    "event": "mark",
+                    "streamSid": stream_sid,
+                    "mark": {"name": f"response_end_{turn_id}"}
+                }))
+            except Exception:
+                pass
 
 
 @app.get("/health")
@@ -3011,6 +4161,103 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/api/admin/tts-pool")
+async def get_tts_pool_stats(current_user: dict = Depends(get_admin_user)):
+    """Cartesia connection pool and multiplexer metrics (admin only)"""
+    return JSONResponse({
+        "pool": cartesia_pool.stats(),
+        "multiplexer": cartesia_mux.stats()
+    })
+
+
+@app.get("/api/admin/tts-cache")
+async def get_tts_cache_stats(current_user: dict = Depends(get_admin_user)):
+    """Synthesized-audio cache metrics: hit rate, bytes saved, residency (admin only)"""
+    return JSONResponse(tts_cache.stats())
+
+
+@app.get("/api/admin/kb-cache")
+async def get_kb_cache_stats(current_user: dict = Depends(get_admin_user)):
+    """Resident knowledge bases: sizes, hit counts, active calls and evictions (admin only)"""
+    stats = kb_cache.stats()
+    stats["index_store"] = kb_index_store.stats()
+    return JSONResponse(stats)
+
+
+@app.get("/api/admin/embeddings")
+async def get_embedding_stats(current_user: dict = Depends(get_admin_user)):
+    """Query embedding batcher: batch-size and queue-wait histograms (admin only)"""
+    stats = embedding_batcher.stats()
+    stats["enabled"] = EMBED_BATCHING
+    return JSONResponse(stats)
+
+
+@app.get("/api/admin/post-call-queue")
+async def get_post_call_queue_stats(current_user: dict = Depends(get_admin_user)):
+    """Post-call job backlog, in-flight work and retry/failure counts (admin only)"""
+    return JSONResponse(await get_post_call_queue().stats())
+
+
+@app.get("/api/admin/answer-cache")
+async def get_answer_cache_stats(current_user: dict = Depends(get_admin_user)):
+    """Semantic answer cache hit rate and size per KB (admin only)"""
+    stats = answer_cache.stats()
+    stats["enabled"] = ANSWER_CACHE_ENABLED
+    return JSONResponse(stats)
+
+
+@app.delete("/api/admin/answer-cache")
+async def clear_answer_cache(kb_id: Optional[str] = None, current_user: dict = Depends(get_admin_user)):
+    """Drop cached answers for one KB, or all of them (admin only)"""
+    removed = answer_cache.invalidate(kb_id)
+    return JSONResponse({"status": "success", "kb_id": kb_id, "removed": removed})
+
+
+@app.get("/api/admin/speculation")
+async def get_speculation_stats(current_user: dict = Depends(get_admin_user)):
+    """Speculative generation hit rate and wasted tokens (admin only)"""
+    stats = speculation_stats.stats()
+    stats["enabled"] = SPECULATIVE_ENABLED
+    stats["stable_ms"] = SPECULATIVE_STABLE_MS
+    stats["match_ratio"] = SPECULATIVE_MATCH_RATIO
+    return JSONResponse(stats)
+
+
+@app.get("/api/admin/latency")
+async def get_latency_percentiles(
+    kb_id: Optional[str] = None,
+    language: Optional[str] = None,
+    tts_engine: Optional[str] = None,
+    campaign_id: Optional[str] = None,
+    days: int = 7,
+    limit: int = 5000,
+    current_user: dict = Depends(get_admin_user)
+):
+    """p50/p95/p99 per pipeline stage over recent calls' latency traces (admin only)"""
+    from datetime import timedelta
+
+    filters = {}
+    if kb_id:
+        filters["knowledge_base_id"] = kb_id
+    if language:
+        filters["language"] = language
+    if tts_engine:
+        filters["tts_engine"] = tts_engine
+    if campaign_id:
+        filters["campaign_id"] = campaign_id
+
+    call_history_db = get_call_history_db()
+    traces = await call_history_db.get_latency_traces(
+        filters,
+        since=datetime.utcnow() - timedelta(days=days),
+        limit=min(max(limit, 1), 50000)
+    )
+    summary = summarize_latency(traces)
+    summary["filters"] = filters
+    summary["days"] = days
+    return JSONResponse(summary)
+
+
 @app.get("/api/debug/test-email")
 async def debug_test_email(to: str = None):
     """Test email delivery via Resend HTTP API"""
@@ -0,0 +1,247 @@
+# Post-call work queue - durable jobs in MongoDB drained by a pool of worker tasks
+import asyncio
+import traceback
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+class PostCallQueue:
+    """Queue of finished calls waiting for summary, lead scoring and billing
+
+    The media stream handler only inserts a job; workers claim jobs with an
+    atomic find_one_and_update and a lease, so a job whose worker died (e.g.
+    a restart mid-analysis) is picked up again once its lease expires. Failed
+    jobs are retried with exponential backoff up to max_attempts. The
+    processor records each finished step on the job via save_step(), so a
+    retry resumes where the last attempt stopped.
+    """
+
+    def __init__(
+        self,
+        db,
+        processor: Callable[[Dict], Awaitable[None]],
+        workers: int = 4,
+        max_attempts: int = 5,
+        lease_seconds: int = 300,
+        poll_interval: float = 5.0,
+        base_backoff: float = 10.0
+    ):
+        """
+        Args:
+            db: Motor database
+            processor: Coroutine function run for each claimed job
+            workers: Jobs processed concurrently (bounds LLM and DB load)
+            max_attempts: Attempts before a job is marked failed
+            lease_seconds: How long a claimed job stays invisible to other workers
+            poll_interval: Seconds between polls when the queue is idle
+            base_backoff: Seconds before the first retry, doubled on each attempt
+        """
+        self.collection = db.post_call_jobs
+        self.processor = processor
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.base_backoff = base_backoff
+        self._tasks: List[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        self.in_flight = 0
+
+        # Metrics (this process)
+        self.enqueued = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def initialize_indexes(self):
+        await self.collection.create_index([("call_sid", ASCENDING)], unique=True)
+        await self.collection.create_index([("status", ASCENDING), ("next_attempt_at", ASCENDING)])
+
+    async def enqueue(self, call_sid: str, payload: Dict) -> bool:
+        """Queue post-call work for a finished call, False if it was already queued"""
+        now = datetime.utcnow()
+        try:
+            await self.collection.insert_one({
+                "call_sid": call_sid,
+                "payload": payload,
+                "status": "pending",
+                "attempts": 0,
+                "steps": {},
+                "next_attempt_at": now,
+                "lease_until": None,
+                "error": None,
+                "created_at": now,
+                "updated_at": now
+            })
+        except DuplicateKeyError:
+            return False
+        self.enqueued += 1
+        self._wake.set()
+        return True
+
+    async def save_step(self, job_id, step: str, result: Dict):
+        """Persist the outcome of one processing step so retries skip it"""
+        await self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {f"steps.{step}": result, "updated_at": datetime.utcnow()}}
+        )
+
+    async def _claim(self) -> Optional[Dict]:
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "processing", "lease_until": {"$lt": now}}  # worker died
+            ]},
+            {
+                "$set": {
+                    "status": "processing",
+                    "lease_until": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _finish(self, job: Dict, error: Optional[Exception]):
+        now = datetime.utcnow()
+        if error is None:
+            update = {"status": "done", "lease_until": None, "error": None, "completed_at": now}
+            self.completed += 1
+        elif job["attempts"] >= self.max_attempts:
+            update = {"status": "failed", "lease_until": None, "error": str(error)}
+            self.failed += 1
+            print(f"✗ Post-call job {job['call_sid']} failed after {job['attempts']} attempts: {error}")
+        else:
+            delay = self.base_backoff * (2 ** (job["attempts"] - 1))
+            update = {
+                "status": "pending",
+                "lease_until": None,
+                "error": str(error),
+                "next_attempt_at": now + timedelta(seconds=delay)
+            }
+            self.retried += 1
+            print(f"⚠️ Post-call job {job['call_sid']} attempt {job['attempts']} failed, retrying in {delay:.0f}s: {error}")
+        update["updated_at"] = now
+        await self.collection.update_one({"_id": job["_id"]}, {"$set": update})
+
+    async def _worker(self, worker_id: int):
+        while True:
+            try:
+                self._wake.clear()
+                job = await self._claim()
+                if job is None:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                self.in_flight += 1
+                error = None
+                try:
+                    await self.processor(job)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    traceback.print_exc()
+                    error = e
+                finally:
+                    self.in_flight -= 1
+                await self._finish(job, error)
+            except asyncio.CancelledError:
+                return
+            except Exception as e:
+                print(f"✗ Post-call worker {worker_id} error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        """Start the worker pool in background"""
+        self._tasks = [t for t in self._tasks if not t.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker(len(self._tasks))))
+        print(f"✓ Post-call queue started ({self.workers} workers)")
+
+    async def stop(self):
+        """Stop the workers, claimed jobs are retried after their lease expires"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def stats(self) -> dict:
+        counts = {"pending": 0, "processing": 0, "done": 0, "failed": 0}
+        async for row in self.collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        oldest = await self.collection.find_one({"status": "pending"}, sort=[("created_at", ASCENDING)])
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "jobs": counts,
+            "oldest_pending_age_seconds": (
+                round((datetime.utcnow() - oldest["created_at"]).total_seconds(), 1) if oldest else None
+            ),
+            "enqueued": self.enqueued,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed
+        }
+
+
+async def bill_call(wallet_db, transaction_db, user_id: str, call_sid: str, amount: float, description: str,
+                    campaign_id: Optional[str] = None, metadata: Optional[Dict] = None) -> Optional[float]:
+    """Charge a call to the user's wallet exactly once, returns the new balance or None if already charged
+
+    The call's debit transaction is claimed as "pending" before the wallet is
+    touched, and the wallet records the debit id in the same update as the
+    balance. A retry, or a second worker that took over an expired lease,
+    finds the claim: a "completed" one is left alone, a "pending" one (the
+    earlier attempt died after claiming) is finished, and the wallet charges it
+    only if the earlier attempt had not.
+    """
+    debit = await transaction_db.claim_call_debit(
+        user_id=user_id,
+        amount=amount,
+        description=description,
+        call_sid=call_sid,
+        campaign_id=campaign_id,
+        metadata=metadata
+    )
+    # Debits written before claims existed have no status, they were charged when inserted
+    if debit.get("status", "completed") == "completed":
+        print(f"⚠️ Call {call_sid} was already billed by an earlier attempt, not charging again")
+        return None
+    try:
+        new_balance = await wallet_db.deduct_funds_once(user_id=user_id, amount=debit["amount"], transaction_id=debit["_id"])
+    except ValueError:
+        await transaction_db.delete_transaction(debit["_id"])
+        raise
+    await transaction_db.set_transaction_status(debit["_id"], "completed")
+    if new_balance is None:
+        print(f"⚠️ Call {call_sid} was charged by an earlier attempt, its debit is settled now")
+    return new_balance
+
+
+# Global post-call queue instance
+_post_call_queue: Optional[PostCallQueue] = None
+
+
+def get_post_call_queue() -> PostCallQueue:
+    """Get the global post-call queue"""
+    if _post_call_queue is None:
+        raise RuntimeError("Post-call queue not initialized")
+    return _post_call_queue
+
+
+async def initialize_post_call_queue(db, processor: Callable[[Dict], Awaitable[None]], workers: int = 4, max_attempts: int = 5) -> PostCallQueue:
+    """Create the queue, its indexes, and start the workers"""
+    global _post_call_queue
+    _post_call_queue = PostCallQueue(db, processor, workers=workers, max_attempts=max_attempts)
+    await _post_call_queue.initialize_indexes()
+    _post_call_queue.start()
+    return _post_call_queue
@@ -0,0 +1,120 @@
+# Speculative response generation on stable interim transcripts
+import asyncio
+import re
+import time
+from difflib import SequenceMatcher
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+
+def normalize_utterance(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace before comparing transcripts"""
+    text = re.sub(r"[^\w\s]", " ", (text or "").lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def utterance_similarity(a: str, b: str) -> float:
+    return SequenceMatcher(None, normalize_utterance(a), normalize_utterance(b)).ratio()
+
+
+class SpeculativeTurn:
+    """RAG + LLM generation started on an interim transcript, before speech_final
+
+    Tokens are buffered as they arrive. If the final utterance matches, the
+    turn consumes them through tokens(), which replays the buffer and then
+    follows the still-running generation, so nothing is generated twice.
+    """
+
+    def __init__(self, text: str, history_version: int, generate: Callable[[Dict], AsyncIterator[str]]):
+        """
+        Args:
+            text: Interim transcript the generation is based on
+            history_version: conversation_history.version at start, any message appended since invalidates the result
+            generate: Async generator factory taking a timing dict (rag, llm_start, llm_first_token)
+        """
+        self.text = text
+        self.started_at = time.time()
+        self.history_version = history_version
+        self.timing: Dict[str, float] = {}
+        self.buffer: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.cancelled = False   # a cut-off generation must never be committed
+        self._changed = asyncio.Event()
+        self._task = asyncio.create_task(self._run(generate))
+
+    async def _run(self, generate):
+        try:
+            async for token in generate(self.timing):
+                self.buffer.append(token)
+                self._changed.set()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._changed.set()
+
+    @property
+    def token_count(self) -> int:
+        return len(self.buffer)
+
+    def matches(self, text: str, history_version: int, min_ratio: float) -> bool:
+        """True if the result can answer the final utterance text"""
+        if self.error is not None or self.cancelled or history_version != self.history_version:
+            return False
+        return utterance_similarity(self.text, text) >= min_ratio
+
+    async def tokens(self) -> AsyncIterator[str]:
+        """Buffered tokens, then the rest of the generation as it streams in"""
+        index = 0
+        while True:
+            while index < len(self.buffer):
+                yield self.buffer[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+    def cancel(self):
+        self.cancelled = True
+        if not self._task.done():
+            self._task.cancel()
+
+
+class SpeculationStats:
+    """Hit rate and token waste of speculative generation, to tune stability/match thresholds"""
+
+    def __init__(self):
+        self.started = 0
+        self.committed = 0
+        self.discarded = 0
+        self.committed_tokens = 0
+        self.wasted_tokens = 0   # tokens generated by discarded speculations
+        self.head_start_ms_total = 0.0   # speculation start -> speech_final, summed over commits
+
+    def record_commit(self, turn: SpeculativeTurn):
+        self.committed += 1
+        self.committed_tokens += turn.token_count
+        self.head_start_ms_total += (time.time() - turn.started_at) * 1000
+
+    def record_discard(self, turn: SpeculativeTurn):
+        self.discarded += 1
+        self.wasted_tokens += turn.token_count
+
+    def stats(self) -> dict:
+        resolved = self.committed + self.discarded
+        generated = self.committed_tokens + self.wasted_tokens
+        return {
+            "started": self.started,
+            "committed": self.committed,
+            "discarded": self.discarded,
+            "hit_rate": round(self.committed / resolved, 4) if resolved else None,
+            "committed_tokens": self.committed_tokens,
+            "wasted_tokens": self.wasted_tokens,
+            "waste_ratio": round(self.wasted_tokens / generated, 4) if generated else None,
+            "avg_head_start_ms": round(self.head_start_ms_total / self.committed, 1) if self.committed else None
+        }
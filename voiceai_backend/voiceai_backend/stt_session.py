@@ -0,0 +1,100 @@
+# Asyncio-native Deepgram live transcription session (one per call)
+import asyncio
+from contextlib import AsyncExitStack
+from typing import Optional
+
+from deepgram.listen.v1 import ListenV1CloseStream, ListenV1KeepAlive
+
+
+class DeepgramSTTSession:
+    """Live Deepgram connection whose results are delivered through an asyncio.Queue
+
+    Everything runs on the event loop: one reader task per call instead of a
+    blocking start_listening() thread, and results are consumed by a single
+    per-call task, so call state is never mutated from another thread.
+    """
+
+    def __init__(self, client, call_id: str, language: str = "en", **options):
+        """
+        Args:
+            client: AsyncDeepgramClient instance (shared by all calls)
+            call_id: Identifier used in log lines
+            language: Deepgram language code
+            options: Extra listen.v1.connect() options (model, endpointing, ...)
+        """
+        self.client = client
+        self.call_id = call_id
+        self.language = language
+        self.options = options
+        self.results: asyncio.Queue = asyncio.Queue()  # Deepgram results, None when the stream ends
+        self.connection = None
+        self._stack: Optional[AsyncExitStack] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._closed = False
+        self._ended = False
+
+    async def start(self):
+        """Open the websocket and start the reader task"""
+        self._stack = AsyncExitStack()
+        try:
+            self.connection = await self._stack.enter_async_context(
+                self.client.listen.v1.connect(language=self.language, **self.options)
+            )
+        except Exception:
+            await self._stack.aclose()
+            raise
+        self._reader = asyncio.create_task(self._read_loop())
+        return self
+
+    async def _read_loop(self):
+        """Move every message Deepgram sends onto the results queue"""
+        try:
+            async for message in self.connection:
+                self.results.put_nowait(message)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            if not self._closed:
+                print(f"✗ Deepgram error ({self.call_id}): {e}")
+        finally:
+            self._end_results()
+
+    def _end_results(self):
+        """Queue the end-of-stream None exactly once"""
+        if not self._ended:
+            self._ended = True
+            self.results.put_nowait(None)
+
+    async def send_audio(self, chunk: bytes):
+        """Forward one chunk of caller μ-law audio"""
+        if self.connection is not None and not self._closed:
+            await self.connection.send_media(chunk)
+
+    async def keep_alive(self):
+        """Keep the stream open while no audio is being sent"""
+        if self.connection is not None and not self._closed:
+            await self.connection.send_keep_alive(ListenV1KeepAlive(type="KeepAlive"))
+
+    async def close(self):
+        """Close the stream and stop the reader task"""
+        if self._closed:
+            return
+        self._closed = True
+        if self.connection is not None:
+            try:
+                await self.connection.send_close_stream(ListenV1CloseStream(type="CloseStream"))
+            except Exception:
+                pass
+        if self._reader and not self._reader.done():
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+        # A reader cancelled before it first ran never reaches its finally
+        self._end_results()
+        if self._stack:
+            try:
+                await self._stack.aclose()
+            except Exception:
+                pass
@@ -0,0 +1,5 @@
+# Tests run against the flat backend modules, like the benchmarks do
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
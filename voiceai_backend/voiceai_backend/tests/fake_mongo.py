@@ -0,0 +1,172 @@
+# In-memory stand-in for the Motor collection calls the queue and billing code make
+import copy
+from types import SimpleNamespace
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+TYPES = {"string": str, "int": int, "double": float, "bool": bool}
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def _set(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _equals(value, operand):
+    """Mongo equality, an array field matches any of its elements"""
+    return value == operand or (isinstance(value, list) and operand in value)
+
+
+def _matches_value(value, condition):
+    if not isinstance(condition, dict) or not any(str(k).startswith("$") for k in condition):
+        return _equals(value, condition)
+    for op, operand in condition.items():
+        if op == "$lte" and not (value is not None and value <= operand):
+            return False
+        if op == "$lt" and not (value is not None and value < operand):
+            return False
+        if op == "$gte" and not (value is not None and value >= operand):
+            return False
+        if op == "$gt" and not (value is not None and value > operand):
+            return False
+        if op == "$ne" and _equals(value, operand):
+            return False
+        if op == "$exists" and (value is not None) != operand:
+            return False
+        if op == "$type" and not isinstance(value, TYPES[operand]):
+            return False
+    return True
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif not _matches_value(_get(doc, key), condition):
+            return False
+    return True
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+        self.unique = []  # (fields, partial filter)
+
+    async def create_index(self, keys, unique=False, partialFilterExpression=None, **kwargs):
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        if unique:
+            index = ([field for field, _ in keys], partialFilterExpression or {})
+            seen = set()
+            for doc in self.docs:
+                if matches(doc, index[1]):
+                    key = repr([_get(doc, f) for f in index[0]])
+                    if key in seen:
+                        raise DuplicateKeyError(f"index build failed, duplicate key {key}")
+                    seen.add(key)
+            self.unique.append(index)
+
+    def _check_unique(self, candidate, ignore=None):
+        for fields, partial in self.unique:
+            if not matches(candidate, partial):
+                continue
+            key = [_get(candidate, f) for f in fields]
+            for doc in self.docs:
+                if doc is not ignore and matches(doc, partial) and [_get(doc, f) for f in fields] == key:
+                    raise DuplicateKeyError(f"duplicate key {dict(zip(fields, key))}")
+
+    def _find(self, query, sort=None):
+        found = [doc for doc in self.docs if matches(doc, query)]
+        for field, direction in reversed(sort or []):
+            found.sort(key=lambda d: _get(d, field), reverse=direction < 0)
+        return found
+
+    def _apply(self, doc, update, inserting=False):
+        for path, value in update.get("$set", {}).items():
+            _set(doc, path, value)
+        for path, value in update.get("$inc", {}).items():
+            _set(doc, path, (_get(doc, path) or 0) + value)
+        for path, value in update.get("$push", {}).items():
+            items = (_get(doc, path) or []) + (value["$each"] if isinstance(value, dict) else [value])
+            if isinstance(value, dict) and "$slice" in value:
+                items = items[value["$slice"]:] if value["$slice"] < 0 else items[:value["$slice"]]
+            _set(doc, path, items)
+        if inserting:
+            for path, value in update.get("$setOnInsert", {}).items():
+                _set(doc, path, value)
+
+    async def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self._check_unique(doc)
+        self.docs.append(copy.deepcopy(doc))
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def find_one(self, query=None, projection=None, sort=None):
+        found = self._find(query or {}, sort)
+        if not found:
+            return None
+        doc = copy.deepcopy(found[0])
+        if projection:
+            if any(projection.values()):
+                doc = {k: v for k, v in doc.items() if k == "_id" or projection.get(k)}
+            else:
+                doc = {k: v for k, v in doc.items() if k not in projection}
+        return doc
+
+    async def update_one(self, query, update, upsert=False):
+        found = self._find(query)
+        if found:
+            updated = copy.deepcopy(found[0])
+            self._apply(updated, update)
+            self._check_unique(updated, ignore=found[0])
+            found[0].clear()
+            found[0].update(updated)
+            return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if not upsert:
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+        doc = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+        self._apply(doc, update, inserting=True)
+        result = await self.insert_one(doc)
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=result.inserted_id)
+
+    async def delete_one(self, query):
+        found = self._find(query)
+        if found:
+            self.docs.remove(found[0])
+        return SimpleNamespace(deleted_count=len(found[:1]))
+
+    async def find_one_and_update(self, query, update, sort=None, return_document=ReturnDocument.BEFORE):
+        found = self._find(query, sort)
+        if not found:
+            return None
+        before = copy.deepcopy(found[0])
+        self._apply(found[0], update)
+        return copy.deepcopy(found[0] if return_document == ReturnDocument.AFTER else before)
+
+
+class FakeDatabase:
+    """db["name"] and db.name both give a collection, like Motor"""
+
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name == "collections":
+            raise AttributeError(name)
+        return self[name]
@@ -0,0 +1,121 @@
+import numpy as np
+
+from answer_cache import SemanticAnswerCache
+from kb_cache import KBCacheManager
+
+
+def unit(seed, dimension=16):
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype("float32")
+    return vector / np.linalg.norm(vector)
+
+
+def test_versions_keep_separate_buckets():
+    """Calls on a retired KB version and on the new one don't wipe each other's answers"""
+    cache = SemanticAnswerCache()
+    question = unit(0)
+    cache.store("kb", "en", "v1", "what does it cost", question, "old price")
+    cache.store("kb", "en", "v2", "what does it cost", question, "new price")
+    for _ in range(3):
+        assert cache.lookup("kb", "en", "v1", question)["answer"] == "old price"
+        assert cache.lookup("kb", "en", "v2", question)["answer"] == "new price"
+    assert cache.stats()["hits"] == 6
+
+
+def test_drop_version_only_removes_that_version():
+    cache = SemanticAnswerCache()
+    cache.store("kb", "en", "v1", "q", unit(0), "old")
+    cache.store("kb", "hi", "v1", "q", unit(0), "old hi")
+    cache.store("kb", "en", "v2", "q", unit(0), "new")
+    assert cache.drop_version("kb", "v1") == 2
+    assert cache.lookup("kb", "en", "v1", unit(0)) is None
+    assert cache.lookup("kb", "en", "v2", unit(0))["answer"] == "new"
+
+
+def test_kb_cache_drops_answers_when_last_call_on_old_version_ends():
+    answers = SemanticAnswerCache()
+    kbs = KBCacheManager(on_version_dropped=answers.drop_version)
+    kbs.put("kb", {"version": "v1", "texts": ["a"]})
+    held = kbs.acquire("kb")
+    answers.store("kb", "en", "v1", "q", unit(0), "old")
+
+    kbs.put("kb", {"version": "v2", "texts": ["b"]})
+    answers.store("kb", "en", "v2", "q", unit(0), "new")
+    assert answers.lookup("kb", "en", "v1", unit(0))["answer"] == "old"  # still served to the held call
+
+    kbs.release("kb", held["version"])
+    assert answers.lookup("kb", "en", "v1", unit(0)) is None
+    assert answers.lookup("kb", "en", "v2", unit(0))["answer"] == "new"
+
+
+def test_kb_cache_drops_answers_of_unheld_version_on_swap():
+    answers = SemanticAnswerCache()
+    kbs = KBCacheManager(on_version_dropped=answers.drop_version)
+    kbs.put("kb", {"version": "v1", "texts": ["a"]})
+    answers.store("kb", "en", "v1", "q", unit(0), "old")
+    kbs.put("kb", {"version": "v2", "texts": ["b"]})
+    assert answers.lookup("kb", "en", "v1", unit(0)) is None
+
+
+def blend(a, b, weight):
+    """Unit vector weight of the way from a towards b"""
+    vector = (1 - weight) * a + weight * b
+    return vector / np.linalg.norm(vector)
+
+
+def test_only_similar_questions_hit():
+    cache = SemanticAnswerCache(threshold=0.92)
+    question, other = unit(0), unit(1)
+    cache.store("kb", "en", "v1", "what does it cost", question, "4999")
+    assert cache.lookup("kb", "en", "v1", blend(question, other, 0.1))["answer"] == "4999"
+    assert cache.lookup("kb", "en", "v1", blend(question, other, 0.6)) is None
+    assert cache.lookup("kb", "hi", "v1", question) is None  # other language, other bucket
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_best_match_wins():
+    cache = SemanticAnswerCache(threshold=0.5)
+    question, other = unit(0), unit(1)
+    cache.store("kb", "en", "v1", "far", blend(question, other, 0.3), "far answer")
+    cache.store("kb", "en", "v1", "near", blend(question, other, 0.05), "near answer")
+    assert cache.lookup("kb", "en", "v1", question)["answer"] == "near answer"
+
+
+def test_expired_answers_are_removed(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("answer_cache.time.time", lambda: clock[0])
+    cache = SemanticAnswerCache(ttl=60)
+    cache.store("kb", "en", "v1", "q", unit(0), "answer")
+    clock[0] += 59
+    assert cache.lookup("kb", "en", "v1", unit(0))["answer"] == "answer"
+    clock[0] += 2
+    assert cache.lookup("kb", "en", "v1", unit(0)) is None
+    assert cache.expirations == 1
+
+
+def test_least_recently_used_answer_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.store("kb", "en", "v1", "a", unit(0), "A")
+    cache.store("kb", "en", "v1", "b", unit(1), "B")
+    cache.lookup("kb", "en", "v1", unit(0))
+    cache.store("kb", "en", "v1", "c", unit(2), "C")
+    assert cache.lookup("kb", "en", "v1", unit(1)) is None
+    assert cache.lookup("kb", "en", "v1", unit(0))["answer"] == "A"
+    assert cache.lookup("kb", "en", "v1", unit(2))["answer"] == "C"
+    assert cache.evictions == 1
+
+
+def test_empty_answers_are_not_stored():
+    cache = SemanticAnswerCache()
+    cache.store("kb", "en", "v1", "q", unit(0), "")
+    assert cache.stores == 0
+
+
+def test_invalidate_one_kb_or_all():
+    cache = SemanticAnswerCache()
+    cache.store("a", "en", "v1", "q", unit(0), "A")
+    cache.store("a", "hi", "v1", "q", unit(0), "A hi")
+    cache.store("b", "en", "v1", "q", unit(0), "B")
+    assert cache.invalidate("a") == 2
+    assert cache.lookup("a", "en", "v1", unit(0)) is None
+    assert cache.lookup("b", "en", "v1", unit(0))["answer"] == "B"
+    assert cache.invalidate() == 1
@@ -0,0 +1,66 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from embedding_backend import cosine_agreement, load_embedding_model
+
+
+class FixedModel:
+    """encode() returning preset rows, like SentenceTransformer.encode on a list"""
+
+    def __init__(self, rows):
+        self.rows = np.array(rows, dtype=np.float32)
+
+    def encode(self, texts, convert_to_numpy=True):
+        return self.rows[:len(texts)].copy()
+
+
+@pytest.fixture
+def fake_sentence_transformers(monkeypatch):
+    """sentence_transformers module whose SentenceTransformer records the model name instead of loading it"""
+    module = types.ModuleType("sentence_transformers")
+
+    class SentenceTransformer:
+        def __init__(self, model_name):
+            self.model_name = model_name
+
+    module.SentenceTransformer = SentenceTransformer
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    return SentenceTransformer
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        load_embedding_model("all-MiniLM-L6-v2", "tensorflow")
+
+
+def test_torch_backend_loads_sentence_transformer(fake_sentence_transformers):
+    model = load_embedding_model("all-MiniLM-L6-v2")
+    assert isinstance(model, fake_sentence_transformers)
+    assert model.model_name == "all-MiniLM-L6-v2"
+
+
+def test_onnx_backend_without_its_packages_falls_back_to_torch(fake_sentence_transformers, monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, "onnxruntime", None)  # import onnxruntime raises ImportError
+    model = load_embedding_model("all-MiniLM-L6-v2", "onnx")
+    assert isinstance(model, fake_sentence_transformers)
+    output = capsys.readouterr().out
+    assert "onnx embedding backend needs onnxruntime" in output
+    assert "requirements-onnx.txt" in output
+    assert "using PyTorch" in output
+
+
+def test_cosine_agreement_of_identical_models():
+    rows = [[1.0, 0.0], [0.6, 0.8], [3.0, 4.0]]
+    agreement = cosine_agreement(FixedModel(rows), FixedModel(rows), ["a", "b", "c"])
+    assert agreement == {"texts": 3, "min": 1.0, "p1": 1.0, "mean": 1.0}
+
+
+def test_cosine_agreement_ignores_scale_and_reports_worst_text():
+    model = FixedModel([[1.0, 0.0], [0.0, 2.0], [1.0, 1.0]])
+    reference = FixedModel([[5.0, 0.0], [0.0, 1.0], [1.0, 0.0]])  # last text is 45 degrees off
+    agreement = cosine_agreement(model, reference, ["a", "b", "c"])
+    assert agreement["min"] == agreement["p1"] == round(float(np.cos(np.pi / 4)), 4)
+    assert agreement["mean"] == round(float((2 + np.cos(np.pi / 4)) / 3), 4)
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from embedding_service import EmbeddingBatcher
+
+
+class RecordingEncoder:
+    """Batch encoder mapping "q<n>" to [n, len(text)], failing any batch that contains `poison`"""
+
+    def __init__(self, poison=None):
+        self.batches = []
+        self.poison = poison
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        if self.poison in texts:
+            raise RuntimeError("CUDA out of memory")
+        return np.array([[float(text[1:]), float(len(text))] for text in texts], dtype="float32")
+
+
+def run(scenario):
+    """Run an async test body against a fresh batcher and close it afterwards"""
+
+    async def wrapper():
+        batcher = None
+        try:
+            batcher = await scenario()
+        finally:
+            if batcher is not None:
+                await batcher.close()
+
+    asyncio.run(wrapper())
+
+
+def test_queries_arriving_within_the_window_share_a_batch():
+    encoder = RecordingEncoder()
+
+    async def scenario():
+        batcher = EmbeddingBatcher(encoder, max_batch=8, window_ms=200)
+        first = [asyncio.create_task(batcher.embed(text)) for text in ("q1", "q2")]
+        await asyncio.sleep(0.02)  # the worker is holding the batch open
+        late = asyncio.create_task(batcher.embed("q3"))
+        await asyncio.gather(*first, late)
+        assert encoder.batches == [["q1", "q2", "q3"]]
+        return batcher
+
+    run(scenario)
+
+
+def test_lone_query_after_idle_skips_the_window():
+    encoder = RecordingEncoder()
+
+    async def scenario():
+        batcher = EmbeddingBatcher(encoder, window_ms=500)
+        batcher._last_queued = time.perf_counter() - 60  # nobody asked for a minute
+        started = time.perf_counter()
+        await batcher.embed("q1")
+        assert time.perf_counter() - started < 0.5
+        return batcher
+
+    run(scenario)
+
+
+def test_batches_are_capped_at_max_batch():
+    encoder = RecordingEncoder()
+
+    async def scenario():
+        batcher = EmbeddingBatcher(encoder, max_batch=4, window_ms=50)
+        await asyncio.gather(*(batcher.embed(f"q{n}") for n in range(10)))
+        assert [len(batch) for batch in encoder.batches] == [4, 4, 2]
+        stats = batcher.stats()
+        assert (stats["batches"], stats["encoded"], stats["avg_batch_size"]) == (3, 10, 3.33)
+        assert (stats["batch_size_histogram"]["<=2"], stats["batch_size_histogram"]["<=4"]) == (1, 2)
+        return batcher
+
+    run(scenario)
+
+
+def test_each_request_gets_its_own_vector():
+    encoder = RecordingEncoder()
+
+    async def scenario():
+        batcher = EmbeddingBatcher(encoder, max_batch=3, window_ms=5)
+        texts = ["q7", "q12", "q7", "q3", "q100", "q5"]
+        vectors = await asyncio.gather(*(batcher.embed(text) for text in texts))
+        for text, vector in zip(texts, vectors):
+            assert vector.tolist() == [float(text[1:]), float(len(text))]
+        assert batcher.coalesced == 1  # the second "q7" waited for the first
+        assert sum(len(batch) for batch in encoder.batches) == 5
+
+        # Answered from the LRU afterwards, without another encode
+        assert (await batcher.embed("q12")).tolist() == [12.0, 3.0]
+        assert batcher.cache_hits == 1
+        return batcher
+
+    run(scenario)
+
+
+def test_failed_encode_fails_only_its_own_batch():
+    encoder = RecordingEncoder(poison="q2")
+
+    async def scenario():
+        batcher = EmbeddingBatcher(encoder, max_batch=2, window_ms=5)
+        results = await asyncio.gather(*(batcher.embed(f"q{n}") for n in range(1, 5)), return_exceptions=True)
+        assert encoder.batches == [["q1", "q2"], ["q3", "q4"]]
+        assert [type(result) for result in results[:2]] == [RuntimeError, RuntimeError]
+        assert [result.tolist() for result in results[2:]] == [[3.0, 2.0], [4.0, 2.0]]
+        assert batcher.errors == 1
+
+        # Nothing from the failed batch is cached or left in flight, a retry encodes again
+        encoder.poison = None
+        assert (await batcher.embed("q1")).tolist() == [1.0, 2.0]
+        assert batcher._inflight == {}
+        return batcher
+
+    run(scenario)
+
+
+def test_close_stops_the_worker():
+    async def scenario():
+        batcher = EmbeddingBatcher(RecordingEncoder())
+        await batcher.embed("q1")
+        worker = batcher._worker
+        await batcher.close()
+        await asyncio.sleep(0)
+        assert worker.done()
+        with pytest.raises(RuntimeError):
+            batcher._executor.submit(print)
+
+    asyncio.run(scenario())
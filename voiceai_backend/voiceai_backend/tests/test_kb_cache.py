@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+
+from kb_cache import KBCacheManager, KBLease, estimate_kb_bytes
+
+
+def kb(version="v1", kilobytes=1):
+    """KB dict that estimate_kb_bytes counts as kilobytes * 1000 bytes"""
+    return {"version": version, "texts": ["x" * 950] * kilobytes}
+
+
+def test_estimate_counts_text_and_overhead():
+    assert estimate_kb_bytes(kb(kilobytes=3)) == 3000
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        KBCacheManager(policy="fifo")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = KBCacheManager(max_bytes=2000, policy="lru")
+    cache.put("a", kb())
+    cache.put("b", kb())
+    cache.get("a")
+    cache.put("c", kb())
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.bytes == 2000
+    assert cache.evictions == 1
+
+
+def test_lfu_evicts_least_often_used():
+    cache = KBCacheManager(max_bytes=2000, policy="lfu")
+    cache.put("a", kb())
+    cache.put("b", kb())
+    for _ in range(3):
+        cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    cache.put("c", kb())
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+
+
+def test_newly_loaded_kb_is_never_its_own_victim():
+    cache = KBCacheManager(max_bytes=1000)
+    cache.put("a", kb())
+    cache.put("big", kb(kilobytes=5))
+    assert "big" in cache
+    assert "a" not in cache
+    assert cache.bytes == 5000
+
+
+def test_pinned_kb_survives_over_budget():
+    cache = KBCacheManager(max_bytes=1000)
+    cache.put("a", kb())
+    cache.acquire("a")
+    cache.put("b", kb())
+    assert "a" in cache and "b" in cache
+    assert cache.bytes == 2000
+
+    # Once released it is the eviction victim again
+    cache.release("a", "v1")
+    assert "a" not in cache
+    assert cache.bytes == 1000
+
+
+def test_get_and_peek_counting():
+    cache = KBCacheManager()
+    assert cache.get("missing") is None
+    cache.put("a", kb())
+    cache.peek("a")
+    cache.get("a")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["resident"][0]["hits"] == 1
+
+
+def test_swap_retires_version_held_by_a_call():
+    dropped = []
+    cache = KBCacheManager(on_version_dropped=lambda kb_id, version: dropped.append((kb_id, version)))
+    cache.put("a", kb("v1"))
+    held = cache.acquire("a")
+    cache.put("a", kb("v2", kilobytes=2))
+
+    assert cache.peek("a")["version"] == "v2"
+    assert held["version"] == "v1"
+    assert cache.bytes == 3000
+    assert [entry["version"] for entry in cache.stats()["retired"]] == ["v1"]
+    assert dropped == []
+
+    cache.release("a", "v1")
+    assert cache.bytes == 2000
+    assert cache.stats()["retired"] == []
+    assert dropped == [("a", "v1")]
+
+
+def test_swap_of_unheld_version_drops_it_at_once():
+    dropped = []
+    cache = KBCacheManager(on_version_dropped=lambda kb_id, version: dropped.append((kb_id, version)))
+    cache.put("a", kb("v1"))
+    cache.put("a", kb("v2"))
+    assert dropped == [("a", "v1")]
+    assert cache.bytes == 1000
+    assert cache.swaps == 1
+
+
+def test_putting_back_a_retired_version_restores_it():
+    cache = KBCacheManager()
+    cache.put("a", kb("v1"))
+    cache.acquire("a")
+    cache.put("a", kb("v2"))
+    cache.put("a", kb("v1"))
+    assert cache.stats()["retired"] == []
+    assert cache.bytes == 1000
+
+
+def test_reloading_same_version_is_not_a_swap():
+    cache = KBCacheManager()
+    cache.put("a", kb("v1"))
+    cache.put("a", kb("v1"))
+    assert cache.swaps == 0
+    assert cache.bytes == 1000
+
+
+def test_lease_answers_from_its_version_until_released():
+    cache = KBCacheManager()
+    loads = []
+
+    async def load(kb_id):
+        loads.append(kb_id)
+        if kb_id not in cache:
+            cache.put(kb_id, kb("v1"))
+
+    async def scenario():
+        lease = KBLease(cache, "a", load)
+        first = await lease.get()
+        cache.put("a", kb("v2"))
+        again = await lease.get()
+        assert first is again and again["version"] == "v1"
+        assert loads == ["a"]  # later turns don't go back to the loader
+
+        lease.release()
+        lease.release()
+        assert cache.stats()["retired"] == []
+        assert cache.bytes == 1000
+
+    asyncio.run(scenario())
+
+
+def test_lease_released_while_loading_holds_nothing():
+    cache = KBCacheManager()
+
+    async def scenario():
+        lease = KBLease(cache, "a", None)
+
+        async def load(kb_id):
+            lease.release()  # the call hung up before its KB was loaded
+            cache.put(kb_id, kb("v1"))
+
+        lease.load = load
+        assert (await lease.get())["version"] == "v1"
+        assert cache.stats()["resident"][0]["active_calls"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,158 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import kb_ingest
+from kb_ingest import KBIngestionManager
+
+
+class FakeStore:
+    """KBIndexStore stand-in whose builds are named after their content hash"""
+
+    def config(self):
+        return {}
+
+    def load(self, kb_id, content_hash):
+        return {"version": content_hash, "texts": []}
+
+
+class FakeBuilds:
+    """_build_kb replacement run in threads, each build waits for the test to release it"""
+
+    def __init__(self):
+        self.gates = {}
+
+    def __call__(self, job_id, kb_id, source_path, store_config, embedding_options):
+        kb_ingest._progress_queue.put((job_id, 256, 1000))
+        self.gates[job_id].wait(5)
+        if embedding_options.get("fail"):
+            raise RuntimeError("encoder ran out of memory")
+        return {"content_hash": f"hash-{job_id[:6]}", "count": 1000, "built": True}
+
+    def expect(self, job):
+        self.gates[job.job_id] = threading.Event()
+
+    def release(self, job):
+        self.gates[job.job_id].set()
+
+
+@pytest.fixture
+def ingestion(tmp_path, monkeypatch):
+    """Manager with a thread pool instead of worker processes, and the builds it ran"""
+    (tmp_path / "faq.txt").write_text("Refunds take 7 days\n", encoding="utf-8")
+    builds = FakeBuilds()
+    progress = queue.Queue()
+    monkeypatch.setattr(kb_ingest, "_build_kb", builds)
+    monkeypatch.setattr(kb_ingest, "_progress_queue", progress)
+    swapped = []
+
+    async def on_ready(kb_id, kb):
+        swapped.append((kb_id, kb["version"]))
+
+    def make(**options):
+        manager = KBIngestionManager(FakeStore(), str(tmp_path), on_ready, embedding_options=options)
+        manager._pool = ThreadPoolExecutor(max_workers=2)
+        manager._progress = progress
+        manager._progress_task = asyncio.create_task(manager._read_progress())
+        # Gate every job before its build can start
+        submit = manager.submit
+
+        def gated_submit(kb_id, force=False):
+            running = manager.active_job(kb_id)
+            job = submit(kb_id, force)
+            if job is not running:
+                builds.expect(job)
+            return job
+
+        manager.submit = gated_submit
+        return manager
+
+    return make, builds, swapped
+
+
+async def until(condition):
+    for _ in range(400):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition never became true")
+
+
+def test_job_reports_progress_then_swaps_in(ingestion):
+    make, builds, swapped = ingestion
+
+    async def scenario():
+        manager = make()
+        job = manager.submit("faq")
+        assert job.status == "queued"
+        assert manager.submit("faq") is job  # the running build is reused
+
+        await until(lambda: job.status == "embedding")
+        assert job.to_dict()["progress"] == {"embedded": 256, "total": 1000}
+        assert manager.active_job("faq") is job
+
+        builds.release(job)
+        assert await job.future is job
+        manager.shutdown()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == "ready"
+    assert (job.done, job.total, job.rebuilt) == (1000, 1000, True)
+    assert swapped == [("faq", job.version)]
+
+
+def test_only_the_latest_job_swaps_in(ingestion):
+    make, builds, swapped = ingestion
+
+    async def scenario():
+        manager = make()
+        older = manager.submit("faq")
+        newer = manager.submit("faq", force=True)  # re-upload while the first build runs
+        assert newer is not older
+        assert manager.status("faq")["job_id"] == newer.job_id
+
+        builds.release(newer)
+        await newer.future
+        builds.release(older)
+        await older.future  # finishes late and must not replace the newer build
+        manager.shutdown()
+        return older, newer
+
+    older, newer = asyncio.run(scenario())
+    assert swapped == [("faq", newer.version)]
+    assert older.status == "ready"
+
+
+def test_failed_build_fails_the_job(ingestion):
+    make, builds, swapped = ingestion
+
+    async def scenario():
+        manager = make(fail=True)
+        job = manager.submit("faq")
+        builds.release(job)
+        with pytest.raises(RuntimeError):
+            await job.future
+        manager.shutdown()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == "failed"
+    assert job.error == "encoder ran out of memory"
+    assert job.finished_at is not None
+    assert swapped == []
+
+
+def test_unknown_kb_is_rejected(ingestion):
+    make, _, _ = ingestion
+
+    async def scenario():
+        manager = make()
+        with pytest.raises(FileNotFoundError):
+            manager.submit("missing")
+        manager.shutdown()
+
+    asyncio.run(scenario())
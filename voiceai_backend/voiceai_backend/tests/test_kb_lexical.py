@@ -0,0 +1,56 @@
+from kb_lexical import BM25Index, fuse_rankings, tokenize
+
+
+ENTRIES = [
+    "The premium plan costs 4,999 rupees per month",
+    "The basic plan costs 999 rupees per month",
+    "Refunds are processed within 7 working days",
+    "Support is available in Hindi and English",
+    "Our office is in Bengaluru",
+    "प्रीमियम प्लान की कीमत 4999 रुपये है",
+]
+
+
+def test_tokenize_folds_case_plurals_and_digit_groups():
+    assert tokenize("Plans cost 1,00,000 Rupees!") == ["plan", "cost", "100000", "rupee"]
+    assert tokenize("class bus") == ["class", "bus"]  # "ss" endings and short words are kept
+
+
+def test_tokenize_keeps_devanagari_words_whole():
+    assert tokenize("प्रीमियम प्लान") == ["प्रीमियम", "प्लान"]
+
+
+def test_search_ranks_exact_terms_first():
+    index = BM25Index(ENTRIES)
+    assert index.search("premium plan price", 3)[0] == 0
+    assert sorted(index.search("4999", 3)) == [0, 5]  # "4,999" and "4999" are the same token
+    assert index.search("refund", 3) == [2]
+
+
+def test_search_without_indexed_terms_is_empty():
+    index = BM25Index(ENTRIES)
+    assert index.search("weather tomorrow", 3) == []
+    assert BM25Index([]).search("plan", 3) == []
+
+
+def test_terms_in_most_entries_are_not_indexed():
+    index = BM25Index(["the plan", "the refund", "the office"], max_df=0.5)
+    assert index.search("the", 3) == []
+    assert index.search("the refund", 3) == [1]
+
+
+def test_search_truncates_to_top_k():
+    index = BM25Index(ENTRIES)
+    assert len(index.search("plan cost rupee month", 1)) == 1
+
+
+def test_fuse_rankings_orders_by_reciprocal_rank():
+    # 7 is second in both lists and beats entries that are first in only one
+    assert fuse_rankings([[1, 7, 3], [2, 7]], top_k=4) == [7, 1, 2, 3]
+    # An entry both retrievers found outranks one only the vector search put first
+    assert fuse_rankings([[1, 2, 3], [3]], top_k=2) == [3, 1]
+
+
+def test_fuse_rankings_ties_keep_first_seen_order():
+    assert fuse_rankings([[4], [9]], top_k=2) == [4, 9]
+    assert fuse_rankings([[4, 5, 6], []], top_k=2) == [4, 5]
@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from kb_store import KBIndexStore, search_kb
+
+NEVER = 1 << 62
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def unit_vectors(count, dimension, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dimension)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+LOAD_AND_MEASURE = """
+import sys
+sys.path.insert(0, {backend!r})
+import numpy as np
+from kb_store import KBIndexStore, search_kb
+
+def anon_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024
+
+store = KBIndexStore({root!r}, "synthetic", {dimension}, hnsw_min={hnsw_min}, ivfpq_min={never}, hnsw_m=8,
+                     ef_construction=16, lexical=False, codec={codec!r})
+query = np.random.default_rng(1).standard_normal((1, {dimension})).astype("float32")
+before = anon_mb()
+kb = store.load("kb", "ab" * 32)
+for _ in range(20):
+    search_kb(kb, query, 2)
+print(kb["index_kind"], anon_mb() - before)
+"""
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="reads RssAnon from /proc")
+@pytest.mark.parametrize("kind,codec", [("flat", "fp32"), ("flat", "fp16"), ("flat", "int8"), ("hnsw", "fp16")])
+def test_loaded_index_is_file_backed(tmp_path, kind, codec):
+    """A fresh process loading a build keeps the index in shared file pages, not private memory"""
+    count, dimension = 20000, 384
+    hnsw_min = 0 if kind == "hnsw" else NEVER
+    store = KBIndexStore(str(tmp_path), "synthetic", dimension, hnsw_min=hnsw_min, ivfpq_min=NEVER,
+                         hnsw_m=8, ef_construction=16, lexical=False, codec=codec)
+    built = store.save("kb", "ab" * 32, [f"entry {i}" for i in range(count)], unit_vectors(count, dimension))
+    index_mb = os.path.getsize(os.path.join(built["path"], "index.faiss")) / 1e6
+
+    script = LOAD_AND_MEASURE.format(backend=BACKEND_DIR, root=str(tmp_path), dimension=dimension,
+                                     hnsw_min=hnsw_min, never=NEVER, codec=codec)
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    loaded_kind, grown = result.stdout.split()
+    assert loaded_kind == kind
+    assert float(grown) < index_mb / 4, f"{float(grown):.1f} MB private memory for a {index_mb:.1f} MB index"
+
+
+def test_search_finds_stored_vectors(tmp_path):
+    embeddings = unit_vectors(500, 32)
+    store = KBIndexStore(str(tmp_path), "synthetic", 32, lexical=False, codec="int8")
+    kb = store.save("kb", "cd" * 32, [f"entry {i}" for i in range(500)], embeddings)
+    assert search_kb(kb, embeddings[7:8], 1) == [7]
+    assert kb["texts"][7] == "entry 7"
+
+
+def test_replaced_builds_are_kept_for_calls_still_on_them(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("kb_store.time.time", lambda: clock[0])
+    store = KBIndexStore(str(tmp_path), "synthetic", 8, lexical=False, keep_builds=2, build_grace_seconds=600)
+    texts, embeddings = ["a", "b"], unit_vectors(2, 8)
+
+    def build(content_hash):
+        clock[0] += 60
+        return store.save("kb", content_hash, texts, embeddings)["path"]
+
+    v1, v2, v3 = build("11" * 32), build("22" * 32), build("33" * 32)
+    # v1 is beyond keep_builds, but v2 replaced it only a minute ago
+    assert all(os.path.isdir(path) for path in (v1, v2, v3))
+    assert store.load("kb", "11" * 32) is not None
+
+    clock[0] += 600
+    v4 = build("44" * 32)
+    assert not os.path.exists(v1) and not os.path.exists(v2)
+    assert os.path.isdir(v3) and os.path.isdir(v4)
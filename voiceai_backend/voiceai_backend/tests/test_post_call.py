@@ -0,0 +1,187 @@
+import asyncio
+
+import pytest
+
+from fake_mongo import FakeDatabase
+from post_call import PostCallQueue, bill_call
+from transactions import TransactionDB
+from wallet import WalletDB
+
+
+async def make_billing(balance=100.0):
+    db = FakeDatabase()
+    wallet_db, transaction_db = WalletDB(db), TransactionDB(db)
+    await wallet_db.initialize_indexes()
+    await transaction_db.initialize_indexes()
+    await wallet_db.create_wallet("user-1", balance)
+    return db, wallet_db, transaction_db
+
+
+def charge(wallet_db, transaction_db, amount=10.0):
+    return bill_call(wallet_db, transaction_db, user_id="user-1", call_sid="CA1", amount=amount,
+                     description="Call charges (60.0s)")
+
+
+def debits(db):
+    return [t for t in db["transactions"].docs if t["transaction_type"] == "debit"]
+
+
+def test_bill_call_charges_once_across_retries():
+    async def run():
+        db, wallet_db, transaction_db = await make_billing()
+        assert await charge(wallet_db, transaction_db) == 90.0
+        assert await charge(wallet_db, transaction_db) is None
+        assert await wallet_db.get_balance("user-1") == 90.0
+        assert [t["status"] for t in debits(db)] == ["completed"]
+
+    asyncio.run(run())
+
+
+def test_bill_call_concurrent_workers_charge_once():
+    async def run():
+        db, wallet_db, transaction_db = await make_billing()
+        results = await asyncio.gather(*(charge(wallet_db, transaction_db) for _ in range(3)))
+        assert sorted(results, key=lambda r: r is None) == [90.0, None, None]
+        assert await wallet_db.get_balance("user-1") == 90.0
+        assert len(debits(db)) == 1
+
+    asyncio.run(run())
+
+
+def test_bill_call_insufficient_balance_leaves_no_debit():
+    async def run():
+        db, wallet_db, transaction_db = await make_billing(balance=5.0)
+        with pytest.raises(ValueError):
+            await charge(wallet_db, transaction_db)
+        assert debits(db) == []
+        assert await wallet_db.get_balance("user-1") == 5.0
+
+    asyncio.run(run())
+
+
+def test_job_replayed_after_partial_billing_step_is_not_charged_again():
+    """The first attempt dies right after the wallet was charged, before the debit is settled"""
+
+    async def run():
+        db, wallet_db, transaction_db = await make_billing()
+        attempts = []
+        settle = transaction_db.set_transaction_status
+
+        async def crash_once(transaction_id, status):
+            if len(attempts) == 1:
+                raise RuntimeError("worker died after charging")
+            await settle(transaction_id, status)
+
+        transaction_db.set_transaction_status = crash_once
+
+        async def processor(job):
+            attempts.append(job["attempts"])
+            steps = job.get("steps") or {}
+            if "billing" not in steps:
+                await charge(wallet_db, transaction_db)
+                await queue.save_step(job["_id"], "billing", {"call_cost": 10.0})
+
+        queue = PostCallQueue(db, processor, workers=1, poll_interval=0.01, base_backoff=0)
+        await queue.initialize_indexes()
+        await queue.enqueue("CA1", {"duration": 60.0})
+        queue.start()
+        for _ in range(200):
+            job = await db.post_call_jobs.find_one({"call_sid": "CA1"})
+            if job["status"] == "done":
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+        assert job["status"] == "done"
+        assert attempts == [1, 2]
+        assert job["steps"]["billing"] == {"call_cost": 10.0}
+        assert await wallet_db.get_balance("user-1") == 90.0
+        assert [t["status"] for t in debits(db)] == ["completed"]
+
+    asyncio.run(run())
+
+
+def test_job_replayed_after_crash_between_claim_and_charge_is_charged():
+    """The first attempt claims the debit and dies before the wallet is charged"""
+
+    async def run():
+        db, wallet_db, transaction_db = await make_billing()
+        deduct = wallet_db.deduct_funds_once
+        crashed = []
+
+        async def crash_once(**kwargs):
+            if not crashed:
+                crashed.append(True)
+                raise RuntimeError("worker died after claiming")
+            return await deduct(**kwargs)
+
+        wallet_db.deduct_funds_once = crash_once
+        with pytest.raises(RuntimeError):
+            await charge(wallet_db, transaction_db)
+        assert [t["status"] for t in debits(db)] == ["pending"]
+        assert await wallet_db.get_balance("user-1") == 100.0
+
+        assert await charge(wallet_db, transaction_db) == 90.0
+        assert await charge(wallet_db, transaction_db) is None
+        assert await wallet_db.get_balance("user-1") == 90.0
+        assert [t["status"] for t in debits(db)] == ["completed"]
+
+    asyncio.run(run())
+
+
+def test_deduct_funds_once_per_transaction():
+    async def run():
+        db, wallet_db, _ = await make_billing()
+        assert await wallet_db.deduct_funds_once("user-1", 10.0, "debit-1") == 90.0
+        assert await wallet_db.deduct_funds_once("user-1", 10.0, "debit-1") is None
+        assert await wallet_db.deduct_funds_once("user-1", 10.0, "debit-2") == 80.0
+        with pytest.raises(ValueError):
+            await wallet_db.deduct_funds_once("user-1", 500.0, "debit-3")
+        assert "applied_debits" not in await wallet_db.get_wallet_by_user_id("user-1")
+
+    asyncio.run(run())
+
+
+def test_legacy_duplicate_debits_do_not_block_startup(capsys):
+    async def run():
+        db = FakeDatabase()
+        for _ in range(2):
+            await db["transactions"].insert_one({"call_sid": "CA1", "transaction_type": "debit", "amount": 10.0})
+        wallet_db, transaction_db = WalletDB(db), TransactionDB(db)
+        await transaction_db.initialize_indexes()
+        await wallet_db.create_wallet("user-1", 100.0)
+        # A retried job finds the old debit instead of charging again
+        assert await charge(wallet_db, transaction_db) is None
+        assert await wallet_db.get_balance("user-1") == 100.0
+        return db
+
+    db = asyncio.run(run())
+    assert "refund and delete the extra debits" in capsys.readouterr().out
+    assert len(debits(db)) == 2
+
+
+def test_expired_lease_is_reclaimed():
+    async def run():
+        db = FakeDatabase()
+
+        async def processor(job):
+            pass
+
+        queue = PostCallQueue(db, processor, lease_seconds=-1)
+        await queue.enqueue("CA1", {})
+        first = await queue._claim()
+        second = await queue._claim()  # the first worker's lease already ran out
+        assert first["_id"] == second["_id"]
+        assert second["attempts"] == 2
+
+    asyncio.run(run())
+
+
+def test_enqueue_is_idempotent_per_call():
+    async def run():
+        queue = PostCallQueue(FakeDatabase(), processor=None)
+        await queue.initialize_indexes()
+        assert await queue.enqueue("CA1", {}) is True
+        assert await queue.enqueue("CA1", {}) is False
+
+    asyncio.run(run())
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from speculation import SpeculationStats, SpeculativeTurn, normalize_utterance, utterance_similarity
+
+
+def streaming(tokens, release=None, fail=None):
+    """generate() factory yielding tokens, waiting for `release` after the first and raising `fail` at the end"""
+
+    async def generate(timing):
+        timing["rag"] = 1.0
+        for n, token in enumerate(tokens):
+            if n == 1 and release is not None:
+                await release.wait()
+            yield token
+        if fail is not None:
+            raise fail
+
+    return generate
+
+
+async def finished(turn):
+    while not turn.done:
+        await asyncio.sleep(0)
+    return turn
+
+
+def test_normalize_and_similarity():
+    assert normalize_utterance("  What's the PRICE?! ") == "what s the price"
+    assert utterance_similarity("What is the price?", "what is the price") == 1.0
+    assert utterance_similarity("", "hello") == 0.0
+
+
+def test_matches_uses_the_ratio_threshold():
+    async def scenario():
+        turn = await finished(SpeculativeTurn("what is the price of the premium plan", 4, streaming(["a"])))
+        close = "what is the price of the premium plans"
+        assert utterance_similarity(turn.text, close) > 0.9
+        assert turn.matches(close, 4, 0.9)
+        assert not turn.matches("what is the price of the premium plan and can I cancel it", 4, 0.9)
+        assert turn.matches("what is the price of the premium plan and can I cancel it", 4, 0.5)
+
+    asyncio.run(scenario())
+
+
+def test_matches_rejects_a_changed_history():
+    async def scenario():
+        turn = await finished(SpeculativeTurn("tell me the refund policy", 6, streaming(["a"])))
+        assert turn.history_version == 6
+        assert turn.matches("tell me the refund policy", 6, 0.9)
+        # A message was appended (e.g. the bot spoke) since the speculation started
+        assert not turn.matches("tell me the refund policy", 7, 0.9)
+
+    asyncio.run(scenario())
+
+
+def test_failed_generation_never_matches_and_reraises():
+    async def scenario():
+        turn = await finished(SpeculativeTurn("hello there", 0, streaming(["Hi", "!"], fail=RuntimeError("LLM 500"))))
+        assert isinstance(turn.error, RuntimeError)
+        assert not turn.matches("hello there", 0, 0.9)
+        received = []
+        with pytest.raises(RuntimeError):
+            async for token in turn.tokens():
+                received.append(token)
+        assert received == ["Hi", "!"]
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_generation_never_matches():
+    async def scenario():
+        release = asyncio.Event()
+        turn = SpeculativeTurn("hello there", 0, streaming(["Hi", " there"], release=release))
+        while turn.token_count < 1:
+            await asyncio.sleep(0)
+        turn.cancel()
+        await finished(turn)
+        assert turn.error is None
+        assert turn.buffer == ["Hi"]
+        assert not turn.matches("hello there", 0, 0.9)
+
+    asyncio.run(scenario())
+
+
+def test_tokens_replay_the_buffer_then_follow_the_stream():
+    async def scenario():
+        release = asyncio.Event()
+        turn = SpeculativeTurn("hello", 0, streaming(["Hi", ",", " how", " can I help?"], release=release))
+        while turn.token_count < 1:
+            await asyncio.sleep(0)
+
+        async def consume():
+            return [token async for token in turn.tokens()]
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        assert not consumer.done()
+        release.set()
+        assert await consumer == ["Hi", ",", " how", " can I help?"]
+        assert turn.timing == {"rag": 1.0}
+
+    asyncio.run(scenario())
+
+
+def test_stats_count_hits_and_waste():
+    async def scenario():
+        hit = await finished(SpeculativeTurn("a", 0, streaming(["x", "y", "z"])))
+        miss = await finished(SpeculativeTurn("b", 0, streaming(["x"])))
+        stats = SpeculationStats()
+        stats.started = 2
+        stats.record_commit(hit)
+        stats.record_discard(miss)
+        return stats.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["committed"], stats["discarded"], stats["hit_rate"]) == (1, 1, 0.5)
+    assert (stats["committed_tokens"], stats["wasted_tokens"], stats["waste_ratio"]) == (3, 1, 0.25)
+    assert stats["avg_head_start_ms"] >= 0
+    assert SpeculationStats().stats()["hit_rate"] is None
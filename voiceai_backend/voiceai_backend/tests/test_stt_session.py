@@ -0,0 +1,141 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from stt_session import DeepgramSTTSession
+
+
+class FakeConnection:
+    """Deepgram listen socket yielding what the test pushes, `fail` raises inside the stream"""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+    def push(self, message):
+        self.incoming.put_nowait(message)
+
+    def fail(self, error):
+        self.incoming.put_nowait(error)
+
+    def end(self):
+        self.incoming.put_nowait(None)
+
+    async def send_media(self, chunk):
+        self.sent.append(chunk)
+
+    async def send_keep_alive(self, message):
+        self.sent.append(message.type)
+
+    async def send_close_stream(self, message):
+        self.sent.append(message.type)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.incoming.get()
+        if message is None:
+            raise StopAsyncIteration
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+
+def fake_client(connection, connect_error=None):
+    """AsyncDeepgramClient stand-in, records the connect() options and whether the socket was exited"""
+    calls = SimpleNamespace(options=None, exited=False)
+
+    @asynccontextmanager
+    async def connect(**options):
+        calls.options = options
+        if connect_error is not None:
+            raise connect_error
+        try:
+            yield connection
+        finally:
+            calls.exited = True
+
+    client = SimpleNamespace(listen=SimpleNamespace(v1=SimpleNamespace(connect=connect)))
+    return client, calls
+
+
+async def drain(session):
+    results = []
+    while True:
+        result = await asyncio.wait_for(session.results.get(), timeout=1)
+        if result is None:
+            return results
+        results.append(result)
+
+
+def test_results_reach_the_queue_in_order():
+    async def scenario():
+        connection = FakeConnection()
+        client, calls = fake_client(connection)
+        session = await DeepgramSTTSession(client, "CA1", language="hi", model="nova-2").start()
+        assert calls.options == {"language": "hi", "model": "nova-2"}
+
+        connection.push("first")
+        connection.push("second")
+        connection.end()
+        assert await drain(session) == ["first", "second"]
+
+        await session.send_audio(b"\xff" * 160)
+        await session.keep_alive()
+        assert connection.sent == [b"\xff" * 160, "KeepAlive"]
+        await session.close()
+        assert calls.exited
+
+    asyncio.run(scenario())
+
+
+def test_close_stops_the_reader_and_ends_the_queue():
+    async def scenario():
+        connection = FakeConnection()
+        client, calls = fake_client(connection)
+        session = await DeepgramSTTSession(client, "CA1").start()
+        reader = session._reader
+
+        await session.close()
+        assert reader.done()
+        assert connection.sent == ["CloseStream"]
+        assert calls.exited
+        assert await drain(session) == []
+
+        # Audio after hangup is dropped and closing twice is harmless
+        await session.send_audio(b"\xff")
+        await session.keep_alive()
+        await session.close()
+        assert connection.sent == ["CloseStream"]
+
+    asyncio.run(scenario())
+
+
+def test_stream_error_ends_the_queue_and_is_logged(capsys):
+    async def scenario():
+        connection = FakeConnection()
+        client, _ = fake_client(connection)
+        session = await DeepgramSTTSession(client, "CA7").start()
+        connection.push("partial")
+        connection.fail(ConnectionResetError("socket reset"))
+        results = await drain(session)
+        await session.close()
+        return results
+
+    assert asyncio.run(scenario()) == ["partial"]
+    assert "Deepgram error (CA7): socket reset" in capsys.readouterr().out
+
+
+def test_connect_error_reaches_the_caller():
+    async def scenario():
+        client, _ = fake_client(FakeConnection(), connect_error=PermissionError("bad API key"))
+        session = DeepgramSTTSession(client, "CA1")
+        with pytest.raises(PermissionError):
+            await session.start()
+        assert session._reader is None
+        await session.close()
+
+    asyncio.run(scenario())
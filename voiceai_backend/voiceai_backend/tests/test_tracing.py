@@ -0,0 +1,71 @@
+import tracing
+from tracing import STAGES, CallTrace, TurnTrace, percentile, summarize_latency
+
+
+def test_turn_row_is_milliseconds_in_stage_order():
+    turn = TurnTrace(0)
+    turn.record("rag", 0.0424)
+    turn.record("llm_ttft", 0.31)
+    turn.record_between("turn_total", 100.0, 101.5)
+    turn.record_between("first_media", None, 101.0)   # start never stamped
+    turn.record("tts_ttfa", -0.2)                     # clock went backwards
+    turn.record("made_up", 1.0)
+    assert turn.to_row() == [None, 42, 310, None, None, None, None, 1500]
+    assert len(turn.to_row()) == len(STAGES)
+
+
+def test_call_document_format():
+    trace = CallTrace("CA1")
+    first = trace.new_turn()
+    first.record("stt_final", 0.2)
+    first.prompt_tokens = 850
+    second = trace.new_turn()
+    second.interrupted = True
+
+    document = trace.to_document()
+    assert document["stages"] == list(STAGES)
+    assert document["turns"] == [[200] + [None] * 7, [None] * 8]
+    assert document["interrupted"] == [1]
+    assert document["prompt_tokens"] == [850, None]
+
+
+def test_turns_past_the_cap_are_not_stored(monkeypatch):
+    monkeypatch.setattr(tracing, "MAX_TURNS", 2)
+    trace = CallTrace("CA1")
+    turns = [trace.new_turn() for _ in range(3)]
+    turns[2].record("rag", 0.1)  # still recordable by the caller, just not kept
+    assert [turn.index for turn in trace.turns] == [0, 1]
+    assert len(trace.to_document()["turns"]) == 2
+
+
+def test_percentile_is_nearest_rank():
+    ordered = list(range(1, 101))
+    assert (percentile(ordered, 50), percentile(ordered, 95), percentile(ordered, 99)) == (50, 95, 99)
+    assert percentile([10, 20, 30, 40], 50) == 20
+    assert percentile([10, 20, 30, 40], 0) == 10
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+def test_summarize_latency_over_call_traces():
+    calls = []
+    for call in range(4):
+        trace = CallTrace(f"CA{call}")
+        for turn_number in range(25):
+            turn = trace.new_turn()
+            turn.record("rag", (call * 25 + turn_number + 1) / 1000)  # 1..100 ms over all turns
+            turn.prompt_tokens = 100 * (turn_number + 1) if call == 0 else None
+        calls.append(trace.to_document())
+    calls.append(None)                         # call that ended before its trace was saved
+    calls.append({"stages": list(STAGES), "turns": []})
+
+    # Older documents stored only some stages, rows are read by their own stage list
+    calls.append({"stages": ["llm_ttft", "rag"], "turns": [[400, None]]})
+
+    summary = summarize_latency(calls)
+    assert (summary["calls"], summary["turns"]) == (5, 101)
+    assert summary["stages"]["rag"] == {"count": 100, "p50_ms": 50, "p95_ms": 95, "p99_ms": 99}
+    assert summary["stages"]["llm_ttft"] == {"count": 1, "p50_ms": 400, "p95_ms": 400, "p99_ms": 400}
+    assert summary["stages"]["tts_total"]["count"] == 0
+    assert summary["stages"]["tts_total"]["p50_ms"] is None
+    assert summary["prompt_tokens"] == {"count": 25, "avg": 1300.0, "p50": 1300, "p95": 2400, "p99": 2500}
@@ -0,0 +1,181 @@
+import asyncio
+
+from transcripts import ConversationMemory, TranscriptWriter, estimate_tokens
+
+
+class RecordingCollection:
+    """call_history stand-in that keeps the bulk_write batches, failing the first `failures` of them"""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("primary stepped down")
+        self.batches.append([(op._filter["call_sid"], op._doc["$push"]["transcript"]["$each"]) for op in operations])
+
+
+def say(role, content):
+    return {"role": role, "content": content}
+
+
+def test_memory_keeps_newest_messages_in_ram():
+    memory = ConversationMemory(None, max_messages=4, token_budget=10_000)
+    for turn in range(6):
+        memory.append(say("user", f"question {turn}"))
+    assert len(memory) == 4
+    assert [message["content"] for message in memory] == [f"question {turn}" for turn in range(2, 6)]
+    assert memory[-1]["content"] == "question 5"
+    assert memory.version == 6
+    assert memory.dropped == 2
+
+
+def test_every_message_goes_to_the_writer_with_its_call_index():
+    writer = TranscriptWriter(RecordingCollection())
+    memory = ConversationMemory("CA1", writer, max_messages=2)
+    for turn in range(3):
+        memory.append(say("user", f"q{turn}"))
+    pending = writer._pending["CA1"]
+    assert [message["index"] for message in pending] == [0, 1, 2]
+    assert [message["content"] for message in pending] == ["q0", "q1", "q2"]
+
+
+def test_writer_flushes_one_batch_for_all_calls():
+    async def scenario():
+        collection = RecordingCollection()
+        writer = TranscriptWriter(collection)
+        writer.append("CA1", say("user", "a"))
+        writer.append("CA2", say("user", "b"))
+        writer.append("CA1", say("assistant", "c"))
+        await writer.flush()
+        await writer.flush()  # nothing left, no empty write
+        return collection, writer
+
+    collection, writer = asyncio.run(scenario())
+    assert len(collection.batches) == 1
+    assert dict(collection.batches[0]) == {
+        "CA1": [say("user", "a"), say("assistant", "c")],
+        "CA2": [say("user", "b")]
+    }
+    assert writer.stats()["messages_written"] == 3
+
+
+def test_failed_flush_is_retried_in_order():
+    async def scenario():
+        collection = RecordingCollection(failures=1)
+        writer = TranscriptWriter(collection)
+        writer.append("CA1", say("user", "first"))
+        await writer.flush()
+        writer.append("CA1", say("user", "second"))
+        await writer.flush()
+        return collection, writer
+
+    collection, writer = asyncio.run(scenario())
+    assert collection.batches == [[("CA1", [say("user", "first"), say("user", "second")])]]
+    assert writer.stats() == {"pending_messages": 0, "messages_written": 2, "batches": 1, "failures": 1}
+
+
+def test_stop_writes_what_is_still_queued():
+    async def scenario():
+        collection = RecordingCollection()
+        writer = TranscriptWriter(collection, flush_interval=60)
+        writer.start()
+        writer.append("CA1", say("user", "bye"))
+        await writer.stop()
+        return collection
+
+    assert asyncio.run(scenario()).batches == [[("CA1", [say("user", "bye")])]]
+
+
+def message(turn):
+    """36 ASCII characters, 13 estimated tokens"""
+    return say("user" if turn % 2 == 0 else "assistant", f"{turn:02d}" + "x" * 34)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens(message(0)["content"]) == 13
+    assert estimate_tokens(None) == 4
+
+
+def test_prompt_keeps_newest_messages_within_budget():
+    memory = ConversationMemory(None, token_budget=30)
+    for turn in range(5):
+        memory.append(message(turn))
+    assert memory.prompt_messages() == [message(3), message(4)]
+
+    # A message over budget on its own is still sent
+    memory.append(say("user", "y" * 400))
+    assert memory.prompt_messages() == [say("user", "y" * 400)]
+
+
+def test_older_turns_are_folded_into_summary_off_the_turn_path():
+    folded = []
+    release = asyncio.Event()
+
+    async def summarizer(previous, messages):
+        await release.wait()
+        folded.append((previous, messages))
+        return f"summary {len(folded)} "
+
+    async def scenario():
+        memory = ConversationMemory(None, token_budget=30, summarizer=summarizer)
+        for turn in range(5):
+            memory.append(message(turn))
+        # Appending never waits for the summarizer, the prompt just leaves old turns out
+        assert memory.summary is None
+        assert memory.prompt_messages() == [message(3), message(4)]
+
+        release.set()
+        while memory._fold_task is not None:
+            await asyncio.sleep(0)
+        return memory
+
+    memory = asyncio.run(scenario())
+    assert folded == [(None, [message(0), message(1)])]
+    assert memory.summary == "summary 1"
+    assert memory.summarized_upto == 2
+    assert len(memory) == 3  # folded messages leave RAM
+    assert memory.prompt_messages() == [
+        {"role": "system", "content": "Summary of the earlier conversation: summary 1"},
+        message(3),
+        message(4)
+    ]
+
+
+def test_failed_summary_keeps_messages():
+    async def summarizer(previous, messages):
+        raise TimeoutError("summary model timed out")
+
+    async def scenario():
+        memory = ConversationMemory(None, token_budget=30, summarizer=summarizer)
+        for turn in range(4):
+            memory.append(message(turn))
+        await asyncio.sleep(0)
+        return memory
+
+    memory = asyncio.run(scenario())
+    assert memory.summary is None
+    assert len(memory) == 4
+    assert memory.prompt_messages() == [message(2), message(3)]
+
+
+def test_close_cancels_a_summary_in_flight():
+    async def summarizer(previous, messages):
+        await asyncio.sleep(60)
+        return "never"
+
+    async def scenario():
+        memory = ConversationMemory(None, token_budget=30, summarizer=summarizer)
+        for turn in range(4):
+            memory.append(message(turn))
+        task = memory._fold_task
+        await asyncio.sleep(0)
+        memory.close()
+        await asyncio.sleep(0)
+        return memory, task
+
+    memory, task = asyncio.run(scenario())
+    assert task.done()
+    assert memory.summary is None
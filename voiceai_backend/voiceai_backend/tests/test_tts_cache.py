@@ -0,0 +1,77 @@
+import asyncio
+import base64
+
+from tts_cache import FRAME_BYTES, TTSAudioCache, frame_audio, make_tts_cache_key
+
+
+def audio(size, fill=b"\xff"):
+    return fill * size
+
+
+def test_key_ignores_case_and_spacing():
+    assert make_tts_cache_key("cartesia", "v1", "en", "Hello  there ") == make_tts_cache_key("cartesia", "v1", "en", "hello there")
+    assert make_tts_cache_key("cartesia", "v1", "en", "hello") != make_tts_cache_key("cartesia", "v2", "en", "hello")
+
+
+def test_frames_are_200ms_payloads():
+    frames = frame_audio(audio(FRAME_BYTES * 2 + 10))
+    assert [len(base64.b64decode(frame)) for frame in frames] == [FRAME_BYTES, FRAME_BYTES, 10]
+
+
+def test_lru_keeps_within_byte_budget():
+    async def scenario():
+        cache = TTSAudioCache(max_bytes=3000)
+        await cache.put("a", audio(1000))
+        await cache.put("b", audio(1000))
+        await cache.put("c", audio(1000))
+        assert await cache.get("a") is not None  # "b" is now least recently used
+        await cache.put("d", audio(1000))
+        assert not cache.contains("b")
+        assert all(cache.contains(key) for key in "acd")
+        assert cache.bytes == 3000
+        assert cache.evictions == 1
+
+        # Re-putting a key replaces its bytes, audio over the whole budget is never cached
+        await cache.put("a", audio(500))
+        assert cache.bytes == 2500
+        await cache.put("huge", audio(4000))
+        assert not cache.contains("huge")
+        assert await cache.get("b") is None
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["memory_hits"], stats["misses"], stats["bytes_saved"]) == (1, 1, 1000)
+
+
+def test_disk_tier_serves_memory_misses(tmp_path):
+    async def scenario():
+        writer = TTSAudioCache(max_bytes=1000, disk_dir=str(tmp_path))
+        await writer.put("a", audio(800, b"\x01"))
+        await writer.put("b", audio(800, b"\x02"))  # evicts "a" from memory, it stays on disk
+        assert "a" not in writer._entries
+        assert writer.contains("a")
+        assert await writer.get("a") == frame_audio(audio(800, b"\x01"))
+        assert writer.disk_hits == 1
+        assert "a" in writer._entries  # promoted back to memory
+
+        # A restarted worker finds what was written before
+        restarted = TTSAudioCache(disk_dir=str(tmp_path))
+        assert restarted.contains("b") and not restarted.contains("c")
+        assert await restarted.get("b") == frame_audio(audio(800, b"\x02"))
+        assert restarted.stats()["disk_entries"] == 2
+
+        # A file deleted underneath the cache is a miss, not an error on every lookup
+        (tmp_path / "a.ulaw").unlink()
+        assert await restarted.get("a") is None
+        assert not restarted.contains("a")
+
+    asyncio.run(scenario())
+
+
+def test_clause_is_warmed_once_after_warm_after_sightings():
+    cache = TTSAudioCache(warm_after=3)
+    assert [cache.note_miss("k") for _ in range(4)] == [False, False, True, False]
+    assert cache.note_miss("other") is False
+
+    asyncio.run(cache.put("k", audio(10)))
+    assert cache.note_miss("k") is False  # caching resets the count
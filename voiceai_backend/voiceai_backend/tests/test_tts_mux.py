@@ -0,0 +1,188 @@
+import asyncio
+import json
+
+import pytest
+
+from tts_mux import CartesiaMultiplexer
+
+
+class FakeSocket:
+    """Shared Cartesia socket fed by the test, iteration ends when it is closed"""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+    async def send(self, raw):
+        self.sent.append(json.loads(raw))
+
+    def deliver(self, **message):
+        self.incoming.put_nowait(json.dumps(message))
+
+    def close(self):
+        self.incoming.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raw = await self.incoming.get()
+        if raw is None:
+            raise StopAsyncIteration
+        return raw
+
+
+class FakePool:
+    """Connection pool handing out FakeSockets, acquire waits for `gate` when one is set"""
+
+    def __init__(self, size=4):
+        self.size = size
+        self.leased = []
+        self.released = []
+        self.acquires = 0
+        self.gate = None
+
+    async def acquire(self):
+        self.acquires += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if len(self.leased) - len(self.released) >= self.size:
+            raise asyncio.TimeoutError("pool exhausted")
+        ws = FakeSocket()
+        self.leased.append(ws)
+        return ws
+
+    async def release(self, ws):
+        self.released.append(ws)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_messages_are_routed_by_context_id():
+    async def scenario():
+        mux = CartesiaMultiplexer(FakePool(), sockets=1)
+        await mux.start()
+        first = await mux.open_context("CA1")
+        second = await mux.open_context("CA2")
+        assert first.socket is second.socket
+
+        await first.send({"transcript": "hello"})
+        ws = mux._sockets[0].ws
+        assert ws.sent == [{"transcript": "hello", "context_id": first.context_id}]
+
+        ws.deliver(context_id=second.context_id, type="chunk", data="b")
+        ws.deliver(context_id=first.context_id, type="chunk", data="a")
+        ws.deliver(context_id="CA9_99", type="chunk", data="stray")
+        ws.deliver(context_id=first.context_id, type="done")
+        assert (await first.receive(1))["data"] == "a"
+        assert (await first.receive(1))["type"] == "done"
+        assert first.finished
+        assert (await second.receive(1))["data"] == "b"
+        assert mux.dropped_messages == 1
+
+        # A cancelled context's late chunks are dropped
+        await second.cancel()
+        assert ws.sent[-1] == {"context_id": second.context_id, "cancel": True}
+        ws.deliver(context_id=second.context_id, type="chunk", data="late")
+        await settle()
+        assert second.queue.empty()
+        assert mux.dropped_messages == 2
+        await mux.stop()
+
+    asyncio.run(scenario())
+
+
+def test_closed_socket_fails_its_contexts():
+    async def scenario():
+        pool = FakePool()
+        mux = CartesiaMultiplexer(pool, sockets=1)
+        await mux.start()
+        context = await mux.open_context("CA1")
+        ws = context.socket.ws
+
+        ws.close()
+        message = await context.receive(1)
+        assert message == {"type": "error", "error": "Cartesia socket closed", "context_id": context.context_id}
+        await settle()
+        assert mux.socket_failures == 1
+        assert mux._sockets == []
+        assert pool.released == [ws]
+
+        # The next context gets a fresh socket from the pool
+        replacement = await mux.open_context("CA1")
+        assert replacement.socket.ws is not ws
+        await mux.stop()
+
+    asyncio.run(scenario())
+
+
+def test_surplus_socket_goes_back_to_the_pool_once_drained():
+    async def scenario():
+        pool = FakePool()
+        mux = CartesiaMultiplexer(pool, sockets=1, max_contexts_per_socket=1)
+        await mux.start()
+        base = await mux.open_context("CA1")
+        extra = await mux.open_context("CA2")
+        assert extra.socket is not base.socket
+        assert mux.stats()["contexts_per_socket"] == [1, 1]
+
+        extra.close()
+        await settle()
+        assert pool.released == [extra.socket.ws]
+        assert [socket.ws for socket in mux._sockets] == [base.socket.ws]
+
+        # The base socket stays leased when it drains
+        base.close()
+        await settle()
+        assert len(mux._sockets) == 1
+        assert len(pool.released) == 1
+        await mux.stop()
+
+    asyncio.run(scenario())
+
+
+def test_pool_exhausted_shares_a_busy_socket():
+    async def scenario():
+        mux = CartesiaMultiplexer(FakePool(size=1), sockets=1, max_contexts_per_socket=1)
+        await mux.start()
+        first = await mux.open_context("CA1")
+        second = await mux.open_context("CA2")
+        assert second.socket is first.socket
+        await mux.stop()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await CartesiaMultiplexer(FakePool(size=0)).open_context("CA1")
+
+    asyncio.run(scenario())
+
+
+def test_socket_lease_does_not_block_other_calls():
+    async def scenario():
+        pool = FakePool()
+        mux = CartesiaMultiplexer(pool, sockets=2, max_contexts_per_socket=1)
+        await mux.start()
+        await mux.open_context("CA1")
+
+        pool.gate = asyncio.Event()
+        waiting = [asyncio.create_task(mux.open_context(f"CA{n}")) for n in (2, 3)]
+        await settle()
+        # The free slot on the second base socket went to CA2 while CA3 leases a socket
+        assert waiting[0].done()
+        assert not waiting[1].done()
+        assert pool.acquires == 3
+
+        # A call arriving mid-lease waits for that socket instead of leasing its own
+        late = asyncio.create_task(mux.open_context("CA4"))
+        await settle()
+        assert pool.acquires == 3
+
+        pool.gate.set()
+        await asyncio.gather(*waiting, late)
+        assert pool.acquires == 4
+        assert mux.stats()["contexts_per_socket"] == [1, 1, 1, 1]
+        await mux.stop()
+
+    asyncio.run(scenario())
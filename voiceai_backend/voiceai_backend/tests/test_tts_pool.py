@@ -0,0 +1,85 @@
+import asyncio
+
+from websockets.protocol import State
+
+from tts_pool import CartesiaConnectionPool
+
+
+class FakeSocket:
+    """Websocket whose pong arrives only when the test sets it"""
+
+    def __init__(self):
+        self.state = State.OPEN
+        self.pong = None
+
+    async def ping(self):
+        self.pong = asyncio.get_running_loop().create_future()
+        return self.pong
+
+    async def close(self):
+        self.state = State.CLOSED
+
+
+def make_pool(**kwargs):
+    pool = CartesiaConnectionPool("wss://example.invalid", ping_interval=0, **kwargs)
+
+    async def connect():
+        return FakeSocket()
+
+    pool._connect = connect
+    return pool
+
+
+def test_connection_being_pinged_is_not_leased():
+    async def scenario():
+        pool = make_pool(min_size=1, max_size=2)
+        await pool.start()
+        pinged = pool._idle[0][0]
+        while pinged.pong is None:
+            await asyncio.sleep(0)
+
+        assert not pool._idle
+        assert pool.size == 1
+        leased = await pool.acquire()
+        assert leased is not pinged
+
+        pinged.pong.set_result(None)
+        while pinged not in [ws for ws, _ in pool._idle]:
+            await asyncio.sleep(0)
+        assert pool.stats()["checking"] == 0
+        await pool.stop()
+
+    asyncio.run(scenario())
+
+
+def test_connection_failing_ping_is_closed_not_returned():
+    async def scenario():
+        pool = make_pool(min_size=1, max_size=1)
+        await pool.start()
+        pinged = pool._idle[0][0]
+        while pinged.pong is None:
+            await asyncio.sleep(0)
+
+        pinged.pong.set_exception(ConnectionError("gone"))
+        while pinged.state is State.OPEN:
+            await asyncio.sleep(0)
+        assert pool.health_check_failures == 1
+        assert all(ws is not pinged for ws, _ in pool._idle)
+        await pool.stop()
+
+    asyncio.run(scenario())
+
+
+def test_checked_connection_keeps_its_idle_age():
+    async def scenario():
+        pool = make_pool(min_size=0, max_size=3)
+        older, newer = FakeSocket(), FakeSocket()
+        pool._idle.extend([(older, 1.0), (newer, 2.0)])
+        pool._checking.add(older)
+        pool._idle.remove((older, 1.0))
+
+        await pool._return_checked((older, 1.0))
+        assert [ws for ws, _ in pool._idle] == [older, newer]
+        assert (await pool.acquire()) is newer
+
+    asyncio.run(scenario())
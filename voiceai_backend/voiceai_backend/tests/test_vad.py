@@ -0,0 +1,85 @@
+import numpy as np
+
+from vad import FRAME_BYTES, ULAW_TO_LINEAR, VoiceActivityGate, frame_energy_db
+
+ORDER = np.argsort(ULAW_TO_LINEAR)
+SORTED = ULAW_TO_LINEAR[ORDER]
+
+
+def ulaw(samples):
+    """Nearest μ-law code for each linear sample"""
+    positions = np.clip(np.searchsorted(SORTED, samples), 1, len(SORTED) - 1)
+    lower = SORTED[positions - 1]
+    nearer = np.where(samples - lower < SORTED[positions] - samples, positions - 1, positions)
+    return ORDER[nearer].astype(np.uint8).tobytes()
+
+
+def noise(seconds, db, seed=0):
+    rms = 32768 * 10 ** (db / 20)
+    return ulaw(np.random.default_rng(seed).normal(0, rms, int(seconds * 8000)))
+
+
+def feed(gate, audio, start=0.0):
+    """Feed audio in 20ms chunks like Twilio, returns the bytes forwarded per chunk"""
+    forwarded = []
+    for i in range(0, len(audio), FRAME_BYTES):
+        chunk = audio[i:i + FRAME_BYTES]
+        forwarded.append(sum(len(f) for f in gate.process(chunk, start + (i + len(chunk)) / 8000)))
+    return forwarded
+
+
+def test_frame_energy_matches_level():
+    assert abs(frame_energy_db(noise(0.1, -40))[0] + 40) < 1.5
+    assert frame_energy_db(b"\xff" * FRAME_BYTES)[0] < -80
+    assert len(frame_energy_db(b"\xff" * (FRAME_BYTES + 1))) == 2
+
+
+def test_silence_is_suppressed():
+    gate = VoiceActivityGate()
+    assert sum(feed(gate, b"\xff" * 8000 * 5)) == 0
+    assert gate.stats()["suppressed_ratio"] == 1.0
+
+
+def test_gate_closes_on_constant_line_noise():
+    gate = VoiceActivityGate()
+    forwarded = feed(gate, noise(10, -40))
+    assert gate.noise_db > -45
+    assert not gate.is_open
+    last_two_seconds = forwarded[-100:]
+    assert sum(last_two_seconds) == 0
+    assert gate.stats()["suppressed_ratio"] > 0.8
+
+
+def test_speech_over_noise_opens_gate_with_preroll():
+    gate = VoiceActivityGate(preroll_ms=300)
+    feed(gate, noise(5, -40))
+    assert not gate.is_open
+    forwarded = feed(gate, noise(1, -15, seed=1), start=5.0)
+    assert gate.is_open
+    assert max(forwarded) > FRAME_BYTES  # pre-roll goes out with the onset frame
+
+
+def test_floor_drops_when_line_goes_quiet():
+    gate = VoiceActivityGate()
+    feed(gate, noise(5, -40))
+    feed(gate, noise(4, -60, seed=2), start=5.0)
+    assert gate.noise_db < -55
+    forwarded = feed(gate, noise(1, -35, seed=3), start=9.0)
+    assert gate.is_open and sum(forwarded) > 0
+
+
+def test_disabled_gate_forwards_everything():
+    gate = VoiceActivityGate(enabled=False)
+    audio = b"\xff" * 8000
+    assert sum(feed(gate, audio)) == len(audio)
+
+
+def test_to_wall_time_skips_suppressed_audio():
+    gate = VoiceActivityGate(preroll_ms=20, hangover_ms=20, onset_frames=1)
+    feed(gate, noise(2, -15), start=0.0)
+    feed(gate, b"\xff" * 8000 * 3, start=2.0)
+    feed(gate, noise(1, -15, seed=1), start=5.0)
+    sent = gate.stats()["sent_seconds"]
+    assert sent < 3.5
+    # One second into the second burst of speech happened at about 6s of wall time
+    assert abs(gate.to_wall_time(sent - 0.02) - 6.0) < 0.1
@@ -0,0 +1,123 @@
+# Per-turn latency tracing for voice calls
+import math
+import time
+from typing import Dict, Iterable, List, Optional
+
+# Span names, in the order they are stored on the call record
+STAGES = (
+    "stt_final",    # caller stopped speaking -> Deepgram speech_final transcript
+    "rag",          # knowledge base lookup
+    "llm_ttft",     # LLM request -> first token
+    "llm_total",    # LLM request -> last token
+    "tts_ttfa",     # first clause sent to TTS -> first audio chunk back
+    "tts_total",    # first clause sent to TTS -> last audio chunk
+    "first_media",  # final transcript -> first media frame sent to Twilio
+    "turn_total",   # final transcript -> turn finished
+)
+
+MAX_TURNS = 200  # per call, keeps the call_history document bounded
+
+
+class TurnTrace:
+    """Spans of one conversational turn, in seconds"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.started = time.time()
+        self.spans: Dict[str, float] = {}
+        self.interrupted = False
+        self.prompt_tokens: Optional[int] = None  # LLM prompt size, None when no LLM call was made
+
+    def record(self, stage: str, seconds: Optional[float]):
+        if stage in STAGES and seconds is not None and seconds >= 0:
+            self.spans[stage] = seconds
+
+    def record_between(self, stage: str, start: Optional[float], end: Optional[float]):
+        """Record a span from two time.time() stamps, ignored if either is missing"""
+        if start is not None and end is not None:
+            self.record(stage, end - start)
+
+    def to_row(self) -> List[Optional[int]]:
+        """Milliseconds per stage in STAGES order, None where not measured"""
+        return [
+            int(round(self.spans[stage] * 1000)) if stage in self.spans else None
+            for stage in STAGES
+        ]
+
+
+class CallTrace:
+    """Latency spans for every turn of a call
+
+    Stored on the call_history document as
+    {"stages": [...], "turns": [[ms, ...], ...], "interrupted": [turn index, ...],
+     "prompt_tokens": [tokens or None per turn]}
+    so a long call costs a few bytes per turn instead of one sub-document per span.
+    """
+
+    def __init__(self, call_id: str):
+        self.call_id = call_id
+        self.turns: List[TurnTrace] = []
+
+    def new_turn(self) -> TurnTrace:
+        turn = TurnTrace(len(self.turns))
+        if len(self.turns) < MAX_TURNS:
+            self.turns.append(turn)
+        return turn
+
+    def to_document(self) -> Dict:
+        return {
+            "stages": list(STAGES),
+            "turns": [turn.to_row() for turn in self.turns],
+            "interrupted": [turn.index for turn in self.turns if turn.interrupted],
+            "prompt_tokens": [turn.prompt_tokens for turn in self.turns]
+        }
+
+
+def percentile(ordered: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[min(len(ordered), max(rank, 1)) - 1]
+
+
+def summarize_latency(traces: Iterable[Dict]) -> Dict:
+    """p50/p95/p99 per stage and of prompt tokens over stored call traces (the "latency" field of call records)"""
+    values: Dict[str, List[int]] = {stage: [] for stage in STAGES}
+    prompt_tokens: List[int] = []
+    calls = 0
+    turns = 0
+    for trace in traces:
+        if not trace or not trace.get("turns"):
+            continue
+        calls += 1
+        stages = trace.get("stages") or list(STAGES)
+        for row in trace["turns"]:
+            turns += 1
+            for stage, ms in zip(stages, row):
+                if ms is not None and stage in values:
+                    values[stage].append(ms)
+        prompt_tokens.extend(tokens for tokens in trace.get("prompt_tokens") or [] if tokens is not None)
+
+    summary = {}
+    for stage, samples in values.items():
+        samples.sort()
+        summary[stage] = {
+            "count": len(samples),
+            "p50_ms": percentile(samples, 50),
+            "p95_ms": percentile(samples, 95),
+            "p99_ms": percentile(samples, 99)
+        }
+    prompt_tokens.sort()
+    return {
+        "calls": calls,
+        "turns": turns,
+        "stages": summary,
+        "prompt_tokens": {
+            "count": len(prompt_tokens),
+            "avg": round(sum(prompt_tokens) / len(prompt_tokens), 1) if prompt_tokens else None,
+            "p50": percentile(prompt_tokens, 50),
+            "p95": percentile(prompt_tokens, 95),
+            "p99": percentile(prompt_tokens, 99)
+        }
+    }
@@ -2,6 +2,7 @@
 from typing import Optional, List
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 
 class TransactionDB:
@@ -18,6 +19,20 @@ class TransactionDB:
         await self.collection.create_index("transaction_type")
         await self.collection.create_index("payment_id")
         await self.collection.create_index("call_sid")
+        # At most one debit per call, claim_call_debit relies on it
+        try:
+            await self.collection.create_index(
+                [("call_sid", 1), ("transaction_type", 1)],
+                unique=True,
+                partialFilterExpression={"call_sid": {"$type": "string"}, "transaction_type": "debit"}
+            )
+        except DuplicateKeyError as e:
+            # Calls charged twice before billing was made idempotent block the index
+            print(f"⚠️ One-debit-per-call index not created, some calls already have several debits: {e}\n"
+                  "   Find them with db.transactions.aggregate([{$match: {transaction_type: 'debit', "
+                  "call_sid: {$type: 'string'}}}, {$group: {_id: '$call_sid', n: {$sum: 1}}}, "
+                  "{$match: {n: {$gt: 1}}}]), refund and delete the extra debits, then restart. "
+                  "Until then concurrent billing attempts for one call are not guarded.")
     
     async def create_transaction(
         self,
@@ -98,6 +113,54 @@ class TransactionDB:
             transaction["_id"] = str(transaction["_id"])
         return transaction
     
+    async def claim_call_debit(
+        self,
+        user_id: str,
+        amount: float,
+        description: str,
+        call_sid: str,
+        campaign_id: Optional[str] = None,
+        metadata: Optional[dict] = None
+    ):
+        """The debit of a call: inserted as "pending", or the one an earlier attempt claimed
+
+        The unique (call_sid, debit) index makes concurrent workers end up with
+        the same transaction. Its status tells whether the wallet charge was
+        already settled ("completed") or may still have to be made ("pending").
+        """
+        transaction = {
+            "user_id": user_id,
+            "transaction_type": "debit",
+            "amount": amount,
+            "description": description,
+            "payment_id": None,
+            "payment_method": None,
+            "call_sid": call_sid,
+            "campaign_id": campaign_id,
+            "metadata": metadata or {},
+            "status": "pending",
+            "created_at": datetime.utcnow()
+        }
+        query = {"call_sid": call_sid, "transaction_type": "debit"}
+        try:
+            result = await self.collection.update_one(query, {"$setOnInsert": transaction}, upsert=True)
+        except DuplicateKeyError:
+            result = None  # a concurrent attempt inserted it first
+        if result is not None and result.upserted_id is not None:
+            transaction["_id"] = str(result.upserted_id)
+            return transaction
+        existing = await self.collection.find_one(query)
+        existing["_id"] = str(existing["_id"])
+        return existing
+    
+    async def set_transaction_status(self, transaction_id: str, status: str):
+        """Mark a claimed debit "completed" once the wallet charge is settled"""
+        await self.collection.update_one({"_id": ObjectId(transaction_id)}, {"$set": {"status": status}})
+    
+    async def delete_transaction(self, transaction_id: str):
+        """Drop a claimed debit whose wallet charge did not happen"""
+        await self.collection.delete_one({"_id": ObjectId(transaction_id)})
+    
     async def get_user_balance_summary(self, user_id: str):
         """Get user's transaction summary (total credits, debits)"""
         pipeline = [
@@ -0,0 +1,248 @@
+# Incremental transcript persistence and bounded per-call conversation memory
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+
+class TranscriptWriter:
+    """Batched background writer that appends messages to call_history.transcript
+
+    Messages from every call are buffered and written with one bulk_write of
+    $push/$each per flush (every flush_interval seconds, or sooner once
+    max_batch messages are waiting), so a crash loses at most one interval of
+    conversation and the live transcript endpoint sees turns as they happen.
+    """
+
+    def __init__(self, collection, flush_interval: float = 1.0, max_batch: int = 200):
+        """
+        Args:
+            collection: Motor call_history collection
+            flush_interval: Max seconds a message waits before being written
+            max_batch: Pending messages that trigger an early flush
+        """
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending: Dict[str, List[dict]] = {}
+        self._pending_count = 0
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.messages_written = 0
+        self.batches = 0
+        self.failures = 0
+
+    def append(self, call_sid: str, message: dict):
+        """Queue one message for the call's transcript"""
+        self._pending.setdefault(call_sid, []).append(message)
+        self._pending_count += 1
+        if self._pending_count >= self.max_batch:
+            self._wake.set()
+
+    async def flush(self):
+        """Write everything queued so far"""
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            count, self._pending_count = self._pending_count, 0
+            now = datetime.utcnow()
+            operations = [
+                UpdateOne(
+                    {"call_sid": call_sid},
+                    {
+                        "$push": {"transcript": {"$each": messages}},
+                        "$set": {"transcript_updated_at": now}
+                    }
+                )
+                for call_sid, messages in batch.items()
+            ]
+            try:
+                await self.collection.bulk_write(operations, ordered=False)
+                self.messages_written += count
+                self.batches += 1
+            except Exception as e:
+                # Put the batch back in front of anything queued meanwhile, retried next flush
+                self.failures += 1
+                for call_sid, messages in batch.items():
+                    self._pending[call_sid] = messages + self._pending.get(call_sid, [])
+                self._pending_count += count
+                print(f"✗ Transcript write failed ({count} messages kept for retry): {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self):
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and write whatever is still queued"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_messages": self._pending_count,
+            "messages_written": self.messages_written,
+            "batches": self.batches,
+            "failures": self.failures
+        }
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count of one message (~4 UTF-8 bytes per token plus message overhead)"""
+    return len((text or "").encode("utf-8")) // 4 + 4
+
+
+class ConversationMemory:
+    """Recent messages of one call, kept in RAM for prompting
+
+    Every appended message is handed to the TranscriptWriter, so the full
+    transcript lives on the call record. The prompt gets the newest messages
+    that fit in token_budget; older ones are folded into a rolling summary by
+    a background task (the summarizer coroutine), so summarization never runs
+    on a turn's critical path. Until a fold completes, messages outside the
+    budget are simply left out of the prompt. At most max_messages are kept in
+    RAM either way. Supports len(), iteration and slicing like a list.
+    """
+
+    def __init__(
+        self,
+        call_sid: Optional[str],
+        writer: Optional[TranscriptWriter] = None,
+        max_messages: int = 16,
+        token_budget: int = 600,
+        summarizer: Optional[Callable[[Optional[str], List[dict]], Awaitable[str]]] = None
+    ):
+        """
+        Args:
+            call_sid: Twilio call SID of the call_history record to append to
+            writer: TranscriptWriter, None to keep the conversation in memory only
+            max_messages: Messages kept in RAM
+            token_budget: Estimated tokens of history (summary excluded) sent with each prompt
+            summarizer: Coroutine (previous summary, messages) -> new summary, None to just drop old turns
+        """
+        self.call_sid = call_sid
+        self.writer = writer
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+        self.messages = deque()
+        self.version = 0  # messages appended over the whole call
+        self.summary: Optional[str] = None
+        self.summarized_upto = 0  # index of the first message not covered by the summary
+        self.dropped = 0          # messages evicted before they could be summarized
+        self._fold_task: Optional[asyncio.Task] = None
+
+    def append(self, message: dict):
+        self.messages.append(message)
+        self.version += 1
+        if self.writer and self.call_sid:
+            self.writer.append(self.call_sid, {
+                "role": message["role"],
+                "content": message["content"],
+                "index": self.version - 1,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+        while len(self.messages) > self.max_messages:
+            self.messages.popleft()
+            if self._first_index() - 1 >= self.summarized_upto:
+                self.dropped += 1
+        self._maybe_fold()
+
+    def _first_index(self) -> int:
+        return self.version - len(self.messages)
+
+    def _window_size(self) -> int:
+        """Newest messages that fit in the token budget (always at least one)"""
+        used = 0
+        size = 0
+        for message in reversed(self.messages):
+            used += estimate_tokens(message["content"])
+            if size and used > self.token_budget:
+                break
+            size += 1
+        return size
+
+    def prompt_messages(self) -> List[dict]:
+        """History to send with the next prompt: rolling summary, then the newest messages within budget"""
+        size = self._window_size()
+        window = list(self.messages)[len(self.messages) - size:]
+        if self.summary:
+            return [{"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}] + window
+        return window
+
+    def _maybe_fold(self):
+        if self.summarizer is None or (self._fold_task and not self._fold_task.done()):
+            return
+        outside = len(self.messages) - self._window_size()
+        if outside < 2:
+            return
+        to_fold = list(self.messages)[:outside]
+        self._fold_task = asyncio.create_task(self._fold(to_fold, self._first_index() + outside))
+
+    async def _fold(self, messages: List[dict], end_index: int):
+        try:
+            summary = await self.summarizer(self.summary, messages)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            print(f"⚠️ Conversation summary failed ({self.call_sid}): {e}")
+            return
+        if summary:
+            self.summary = summary.strip()
+            self.summarized_upto = max(self.summarized_upto, end_index)
+            while self.messages and self._first_index() < end_index:
+                self.messages.popleft()
+        self._fold_task = None
+        self._maybe_fold()
+
+    def close(self):
+        """Cancel a summary still being generated (the call is over)"""
+        if self._fold_task and not self._fold_task.done():
+            self._fold_task.cancel()
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __getitem__(self, index):
+        return list(self.messages)[index]
+
+
+# Global transcript writer instance
+_transcript_writer: Optional[TranscriptWriter] = None
+
+
+def get_transcript_writer() -> TranscriptWriter:
+    """Get the global transcript writer"""
+    if _transcript_writer is None:
+        raise RuntimeError("Transcript writer not initialized")
+    return _transcript_writer
+
+
+def initialize_transcript_writer(db, flush_interval: float = 1.0) -> TranscriptWriter:
+    """Create and start the transcript writer"""
+    global _transcript_writer
+    _transcript_writer = TranscriptWriter(db["call_history"], flush_interval=flush_interval)
+    _transcript_writer.start()
+    return _transcript_writer
@@ -0,0 +1,159 @@
+# Synthesized-audio cache for repeated bot utterances
+import base64
+import hashlib
+import os
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+
+import aiofiles
+
+# 200ms of 8kHz μ-law per Twilio media message
+FRAME_BYTES = 1600
+
+
+def normalize_tts_text(text: str) -> str:
+    """Normalize text so trivially different spellings share one cache entry"""
+    text = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def make_tts_cache_key(engine: str, voice: str, language: str, text: str) -> str:
+    """Cache key for (engine, voice, language, normalized text)"""
+    raw = "\x1f".join([engine or "", voice or "", language or "", normalize_tts_text(text)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def frame_audio(audio: bytes) -> List[str]:
+    """Split raw μ-law audio into base64 payloads ready for Twilio media messages"""
+    return [
+        base64.b64encode(audio[i:i + FRAME_BYTES]).decode("ascii")
+        for i in range(0, len(audio), FRAME_BYTES)
+    ]
+
+
+class TTSAudioCache:
+    """LRU of ready-to-send μ-law frames with a byte budget and an optional disk tier
+
+    Memory entries are evicted least-recently-used once max_bytes is exceeded.
+    With disk_dir set, every entry is also written as <key>.ulaw and memory
+    misses are served (and promoted) from disk, so rendered audio survives
+    restarts and is shared by workers on the same host. The keys on disk are
+    listed once at startup and tracked in memory afterwards, so lookups never
+    touch the filesystem on the event loop; files another worker writes are
+    picked up at the next start.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, disk_dir: Optional[str] = None, warm_after: int = 3):
+        """
+        Args:
+            max_bytes: Memory budget for cached frames
+            disk_dir: Directory for the on-disk tier, None to disable
+            warm_after: Sightings of an uncached clause before it is worth synthesizing for the cache
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.warm_after = warm_after
+        self._entries: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._entry_bytes = {}
+        self._sightings: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_keys = set()
+        self.bytes = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_keys = {name[:-5] for name in os.listdir(self.disk_dir) if name.endswith(".ulaw")}
+
+        # Metrics
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0    # μ-law audio bytes served without a provider round trip
+        self.evictions = 0
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.ulaw")
+
+    def _store(self, key: str, frames: List[str], audio_bytes: int):
+        if audio_bytes > self.max_bytes:
+            return
+        if key in self._entries:
+            self.bytes -= self._entry_bytes[key]
+        self._entries[key] = frames
+        self._entries.move_to_end(key)
+        self._entry_bytes[key] = audio_bytes
+        self.bytes += audio_bytes
+        while self.bytes > self.max_bytes and self._entries:
+            old_key, _ = self._entries.popitem(last=False)
+            self.bytes -= self._entry_bytes.pop(old_key)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[List[str]]:
+        """Cached frames for a key, or None"""
+        frames = self._entries.get(key)
+        if frames is not None:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            self.bytes_saved += self._entry_bytes[key]
+            return frames
+
+        if key in self._disk_keys:
+            try:
+                async with aiofiles.open(self._disk_path(key), "rb") as f:
+                    audio = await f.read()
+                frames = frame_audio(audio)
+                self._store(key, frames, len(audio))
+                self.disk_hits += 1
+                self.bytes_saved += len(audio)
+                return frames
+            except Exception as e:
+                self._disk_keys.discard(key)
+                print(f"✗ TTS cache disk read failed: {e}")
+
+        self.misses += 1
+        return None
+
+    def contains(self, key: str) -> bool:
+        return key in self._entries or key in self._disk_keys
+
+    async def put(self, key: str, audio: bytes):
+        """Cache raw μ-law audio for a key (memory, and disk when enabled)"""
+        if not audio:
+            return
+        self._store(key, frame_audio(audio), len(audio))
+        self._sightings.pop(key, None)
+        if self.disk_dir:
+            try:
+                tmp_path = self._disk_path(key) + ".tmp"
+                async with aiofiles.open(tmp_path, "wb") as f:
+                    await f.write(audio)
+                os.replace(tmp_path, self._disk_path(key))
+                self._disk_keys.add(key)
+            except Exception as e:
+                print(f"✗ TTS cache disk write failed: {e}")
+
+    def note_miss(self, key: str) -> bool:
+        """Count a sighting of an uncached clause, True once it has recurred warm_after times"""
+        count = self._sightings.pop(key, 0) + 1
+        self._sightings[key] = count
+        while len(self._sightings) > 10000:
+            self._sightings.popitem(last=False)
+        return count == self.warm_after
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "disk_tier": bool(self.disk_dir),
+            "disk_entries": len(self._disk_keys),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else None,
+            "bytes_saved": self.bytes_saved,
+            "audio_seconds_saved": round(self.bytes_saved / 8000, 1),
+            "evictions": self.evictions
+        }
@@ -0,0 +1,244 @@
+# Cartesia TTS multiplexer - many calls share a few websockets, routed by context_id
+import asyncio
+import itertools
+import json
+from typing import Dict, List, Optional
+
+
+class CartesiaContext:
+    """One TTS generation (a Cartesia context_id) on a shared socket"""
+
+    def __init__(self, mux: "CartesiaMultiplexer", socket: "_MuxSocket", context_id: str, call_id: str):
+        self.mux = mux
+        self.socket = socket
+        self.context_id = context_id
+        self.call_id = call_id
+        self.queue: asyncio.Queue = asyncio.Queue()  # messages routed by the socket's reader
+        self.finished = False   # "done" or "error" received
+        self.closed = False
+
+    async def send(self, request: dict):
+        """Send a generation request for this context"""
+        request["context_id"] = self.context_id
+        await self.socket.ws.send(json.dumps(request))
+
+    async def receive(self, timeout: float) -> dict:
+        """Next message for this context, raises asyncio.TimeoutError after timeout seconds"""
+        data = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        if data.get("type") in ("done", "error"):
+            self.finished = True
+        return data
+
+    async def cancel(self):
+        """Ask Cartesia to stop generating, late chunks are dropped by the reader"""
+        if not self.finished and not self.closed:
+            try:
+                await self.socket.ws.send(json.dumps({"context_id": self.context_id, "cancel": True}))
+            except Exception:
+                pass
+        self.close()
+
+    def close(self):
+        """Stop routing messages to this context"""
+        if not self.closed:
+            self.closed = True
+            self.mux._unregister(self)
+
+
+class CartesiaCallHandle:
+    """Per-call view of the multiplexer, contexts opened here are cancelled at hangup"""
+
+    def __init__(self, mux: "CartesiaMultiplexer", call_id: str):
+        self.mux = mux
+        self.call_id = call_id
+
+    async def open_context(self) -> CartesiaContext:
+        return await self.mux.open_context(self.call_id)
+
+    async def close(self):
+        await self.mux.close_call(self.call_id)
+
+
+class _MuxSocket:
+    def __init__(self, ws):
+        self.ws = ws
+        self.contexts: Dict[str, CartesiaContext] = {}
+        self.reader: Optional[asyncio.Task] = None
+        self.open = True
+
+
+class CartesiaMultiplexer:
+    """Demultiplexing Cartesia client
+
+    A small number of sockets leased from the connection pool carry the TTS
+    contexts of every call. One reader task per socket routes each message to
+    its context's queue by context_id; messages for contexts that were already
+    cancelled or finished are dropped, so two generations of the same call can
+    overlap safely (e.g. a cancelled reply still draining while the next starts).
+    """
+
+    def __init__(self, pool, sockets: int = 4, max_contexts_per_socket: int = 50):
+        """
+        Args:
+            pool: CartesiaConnectionPool the sockets are leased from
+            sockets: Sockets kept open permanently
+            max_contexts_per_socket: Above this another socket is leased (up to pool max)
+        """
+        self.pool = pool
+        self.base_sockets = max(1, sockets)
+        self.max_contexts_per_socket = max(1, max_contexts_per_socket)
+        self._sockets: List[_MuxSocket] = []
+        self._contexts: Dict[str, CartesiaContext] = {}
+        self._lock = asyncio.Lock()   # never held across a pool acquire
+        self._adding: Optional[asyncio.Future] = None  # set while a socket is being leased, resolves to the error or None
+        self._ids = itertools.count(1)
+
+        # Metrics
+        self.contexts_opened = 0
+        self.dropped_messages = 0
+        self.socket_failures = 0
+        self.peak_contexts = 0
+
+    def for_call(self, call_id: str) -> CartesiaCallHandle:
+        return CartesiaCallHandle(self, call_id)
+
+    async def start(self):
+        """Lease the base sockets"""
+        while len(self._sockets) < self.base_sockets:
+            try:
+                ws = await self.pool.acquire()
+            except Exception as e:
+                print(f"✗ Cartesia mux could not lease socket: {e}")
+                break
+            self._add_socket(ws)
+        print(f"✓ Cartesia multiplexer started ({len(self._sockets)} shared sockets)")
+
+    async def stop(self):
+        """Stop readers and return every socket to the pool"""
+        async with self._lock:
+            sockets, self._sockets = self._sockets, []
+        for socket in sockets:
+            socket.open = False
+            if socket.reader and not socket.reader.done():
+                socket.reader.cancel()
+            await self.pool.release(socket.ws)
+
+    def _add_socket(self, ws) -> _MuxSocket:
+        socket = _MuxSocket(ws)
+        socket.reader = asyncio.create_task(self._read(socket))
+        self._sockets.append(socket)
+        return socket
+
+    async def _read(self, socket: _MuxSocket):
+        """Route every message on one socket to its context"""
+        try:
+            async for raw in socket.ws:
+                try:
+                    data = json.loads(raw)
+                except ValueError:
+                    continue
+                context = self._contexts.get(data.get("context_id"))
+                if context is None or context.socket is not socket:
+                    self.dropped_messages += 1
+                    continue
+                context.queue.put_nowait(data)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            print(f"✗ Cartesia shared socket error: {e}")
+
+        # Socket closed underneath us: fail its contexts and let the pool replace it
+        socket.open = False
+        self.socket_failures += 1
+        for context in list(socket.contexts.values()):
+            context.queue.put_nowait({"type": "error", "error": "Cartesia socket closed", "context_id": context.context_id})
+        async with self._lock:
+            if socket in self._sockets:
+                self._sockets.remove(socket)
+        await self.pool.release(socket.ws)
+
+    async def open_context(self, call_id: str) -> CartesiaContext:
+        """Start a new context on the least loaded socket
+
+        When every socket is full one caller leases another from the pool
+        outside the lock; callers arriving meanwhile wait for that socket
+        instead of leasing their own, and contexts on open sockets are never
+        held up by the lease.
+        """
+        while True:
+            async with self._lock:
+                socket = self._least_loaded()
+                if socket is not None and len(socket.contexts) < self.max_contexts_per_socket:
+                    return self._register(socket, call_id)
+                if self._adding is None:
+                    adding = self._adding = asyncio.get_running_loop().create_future()
+                    break
+                adding = self._adding
+
+            error = await asyncio.shield(adding)
+            if error is not None:
+                return await self._share_busy(call_id, error)
+
+        error = None
+        try:
+            ws = await self.pool.acquire()
+        except Exception as e:
+            error = e
+        finally:
+            # No await from here to the register, so waiters can't run before the socket is listed
+            self._adding = None
+            adding.set_result(error)
+        if error is not None:
+            return await self._share_busy(call_id, error)
+        return self._register(self._add_socket(ws), call_id)
+
+    async def _share_busy(self, call_id: str, error: Exception) -> CartesiaContext:
+        """Pool exhausted: overload the least loaded socket rather than fail the turn"""
+        async with self._lock:
+            socket = self._least_loaded()
+            if socket is None:
+                raise error
+            print(f"⚠️ Cartesia mux could not add socket ({error}), sharing a busy one")
+            return self._register(socket, call_id)
+
+    def _least_loaded(self) -> Optional[_MuxSocket]:
+        candidates = [s for s in self._sockets if s.open]
+        return min(candidates, key=lambda s: len(s.contexts)) if candidates else None
+
+    def _register(self, socket: _MuxSocket, call_id: str) -> CartesiaContext:
+        context_id = f"{call_id}_{next(self._ids)}"
+        context = CartesiaContext(self, socket, context_id, call_id)
+        socket.contexts[context_id] = context
+        self._contexts[context_id] = context
+        self.contexts_opened += 1
+        self.peak_contexts = max(self.peak_contexts, len(self._contexts))
+        return context
+
+    def _unregister(self, context: CartesiaContext):
+        self._contexts.pop(context.context_id, None)
+        context.socket.contexts.pop(context.context_id, None)
+        # Hand surplus sockets back to the pool once they drain
+        socket = context.socket
+        if not socket.contexts and len(self._sockets) > self.base_sockets and socket in self._sockets:
+            self._sockets.remove(socket)
+            socket.open = False
+            if socket.reader and not socket.reader.done():
+                socket.reader.cancel()
+            asyncio.create_task(self.pool.release(socket.ws))
+
+    async def close_call(self, call_id: str):
+        """Cancel every context still open for a call"""
+        for context in [c for c in self._contexts.values() if c.call_id == call_id]:
+            await context.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "sockets": len(self._sockets),
+            "base_sockets": self.base_sockets,
+            "active_contexts": len(self._contexts),
+            "peak_contexts": self.peak_contexts,
+            "contexts_per_socket": [len(s.contexts) for s in self._sockets],
+            "contexts_opened": self.contexts_opened,
+            "dropped_messages": self.dropped_messages,
+            "socket_failures": self.socket_failures
+        }
@@ -0,0 +1,243 @@
+# Pre-warmed Cartesia WebSocket connection pool
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+import websockets
+from websockets.protocol import State
+
+
+class CartesiaConnectionPool:
+    """Keeps authenticated Cartesia TTS websockets open so calls don't pay the handshake
+
+    Calls lease a connection at the Twilio 'start' event and return it at hangup.
+    Idle connections are health-checked with keepalive pings, evicted after
+    idle_timeout (never below min_size), and the pool is refilled to min_size.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        min_size: int = 2,
+        max_size: int = 100,
+        idle_timeout: float = 300.0,
+        ping_interval: float = 20.0,
+        acquire_timeout: float = 5.0
+    ):
+        """
+        Args:
+            url: Cartesia websocket URL including api_key and version
+            min_size: Connections kept open (idle + leased) at all times
+            max_size: Hard cap on open connections
+            idle_timeout: Seconds an idle connection above min_size is kept
+            ping_interval: Seconds between keepalive / health-check pings
+            acquire_timeout: Max seconds a caller waits when the pool is at max_size
+        """
+        self.url = url
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = deque()      # (websocket, returned_at)
+        self._in_use = set()
+        self._checking = set()    # idle connections taken out for a health-check ping
+        self._connecting = 0
+        self._condition = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+        self.connects = 0
+        self.connect_failures = 0
+        self.evictions = 0
+        self.health_check_failures = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._idle) + len(self._in_use) + len(self._checking) + self._connecting
+
+    @staticmethod
+    def _is_open(ws) -> bool:
+        return ws is not None and ws.state is State.OPEN
+
+    async def _connect(self):
+        self._connecting += 1
+        try:
+            ws = await websockets.connect(self.url)
+            self.connects += 1
+            return ws
+        except Exception:
+            self.connect_failures += 1
+            raise
+        finally:
+            self._connecting -= 1
+
+    async def _close(self, ws):
+        try:
+            await ws.close()
+        except Exception:
+            pass
+
+    async def start(self):
+        """Warm the pool to min_size and start the maintenance loop"""
+        await self._fill_to_min()
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._maintain())
+        print(f"✓ Cartesia pool started ({len(self._idle)} warm, min={self.min_size}, max={self.max_size})")
+
+    async def stop(self):
+        """Stop maintenance and close every connection"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+        while self._idle:
+            ws, _ = self._idle.popleft()
+            await self._close(ws)
+        for ws in list(self._in_use) + list(self._checking):
+            await self._close(ws)
+        self._in_use.clear()
+        self._checking.clear()
+
+    async def acquire(self):
+        """Lease a connection: an idle warm one if available, otherwise a new one"""
+        started = time.perf_counter()
+        waited = False
+        async with self._condition:
+            while True:
+                while self._idle:
+                    ws, _ = self._idle.pop()  # most recently used first, lets old ones age out
+                    if self._is_open(ws):
+                        self._in_use.add(ws)
+                        self.hits += 1
+                        self._record_wait(started, waited)
+                        return ws
+                    self.health_check_failures += 1
+                    asyncio.create_task(self._close(ws))
+
+                if self.size < self.max_size:
+                    break
+
+                # Pool exhausted, wait for a release
+                waited = True
+                remaining = self.acquire_timeout - (time.perf_counter() - started)
+                if remaining <= 0:
+                    self._record_wait(started, waited)
+                    raise TimeoutError(f"No Cartesia connection available within {self.acquire_timeout}s")
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+            self.misses += 1
+
+        # _connect() counts the slot before its first await, so the cap holds
+        ws = await self._connect()
+        self._in_use.add(ws)
+        self._record_wait(started, waited)
+        return ws
+
+    async def release(self, ws):
+        """Return a leased connection, broken ones are closed instead of pooled"""
+        async with self._condition:
+            self._in_use.discard(ws)
+            if self._is_open(ws):
+                self._idle.append((ws, time.monotonic()))
+            else:
+                asyncio.create_task(self._close(ws))
+            self._condition.notify()
+
+    def _record_wait(self, started: float, waited: bool):
+        elapsed = time.perf_counter() - started
+        self._recent_waits.append(elapsed)
+        if waited:
+            self.waits += 1
+        self.wait_time_total += elapsed
+        self.wait_time_max = max(self.wait_time_max, elapsed)
+
+    async def _fill_to_min(self):
+        while self.size < self.min_size:
+            try:
+                ws = await self._connect()
+            except Exception as e:
+                print(f"✗ Cartesia pool could not open connection: {e}")
+                return
+            async with self._condition:
+                self._idle.append((ws, time.monotonic()))
+                self._condition.notify()
+
+    async def _return_checked(self, entry):
+        """Put a connection back in the idle set after its ping, keeping idle order by return time"""
+        ws, returned_at = entry
+        async with self._condition:
+            self._checking.discard(ws)
+            position = len(self._idle)
+            while position > 0 and self._idle[position - 1][1] > returned_at:
+                position -= 1
+            self._idle.insert(position, entry)
+            self._condition.notify()
+
+    async def _maintain(self):
+        """Ping idle connections, evict stale ones, keep min_size warm"""
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            try:
+                now = time.monotonic()
+                for entry in list(self._idle):
+                    ws, returned_at = entry
+                    if entry not in self._idle:
+                        continue  # leased since the snapshot
+                    # Out of the idle set while it is checked, so acquire() can't
+                    # lease a connection that is being pinged or about to be closed
+                    self._idle.remove(entry)
+                    if self.size >= self.min_size and now - returned_at > self.idle_timeout:
+                        self.evictions += 1
+                        await self._close(ws)
+                        continue
+                    self._checking.add(ws)
+                    try:
+                        pong = await ws.ping()
+                        await asyncio.wait_for(pong, timeout=5.0)
+                    except Exception:
+                        self.health_check_failures += 1
+                        self._checking.discard(ws)
+                        await self._close(ws)
+                        continue
+                    await self._return_checked(entry)
+
+                await self._fill_to_min()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"✗ Cartesia pool maintenance error: {e}")
+
+    def stats(self) -> dict:
+        """Pool metrics for the admin endpoint"""
+        leases = self.hits + self.misses
+        recent = sorted(self._recent_waits)
+        p95 = recent[int(0.95 * (len(recent) - 1))] if recent else 0.0
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "in_use": len(self._in_use),
+            "checking": len(self._checking),
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / leases, 4) if leases else None,
+            "waits": self.waits,
+            "wait_time_avg_ms": round(self.wait_time_total / leases * 1000, 2) if leases else 0.0,
+            "wait_time_p95_ms": round(p95 * 1000, 2),
+            "wait_time_max_ms": round(self.wait_time_max * 1000, 2),
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+            "evictions": self.evictions,
+            "health_check_failures": self.health_check_failures
+        }
@@ -0,0 +1,163 @@
+# Local voice-activity gate - only caller speech (plus pre-roll) is streamed to Deepgram
+from collections import deque
+from typing import List, Optional
+
+import numpy as np
+
+FRAME_BYTES = 160  # 20ms of 8kHz μ-law
+NOISE_BLOCK_FRAMES = 25  # the noise floor window slides in 500ms steps
+
+# G.711 μ-law byte -> 16-bit linear sample
+_codes = ~np.arange(256, dtype=np.int32) & 0xFF
+_magnitude = ((((_codes & 0x0F) << 3) + 0x84) << ((_codes >> 4) & 0x07)) - 0x84
+ULAW_TO_LINEAR = np.where(_codes & 0x80, -_magnitude, _magnitude).astype(np.float32)
+
+
+def frame_energy_db(audio: bytes) -> np.ndarray:
+    """dBFS of every 20ms frame in a chunk of μ-law audio (a trailing partial frame counts as one)"""
+    codes = np.frombuffer(audio, dtype=np.uint8)
+    if not len(codes):
+        return np.empty(0, dtype=np.float32)
+    frames = -(-len(codes) // FRAME_BYTES)
+    padded = np.full(frames * FRAME_BYTES, 0xFF, dtype=np.uint8)  # 0xFF is μ-law silence
+    padded[:len(codes)] = codes
+    samples = ULAW_TO_LINEAR[padded].reshape(frames, FRAME_BYTES)
+    power = np.mean(samples * samples, axis=1)
+    return 10 * np.log10(power / (32768.0 ** 2) + 1e-10)
+
+
+class VoiceActivityGate:
+    """Energy VAD over Twilio μ-law frames that decides what reaches Deepgram
+
+    A frame is speech when it is margin_db above the noise floor and above
+    min_db. The floor is the quietest frame of the last noise_window_ms
+    (minimum statistics): it drops at once on a quieter frame and rises to
+    steady line noise within one window, since even continuous talk has
+    pauses quieter than itself. On speech onset the last preroll_ms of audio are forwarded
+    first so word starts are not clipped; after speech, audio keeps flowing for
+    hangover_ms so Deepgram still sees the silence it endpoints on. Because
+    suppressed audio never reaches Deepgram, its timestamps run on a shorter
+    clock than the call; to_wall_time() maps them back.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        preroll_ms: int = 300,
+        hangover_ms: int = 600,
+        margin_db: float = 12.0,
+        min_db: float = -50.0,
+        onset_frames: int = 2,
+        noise_window_ms: int = 3000
+    ):
+        """
+        Args:
+            enabled: False forwards every frame (timing and stats still tracked)
+            preroll_ms: Audio kept while closed and sent ahead of detected speech
+            hangover_ms: Audio still forwarded after the last speech frame
+            margin_db: Energy above the noise floor that counts as speech
+            min_db: Absolute floor below which nothing is speech
+            onset_frames: Consecutive speech frames needed to open the gate
+            noise_window_ms: Span the noise floor is the minimum over
+        """
+        self.enabled = enabled
+        self.hangover_frames = max(1, hangover_ms // 20)
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.onset_frames = max(1, onset_frames)
+        self.noise_db = -65.0
+        self._block_min: Optional[float] = None
+        self._block_frames = 0
+        self._block_minima = deque(maxlen=max(1, noise_window_ms // (NOISE_BLOCK_FRAMES * 20)))
+        self.is_open = not enabled
+        self._preroll = deque(maxlen=max(1, preroll_ms // 20))  # (bytes, wall time at frame start)
+        self._speech_run = 0
+        self._quiet_run = 0
+        self._resume = True  # next forwarded frame starts a new stretch of the Deepgram stream
+
+        # Deepgram stream clock: (stream seconds, wall time) at every resume
+        self._anchors: List[tuple] = []
+        self.sent_bytes = 0
+        self.total_bytes = 0
+        self.last_sent_at: Optional[float] = None
+
+    def process(self, audio: bytes, now: float) -> List[bytes]:
+        """Audio to forward for one incoming chunk received at wall time now (empty list while suppressed)"""
+        self.total_bytes += len(audio)
+        energies = frame_energy_db(audio)
+        start = now - len(audio) / 8000
+        out: List[bytes] = []
+
+        for i, energy in enumerate(energies):
+            frame = audio[i * FRAME_BYTES:(i + 1) * FRAME_BYTES]
+            frame_start = start + i * FRAME_BYTES / 8000
+            speech = energy >= max(self.min_db, self.noise_db + self.margin_db)
+            self._track_noise(float(energy))
+
+            if not self.enabled:
+                self._emit(out, frame, frame_start)
+                continue
+
+            if self.is_open:
+                self._quiet_run = 0 if speech else self._quiet_run + 1
+                self._emit(out, frame, frame_start)
+                if self._quiet_run >= self.hangover_frames:
+                    self.is_open = False
+                    self._speech_run = 0
+                    self._resume = True
+                continue
+
+            self._preroll.append((frame, frame_start))
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run >= self.onset_frames:
+                self.is_open = True
+                self._quiet_run = 0
+                for buffered, buffered_start in self._preroll:
+                    self._emit(out, buffered, buffered_start)
+                self._preroll.clear()
+
+        if out or self.last_sent_at is None:
+            self.last_sent_at = now
+        return out
+
+    def _track_noise(self, energy: float):
+        energy = max(energy, -80.0)
+        self.noise_db = min(self.noise_db, energy)
+        self._block_min = energy if self._block_min is None else min(self._block_min, energy)
+        self._block_frames += 1
+        if self._block_frames >= NOISE_BLOCK_FRAMES:
+            self._block_minima.append(self._block_min)
+            self._block_min = None
+            self._block_frames = 0
+            self.noise_db = min(self._block_minima)
+
+    def _emit(self, out: List[bytes], frame: bytes, frame_start: float):
+        if self._resume:
+            self._anchors.append((self.sent_bytes / 8000, frame_start))
+            if len(self._anchors) > 512:
+                del self._anchors[:256]
+            self._resume = False
+        out.append(frame)
+        self.sent_bytes += len(frame)
+
+    def to_wall_time(self, stream_seconds: float) -> Optional[float]:
+        """Wall time at which a Deepgram timestamp (seconds of forwarded audio) was spoken"""
+        for stream_at, wall_at in reversed(self._anchors):
+            if stream_at <= stream_seconds:
+                return wall_at + (stream_seconds - stream_at)
+        return None
+
+    def keepalive_due(self, now: float, interval: float) -> bool:
+        """True when nothing was forwarded for interval seconds (Deepgram closes idle streams after ~10s)"""
+        if self.last_sent_at is None or now - self.last_sent_at < interval:
+            return False
+        self.last_sent_at = now
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "audio_seconds": round(self.total_bytes / 8000, 2),
+            "sent_seconds": round(self.sent_bytes / 8000, 2),
+            "suppressed_ratio": round(1 - self.sent_bytes / self.total_bytes, 4) if self.total_bytes else 0.0
+        }
@@ -3,6 +3,9 @@ from typing import Optional
 from datetime import datetime
 from bson import ObjectId
 
+# Debit transaction ids remembered per wallet, so deduct_funds_once recognises a retried charge
+APPLIED_DEBITS_KEPT = 500
+
 
 class WalletDB:
     """Database operations for user wallets"""
@@ -32,7 +35,7 @@ class WalletDB:
     
     async def get_wallet_by_user_id(self, user_id: str):
         """Get wallet by user ID"""
-        wallet = await self.collection.find_one({"user_id": user_id})
+        wallet = await self.collection.find_one({"user_id": user_id}, {"applied_debits": 0})
         if wallet:
             wallet["_id"] = str(wallet["_id"])
         return wallet
@@ -88,6 +91,32 @@ class WalletDB:
         wallet = await self.get_wallet_by_user_id(user_id)
         return wallet["balance"]
     
+    async def deduct_funds_once(self, user_id: str, amount: float, transaction_id: str) -> Optional[float]:
+        """Deduct funds for one debit transaction, returns the new balance or None if it was already deducted
+
+        The transaction id is recorded on the wallet in the same update as the
+        balance, so retrying a charge whose outcome was lost never deducts twice.
+        The last APPLIED_DEBITS_KEPT ids are remembered.
+        """
+        if amount <= 0:
+            raise ValueError("Amount must be positive")
+
+        result = await self.collection.update_one(
+            {"user_id": user_id, "balance": {"$gte": amount}, "applied_debits": {"$ne": transaction_id}},
+            {
+                "$inc": {"balance": -amount},
+                "$set": {"updated_at": datetime.utcnow()},
+                "$push": {"applied_debits": {"$each": [transaction_id], "$slice": -APPLIED_DEBITS_KEPT}}
+            }
+        )
+
+        if result.modified_count == 0:
+            if await self.collection.find_one({"user_id": user_id, "applied_debits": transaction_id}, {"_id": 1}):
+                return None
+            raise ValueError("Insufficient balance or wallet not found")
+
+        return await self.get_balance(user_id)
+    
     async def has_minimum_balance(self, user_id: str, minimum: float = 10.0) -> bool:
         """Check if user has minimum required balance"""
         balance = await self.get_balance(user_id)